@@ -1,10 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, Body, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Body, BackgroundTasks, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 import os
 import time
 import sys
 import importlib.util
+import asyncio
+import base64
+import json
 
 # 动态导入新的对话管理器
 # spec = importlib.util.spec_from_file_location(
@@ -15,6 +19,9 @@ import importlib.util
 # spec.loader.exec_module(dialogue_manager_module)
 # get_dialogue_manager = dialogue_manager_module.get_dialogue_manager
 from core.dialogue_manager_new import get_dialogue_manager, DialogueManager
+from core.asr import recognize_audio, stream_recognize_audio
+from core.audio_ingest import decode_to_pcm
+from core.asr_sessions import get_asr_session_registry
 
 # 创建路由器
 router = APIRouter()
@@ -32,6 +39,10 @@ class AudioData(BaseModel):
     audio_data: str  # Base64 编码的音频数据
 
 
+class StreamAudioData(AudioData):
+    realtime: Optional[bool] = False  # 是否按实时速度发送给识别器
+
+
 class RoleRequest(BaseModel):
     role_id: str
 
@@ -97,6 +108,79 @@ async def stop_recognize_voice():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/voice/recognize/service")
+async def get_recognize_service():
+    """获取常驻识别服务的状态、重连与保活统计"""
+    try:
+        return {"status": "success", "service": dialogue_manager.asr_service.get_stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def recognize_status():
+    """识别相关状态接口的status：收音中为success，暂停或断开后为服务状态（paused/idle/stopped）"""
+    service = dialogue_manager.asr_service
+    return {"status": "success" if service.listening else service.state, "connected": service.connected}
+
+@router.get("/voice/recognize/lag")
+async def get_recognize_lag():
+    """获取语音采集到VAD判决的延迟统计"""
+    try:
+        if not dialogue_manager.asr_manager:
+            return {"status": "stopped", "lag": None}
+        return {**recognize_status(), "lag": dialogue_manager.asr_manager.get_decision_lag()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/voice/recognize/uplink")
+async def get_recognize_uplink():
+    """获取识别器上行音频的发送与门控节省统计"""
+    try:
+        if not dialogue_manager.asr_manager:
+            return {"status": "stopped", "uplink": None}
+        return {**recognize_status(), "uplink": dialogue_manager.asr_manager.get_uplink_stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/voice/recognize/metrics")
+async def get_recognize_metrics():
+    """获取语音采集、识别器发送与断句的计数器和直方图"""
+    try:
+        if not dialogue_manager.asr_manager:
+            return {"status": "stopped", "metrics": None}
+        return {**recognize_status(), "metrics": dialogue_manager.asr_manager.get_metrics()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/voice/recognize/events")
+async def get_recognize_events():
+    """获取当前识别中间结果与事件统计"""
+    try:
+        if not dialogue_manager.asr_manager:
+            return {"status": "stopped", "partial_text": "", "stats": None}
+        return {
+            **recognize_status(),
+            "partial_text": dialogue_manager.asr_partial_text,
+            "stats": dialogue_manager.asr_manager.get_event_stats(),
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/voice/barge-in")
+async def get_barge_in_stats():
+    """获取插话打断次数与从用户开口到停止播放的耗时"""
+    try:
+        return {"status": "success", "stats": dialogue_manager.get_barge_in_stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/chat/speculation")
+async def get_speculation_stats():
+    """获取推测执行大模型请求的命中率与节省延迟"""
+    try:
+        return {"status": "success", "stats": dialogue_manager.get_speculation_stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/voice/speak")
 async def synthesize_speech(input_data: UserInput):
     """处理语音合成请求"""
@@ -231,22 +315,167 @@ async def direct_chat_with_model(input_data: UserInput):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def read_audio_body(request: Request):
+    """读取上传的音频，支持原始二进制、multipart文件以及旧版Base64 JSON
+
+    Returns:
+        tuple: (音频字节, 内容类型)
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        payload = await request.json()
+        return base64.b64decode(payload.get("audio_data", "")), None
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file") or form.get("audio")
+        if upload is None or not hasattr(upload, "read"):
+            raise HTTPException(status_code=400, detail="缺少音频文件字段 file")
+        return await upload.read(), upload.content_type
+    return await request.body(), content_type
+
+
 @router.post("/direct-recognize")
-async def direct_recognize(background_tasks: BackgroundTasks, audio_data: AudioData):
-    """直接连接到模型的语音识别"""
+async def direct_recognize(request: Request):
+    """直接连接到模型的语音识别
+
+    请求体可以是原始二进制（application/octet-stream、audio/wav、audio/webm），
+    也可以是multipart上传或旧版的Base64 JSON；webm/opus和wav会先解码为16kHz单声道PCM。
+    """
     try:
-        # 获取对话管理器
-        # dialogue_manager = get_dialogue_manager()
-        
-        # 处理音频数据，但不触发自动回复
-        result = dialogue_manager.process_audio(audio_data.audio_data)
-        
-        # 获取最新的识别文本
-        recognized_text = dialogue_manager.recognized_text
-        
-        # 清空当前识别的文本，防止自动处理
-        background_tasks.add_task(lambda: setattr(dialogue_manager, "recognized_text", ""))
-        
-        return {"recognized_text": recognized_text, "status": "success"}
+        audio_bytes, content_type = await read_audio_body(request)
+        if not audio_bytes:
+            raise HTTPException(status_code=400, detail="音频数据为空")
+        try:
+            pcm_data = await asyncio.to_thread(decode_to_pcm, audio_bytes, content_type)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # 只做识别，不触发自动回复
+        result = await asyncio.to_thread(recognize_audio, pcm_data)
+        if result.get("status") != "success":
+            raise HTTPException(status_code=502, detail=result.get("message", "识别失败"))
+
+        return {"recognized_text": result["recognized_text"], "status": "success"}
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/direct-recognize/stream")
+async def direct_recognize_stream(audio_data: StreamAudioData):
+    """分帧识别上传的PCM音频，以NDJSON逐行返回中间结果和最终结果"""
+    try:
+        pcm_data = base64.b64decode(audio_data.audio_data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"音频数据解码失败: {e}")
+
+    def event_lines():
+        for event in stream_recognize_audio(pcm_data, realtime=audio_data.realtime):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(event_lines(), media_type="application/x-ndjson")
+
+
+@router.post("/asr/sessions")
+async def create_asr_session():
+    """为一个网络客户端创建独立的识别会话"""
+    try:
+        session = await asyncio.to_thread(get_asr_session_registry().create)
+        return {"status": "success", "session_id": session.session_id}
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/asr/sessions")
+async def list_asr_sessions():
+    """列出当前所有识别会话"""
+    return {"sessions": get_asr_session_registry().list_sessions()}
+
+
+@router.post("/asr/sessions/{session_id}/audio")
+async def push_asr_audio(session_id: str, request: Request):
+    """推送一段音频（请求体为原始二进制）
+
+    可以是16kHz单声道PCM，也可以是MediaRecorder的webm/opus连续分片或wav，
+    同一会话的分片会送入同一个增量解码器。
+    """
+    session = get_asr_session_registry().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="识别会话不存在")
+    data = await request.body()
+    try:
+        await asyncio.to_thread(session.feed, data, request.headers.get("content-type"))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "received_bytes": len(data)}
+
+
+@router.get("/asr/sessions/{session_id}")
+async def get_asr_session(session_id: str):
+    """获取识别会话状态与最近的识别结果"""
+    session = get_asr_session_registry().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="识别会话不存在")
+    return session.to_dict()
+
+
+@router.get("/asr/sessions/{session_id}/metrics")
+async def get_asr_session_metrics(session_id: str):
+    """获取识别会话的采集、发送与断句指标"""
+    session = get_asr_session_registry().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="识别会话不存在")
+    return {"status": "success", "metrics": session.get_metrics()}
+
+
+@router.delete("/asr/sessions/{session_id}")
+async def close_asr_session(session_id: str):
+    """关闭识别会话"""
+    closed = await asyncio.to_thread(get_asr_session_registry().close, session_id)
+    if not closed:
+        raise HTTPException(status_code=404, detail="识别会话不存在")
+    return {"status": "success"}
+
+
+@router.websocket("/asr/ws")
+async def asr_websocket(websocket: WebSocket):
+    """WebSocket识别：客户端发送二进制PCM帧或webm/opus分片，服务端推送JSON识别结果"""
+    await websocket.accept()
+    registry = get_asr_session_registry()
+    try:
+        session = await asyncio.to_thread(registry.create)
+    except Exception as e:
+        await websocket.send_json({"type": "error", "message": str(e)})
+        await websocket.close()
+        return
+
+    loop = asyncio.get_running_loop()
+    results = asyncio.Queue()
+
+    def on_event(event):
+        loop.call_soon_threadsafe(results.put_nowait, event)
+
+    async def forward_results():
+        while True:
+            event = await results.get()
+            await websocket.send_json({"type": event.type, "text": event.text, "sentence_id": event.sentence_id})
+
+    session.add_listener(on_event)
+    sender = asyncio.create_task(forward_results())
+    await websocket.send_json({"type": "session", "session_id": session.session_id})
+    try:
+        while True:
+            message = await websocket.receive()
+            if message.get("type") == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                # 解码和写入缓冲区可能阻塞，不在事件循环里执行
+                await asyncio.to_thread(session.feed, message["bytes"])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        await asyncio.to_thread(registry.close, session.session_id)
@@ -0,0 +1,264 @@
+"""离线ASR回放基准
+
+把WAV文件（或内置的合成语音信号）通过真实的asr_process_loop/detect_user_speech逻辑回放，
+识别器替换为本地FakeRecognizer，不需要网络和API Key。统计每轮话从说话结束到
+external_callback被调用的延迟、误触发/漏触发的轮次以及每路流的CPU占用。
+
+用法:
+    python -m bench.asr_replay --synthetic --speed 4 --streams 2
+    python -m bench.asr_replay recording.wav --script recording.json --json
+    python -m bench.asr_replay --synthetic --max-latency-ms 2600 --max-false-triggers 0
+
+脚本文件格式: {"utterances": [{"text": "你好", "start": 1.0, "end": 2.2}, ...]}，
+未指定--script时使用与WAV同名的.json文件。设置了阈值时超出即以非零状态退出，便于在CI中运行。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+import numpy as np
+
+from bench.fake_recognizer import FakeRecognizer
+from core.asr import ASRmanager
+from core.audio_frames import SAMPLE_RATE, SAMPLE_WIDTH
+from core.audio_source import WavFileSource
+
+# 合成信号的说话片段（秒），片段之间的静音长于默认的沉默判定时长
+SYNTHETIC_SEGMENTS = [
+    ("今天天气怎么样", 1.0, 2.6),
+    ("帮我查一下明天的日程", 5.6, 7.8),
+    ("谢谢", 10.8, 11.4),
+]
+SYNTHETIC_DURATION = 14.5
+
+
+def make_synthetic_wav(path, seed=0):
+    """生成带底噪的合成语音WAV（谐波+音节包络），返回对应的脚本"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(SYNTHETIC_DURATION * SAMPLE_RATE)) / SAMPLE_RATE
+    signal = rng.normal(0, 60, t.size)
+    for _, start, end in SYNTHETIC_SEGMENTS:
+        mask = (t >= start) & (t < end)
+        seg_t = t[mask] - start
+        f0 = 140 + 20 * np.sin(2 * np.pi * 0.7 * seg_t)
+        phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+        envelope = 0.6 + 0.4 * np.abs(np.sin(np.pi * 4 * seg_t))
+        signal[mask] += 5000 * voiced * envelope
+    pcm = np.clip(signal, -32768, 32767).astype("<i2")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+    return [{"text": text, "start": start, "end": end} for text, start, end in SYNTHETIC_SEGMENTS]
+
+
+def load_script(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["utterances"]
+
+
+def wav_duration(path):
+    with wave.open(path, "rb") as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+class ReplayStream:
+    """一路回放：一个ASRmanager + WavFileSource + FakeRecognizer"""
+
+    def __init__(self, wav_path, utterances, speed=1.0, silence_duration=None, gated_uplink=False,
+                 recognizer_options=None):
+        self.utterances = utterances
+        self.speed = speed
+        self.turns = []
+        self.started_at = None
+        recognizer_options = recognizer_options or {}
+        source = WavFileSource(wav_path, realtime=True, speed=speed)
+        self.manager = ASRmanager(
+            source=source,
+            gated_uplink=gated_uplink,
+            recognizer_factory=lambda callback: FakeRecognizer(callback, utterances, speed=speed,
+                                                               **recognizer_options),
+        )
+        if silence_duration is not None:
+            self.manager.silence_duration = silence_duration
+        self.manager.set_text_callback(self._on_turn)
+
+    def _on_turn(self, text):
+        # 换算回音频时间，便于与脚本中的句末时间比较
+        audio_time = (time.monotonic() - self.started_at) * self.speed
+        self.turns.append({"text": text, "audio_time": audio_time})
+
+    def start(self):
+        self.started_at = time.monotonic()
+        return self.manager.start_asr()
+
+    def wait(self, timeout):
+        """等待输入源读完，再多等一个沉默判定时长让最后一轮结束"""
+        deadline = time.monotonic() + timeout
+        while not self.manager.source.finished and time.monotonic() < deadline:
+            time.sleep(0.05)
+        tail = (self.manager.silence_duration + 1.0) / self.speed
+        time.sleep(max(0.0, min(tail, deadline - time.monotonic())))
+
+    def stop(self):
+        self.manager.stop_asr()
+        for thread in (self.manager.asr_thread, self.manager.detection_thread, self.manager.sender_thread):
+            if thread is not None:
+                thread.join(timeout=2.0)
+
+    def evaluate(self):
+        """把每次回调匹配到最早一个已说完且尚未匹配的句子
+
+        回调时还没有任何句子说完视为误触发（例如一句话中途被切断），
+        最终没有匹配到回调的句子计为漏触发。
+        """
+        matched = set()
+        latencies = []
+        false_triggers = 0
+        for turn in self.turns:
+            candidates = [i for i, u in enumerate(self.utterances)
+                          if i not in matched and u["end"] <= turn["audio_time"]]
+            if not candidates:
+                false_triggers += 1
+                continue
+            # 一次回调可能合并了多句（句间停顿短于沉默时长），延迟按最后一句计算
+            for i in candidates:
+                matched.add(i)
+            latencies.append(turn["audio_time"] - self.utterances[candidates[-1]]["end"])
+        return {
+            "turns": len(self.turns),
+            "expected_turns": len(self.utterances),
+            "false_triggers": false_triggers,
+            "missed_utterances": len(self.utterances) - len(matched),
+            "latencies_ms": [round(latency * 1000, 1) for latency in latencies],
+            "metrics": self.manager.get_metrics(),
+        }
+
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    arr = np.asarray(values, dtype=float)
+    return {
+        "count": int(arr.size),
+        "mean": round(float(arr.mean()), 1),
+        "p50": round(float(np.percentile(arr, 50)), 1),
+        "p95": round(float(np.percentile(arr, 95)), 1),
+        "max": round(float(arr.max()), 1),
+    }
+
+
+def run_replay(wav_path, utterances, streams=1, speed=1.0, silence_duration=None, gated_uplink=False,
+               recognizer_options=None, verbose=False):
+    """并发回放多路相同的音频，返回汇总结果"""
+    duration = wav_duration(wav_path)
+    replays = [ReplayStream(wav_path, utterances, speed, silence_duration, gated_uplink, recognizer_options)
+               for _ in range(streams)]
+    # 识别线程会逐块打印音量，基准模式下默认屏蔽
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        cpu_start = time.process_time()
+        wall_start = time.monotonic()
+        for replay in replays:
+            if not replay.start():
+                raise RuntimeError("启动回放识别失败")
+        waiters = [threading.Thread(target=replay.wait, args=(duration / speed + 30,)) for replay in replays]
+        for waiter in waiters:
+            waiter.start()
+        for waiter in waiters:
+            waiter.join()
+        for replay in replays:
+            replay.stop()
+        cpu_seconds = time.process_time() - cpu_start
+        wall_seconds = time.monotonic() - wall_start
+
+    per_stream = [replay.evaluate() for replay in replays]
+    latencies = [value for stream in per_stream for value in stream["latencies_ms"]]
+    cpu_per_stream = cpu_seconds / streams
+    return {
+        "audio_seconds": round(duration, 2),
+        "speed": speed,
+        "streams": streams,
+        "gated_uplink": gated_uplink,
+        "wall_seconds": round(wall_seconds, 2),
+        "latency_ms": summarize(latencies),
+        "false_triggers": sum(stream["false_triggers"] for stream in per_stream),
+        "missed_utterances": sum(stream["missed_utterances"] for stream in per_stream),
+        "cpu_seconds_per_stream": round(cpu_per_stream, 3),
+        # 每秒音频消耗的CPU秒数，与回放倍速无关
+        "cpu_per_audio_second": round(cpu_per_stream / duration, 4) if duration else 0.0,
+        "per_stream": per_stream,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线ASR回放基准")
+    parser.add_argument("wav", nargs="?", help="16kHz单声道16bit WAV文件")
+    parser.add_argument("--script", help="句子脚本JSON，默认使用与WAV同名的.json文件")
+    parser.add_argument("--synthetic", action="store_true", help="使用内置的合成语音信号")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速")
+    parser.add_argument("--streams", type=int, default=1, help="并发回放路数")
+    parser.add_argument("--silence-duration", type=float, help="覆盖ASRmanager的沉默判定时长（秒）")
+    parser.add_argument("--gated-uplink", action="store_true", help="启用VAD门控上行")
+    parser.add_argument("--partial-delay", type=float, default=0.15, help="模拟识别器中间结果延迟（秒）")
+    parser.add_argument("--final-delay", type=float, default=0.3, help="模拟识别器整句结果延迟（秒）")
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果")
+    parser.add_argument("--verbose", action="store_true", help="保留识别线程的日志输出")
+    parser.add_argument("--max-latency-ms", type=float, help="p95延迟超过该值时返回非零状态")
+    parser.add_argument("--max-false-triggers", type=int, help="误触发超过该次数时返回非零状态")
+    args = parser.parse_args(argv)
+
+    temp_path = None
+    if args.synthetic:
+        fd, temp_path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        wav_path = temp_path
+        utterances = make_synthetic_wav(wav_path)
+    elif args.wav:
+        wav_path = args.wav
+        utterances = load_script(args.script or os.path.splitext(wav_path)[0] + ".json")
+    else:
+        parser.error("需要指定WAV文件或--synthetic")
+
+    try:
+        report = run_replay(
+            wav_path, utterances, streams=args.streams, speed=args.speed,
+            silence_duration=args.silence_duration, gated_uplink=args.gated_uplink,
+            recognizer_options={"partial_delay": args.partial_delay, "final_delay": args.final_delay},
+            verbose=args.verbose,
+        )
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        latency = report["latency_ms"]
+        print(f"音频时长: {report['audio_seconds']}s  倍速: {report['speed']}  路数: {report['streams']}")
+        print(f"说话结束到回调延迟(ms): p50={latency.get('p50')} p95={latency.get('p95')} "
+              f"max={latency.get('max')} 次数={latency['count']}")
+        print(f"误触发: {report['false_triggers']}  漏触发: {report['missed_utterances']}")
+        print(f"每路CPU: {report['cpu_seconds_per_stream']}s  每秒音频CPU: {report['cpu_per_audio_second']}s")
+
+    failed = False
+    if args.max_latency_ms is not None and report["latency_ms"].get("p95", float("inf")) > args.max_latency_ms:
+        print(f"p95延迟超过阈值 {args.max_latency_ms}ms", file=sys.stderr)
+        failed = True
+    if args.max_false_triggers is not None and report["false_triggers"] > args.max_false_triggers:
+        print(f"误触发次数超过阈值 {args.max_false_triggers}", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeRecognizer:
+    """本地模拟的TranslationRecognizerRealtime，按脚本回调识别结果，不访问网络
+
+    脚本中每句话给出文本和在音频中的起止时间（秒）。识别器启动后按音频时间推进：
+    说话期间每隔partial_interval秒产生一次中间结果（文本逐步变长），句末产生
+    is_sentence_end的整句结果。所有回调都通过定时器在独立线程中触发，延迟按speed缩放，
+    与真实SDK一样不在send_audio_frame的调用线程里回调。
+
+    Args:
+        callback: TranslationRecognizerCallback，接收on_open/on_event/on_complete/on_close
+        utterances: [{"text": str, "start": float, "end": float}, ...]
+        speed: 音频回放倍速，需与输入源一致
+        partial_interval: 中间结果的间隔（音频秒）
+        partial_delay: 中间结果相对于对应音频的延迟（秒）
+        final_delay: 句末到整句结果的延迟（秒）
+    """
+
+    def __init__(self, callback, utterances, speed=1.0, partial_interval=0.2, partial_delay=0.15,
+                 final_delay=0.3):
+        self.callback = callback
+        self.utterances = sorted(utterances, key=lambda u: u["start"])
+        self.speed = speed
+        self.partial_interval = partial_interval
+        self.partial_delay = partial_delay
+        self.final_delay = final_delay
+        self.timers = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.started_at = None
+        self.stats = {"frames": 0, "bytes": 0, "partials": 0, "finals": 0}
+
+    def _schedule(self, audio_time, fn, *args):
+        delay = max(0.0, audio_time / self.speed - (time.monotonic() - self.started_at))
+        timer = threading.Timer(delay, self._fire, args=(fn,) + args)
+        timer.daemon = True
+        self.timers.append(timer)
+        timer.start()
+
+    def _fire(self, fn, *args):
+        with self.lock:
+            if not self.running:
+                return
+            fn(*args)
+
+    def _send_event(self, sentence_id, text, is_end):
+        result = SimpleNamespace(text=text, sentence_id=sentence_id, is_sentence_end=is_end, stash=None)
+        self.stats["finals" if is_end else "partials"] += 1
+        self.callback.on_event(f"fake-{sentence_id}", result, None, None)
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.running = True
+        self.callback.on_open()
+        for sentence_id, utterance in enumerate(self.utterances):
+            text = utterance["text"]
+            start, end = utterance["start"], utterance["end"]
+            steps = max(1, int((end - start) / self.partial_interval))
+            for step in range(1, steps + 1):
+                partial = text[:max(1, len(text) * step // (steps + 1))]
+                audio_time = start + step * self.partial_interval + self.partial_delay
+                self._schedule(audio_time, self._send_event, sentence_id, partial, False)
+            self._schedule(end + self.final_delay, self._send_event, sentence_id, text, True)
+
+    def send_audio_frame(self, data):
+        if not self.running:
+            raise RuntimeError("识别器未启动")
+        self.stats["frames"] += 1
+        self.stats["bytes"] += len(data)
+
+    def stop(self):
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+        for timer in self.timers:
+            timer.cancel()
+        self.timers = []
+        self.callback.on_complete()
+        self.callback.on_close()
@@ -2,7 +2,7 @@ import os
 import time
 import json
 from http import HTTPStatus
-from dashscope import Application
+from emulator import get_application
 from dotenv import load_dotenv
 # 加载环境变量
 load_dotenv('voice-web-backend/backend/.env.local')
@@ -25,6 +25,11 @@ class AgentChat:
         self.app_id = character_id if character_id is not None else character[character_name] if character_name in character.keys() else app_id[0]  # 默认选择第一个角色
         self.session_id = None
         self.last_response = None  # 添加存储最后回复的属性
+        # 本地记录的对话历史，无状态请求时随请求一起发送
+        self.history = []
+        self.max_history_turns = 20
+        # 为True时所有请求都不使用session_id，改为带上本地历史（推测执行开启时使用）
+        self.replay_history = False
 
         # session_id回调函数
         self.get_session_id_callback = None
@@ -38,6 +43,7 @@ class AgentChat:
         # if character_id < len(app_id) and app_id[character_id] is not self.app_id:
         self.app_id = character_id
         self.session_id = None  # 如果角色ID更改，重置会话ID
+        self.history = []
         if self.get_session_id_callback:
             self.get_session_id_callback(self.session_id)
 
@@ -56,6 +62,28 @@ class AgentChat:
         """设置获取会话ID回调"""
         self.get_session_id_callback = callback
 
+    def complete(self, text):
+        """无状态请求：不带session_id，把本地对话历史随请求发送
+
+        请求不会写入智能体的会话历史，结果需要调用record_turn才计入本地历史，
+        因此可以用于随时可能被丢弃的推测请求。请求失败时抛出RuntimeError。
+        """
+        messages = self.history + [{"role": "user", "content": text}]
+        response = get_application().call(
+            api_key=self.api_key,
+            app_id=self.app_id,
+            prompt=text,
+            messages=messages
+        )
+        if response.status_code != HTTPStatus.OK:
+            raise RuntimeError(f"请求错误: {response.message}")
+        return response.output.text
+
+    def record_turn(self, text, reply):
+        """把一轮对话计入本地历史，只保留最近max_history_turns轮"""
+        self.history.extend([{"role": "user", "content": text}, {"role": "assistant", "content": reply}])
+        del self.history[:-2 * self.max_history_turns]
+
     def send_message(self, text):
         """发送消息并获取响应
 
@@ -65,9 +93,18 @@ class AgentChat:
         Returns:
             str: AI的响应文本
         """
+        if self.replay_history:
+            try:
+                self.last_response = self.complete(text)
+            except RuntimeError as e:
+                print(f'请求出错: {e}')
+                return str(e)
+            self.record_turn(text, self.last_response)
+            return self.last_response
+
         if self.session_id is None:
             # 首次对话，创建新会话
-            response = Application.call(
+            response = get_application().call(
                 api_key=self.api_key,
                 app_id=self.app_id,
                 prompt=text
@@ -81,6 +118,7 @@ class AgentChat:
                 if self.get_session_id_callback:
                     self.get_session_id_callback(self.session_id)
                 self.last_response = response.output.text
+                self.record_turn(text, self.last_response)
                 # print(f'请求成功: , message={response.output.text}')
                 # 创建session_id对话文件记录
                 with open(f'voice-web-backend/backend/static/logs/sessionID_{self.session_id}.json', 'w') as f:
@@ -88,7 +126,7 @@ class AgentChat:
                 return self.last_response
         else:
             # 继续已有会话
-            response = Application.call(
+            response = get_application().call(
                 api_key=self.api_key,
                 app_id=self.app_id,
                 prompt=text,
@@ -100,12 +138,14 @@ class AgentChat:
                 return f"请求错误: {response.message}"
             else:
                 self.last_response = response.output.text
+                self.record_turn(text, self.last_response)
                 # print(f'请求成功: , message={response.output.text}')
                 return self.last_response
 
     def reset_session(self):
         """重置会话，开始新的对话"""
         self.session_id = None
+        self.history = []
         if self.get_session_id_callback:
             self.get_session_id_callback(self.session_id)
 
@@ -118,7 +158,7 @@ def call_with_session(text: str = '你是谁？'):
     global chat_session
     print("chat_session: ", chat_session, '\n')
     if chat_session is None:
-        response = Application.call(
+        response = get_application().call(
             api_key="###",
             app_id='e2eed5eed7bb4fa8a75a7b4cfc8fb235',
             prompt=text,
@@ -135,7 +175,7 @@ def call_with_session(text: str = '你是谁？'):
             print('%s\n session_id=%s\n' % (response.output.text, response.output.session_id))
             return response.output.text
     else:
-        responseNext = Application.call(
+        responseNext = get_application().call(
             api_key="###",
             app_id='e2eed5eed7bb4fa8a75a7b4cfc8fb235',
             prompt=text,
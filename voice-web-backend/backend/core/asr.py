@@ -4,16 +4,41 @@ from tkinter.font import names
 import dashscope
 import threading
 import time
-import pyaudio
 import queue
 from dotenv import load_dotenv
 import os
+
+from core.audio_chunker import FrameChunker
+from core.asr_metrics import ASRMetrics
+from core.asr_events import (END_OF_TURN, SENTENCE_FINAL, TurnTranscript, event_from_transcription,
+                             make_event)
+from core.audio_source import MicrophoneSource
+from core.audio_frames import analyze_chunk, SAMPLE_RATE, SAMPLE_WIDTH
+from core.recognizer_pool import TranscriptCollector, get_recognizer_pool
+from core.ring_buffer import AudioRingBuffer, RingRecorder
+from core.vad import EnergyZcrFlatnessVAD
+from emulator import get_recognizer_class
 # 加载环境变量
 
 
 
 class ASRmanager:
-    def __init__(self):
+    def __init__(self, vad=None, buffer_seconds=10.0, preroll_seconds=0.5, gated_uplink=False,
+                 keepalive_seconds=5.0, source=None, recognizer_factory=None, chunk_ms=200,
+                 barge_in_confirm_seconds=0.15):
+        """
+        Args:
+            vad: VoiceActivityDetector实例，为None时使用默认的多特征检测器
+            buffer_seconds: 采集环形缓冲区保存的音频时长
+            preroll_seconds: 新读者可回看的历史音频时长，门控模式下也作为语音起点前补发的长度
+            gated_uplink: 为True时只在VAD判定有语音时向识别器发送音频
+            keepalive_seconds: 门控模式下静音期间发送保活静音帧的间隔
+            source: AudioSource实例，为None时使用本地麦克风
+            recognizer_factory: 以回调为参数创建识别器的函数，为None时使用DashScope实时识别，
+                离线回放测试时可替换为本地模拟识别器
+            chunk_ms: 采集读取与VAD判决的块长（毫秒），配合回调采集可低至20ms
+            barge_in_confirm_seconds: 语音持续多久后触发插话回调，过短容易被咳嗽、敲击误触发
+        """
         load_dotenv('voice-web-backend/backend/.env.local')
         apiKey = os.getenv('dashscope_api_key')
 
@@ -24,27 +49,83 @@ class ASRmanager:
         self.recognized_text = None
         self.detection_thread = None
         self.asr_thread = None
+        self.sender_thread = None
+        self.recorder = None
 
         self.asr_callback = None
         self.translator = None
-
-        self.stream = None
-        self.mic = None
+        # 识别器连接状态，由回调维护，常驻服务据此决定是否重连
+        self.connected = False
+        self.last_error = None
+        # 暂停时释放输入设备但保留线程与缓冲区，恢复时无需重建
+        self.paused = False
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+        # 保护输入源的打开/关闭，避免采集线程读取时设备被其他线程关闭
+        self.source_lock = threading.Lock()
+        self.source_released = False
+
+        # 音频输入源（麦克风、WAV文件或网络推流）
+        self.source = source if source is not None else MicrophoneSource()
+        self.recognizer_factory = recognizer_factory
         
         # 新增：标记是否有新的识别结果
         self.has_new_result = False
-        # 新增：外部回调函数，用于在识别到新文本时通知外部程序
+        # 新增：外部回调函数，用于在识别到新文本时通知外部程序（只在一轮话结束时调用）
         self.external_callback = None
-
-        # 添加状态属性
+        # 识别事件回调，接收PARTIAL/SENTENCE_FINAL/END_OF_TURN事件，中间结果经过去抖
+        self.event_callback = None
+        self.partial_debounce_seconds = 0.3
+        self.last_partial_emit = 0.0
+        # 去抖窗口内被压下的最新中间结果，窗口结束时由定时器补发
+        self.pending_partial = None
+        self.partial_timer = None
+        self.partial_lock = threading.Lock()
+        self.turn_transcript = TurnTranscript()
+        # 识别回调线程与检测线程都会访问本轮文本
+        self.transcript_lock = threading.Lock()
+        # legacy_dispatches为旧逻辑下每条中间结果都会触发的对话轮次数
+        self.event_stats = {"partials": 0, "partials_emitted": 0, "sentence_finals": 0,
+                            "turns": 0, "legacy_dispatches": 0}
+
+        # 语音活动检测器
+        self.vad = vad if vad is not None else EnergyZcrFlatnessVAD()
+        # 多少秒的沉默后处理识别文本
+        self.silence_duration = 2.0
+        # 每次从输入源读取的帧数（16kHz下3200帧为200ms）
+        self.chunk_frames = int(SAMPLE_RATE * chunk_ms / 1000)
+        # 采集到VAD判决完成的延迟统计（秒）
+        self.decision_lag = {"last": 0.0, "max": 0.0, "total": 0.0, "count": 0}
+        # 采集、发送与断句的结构化计数器和直方图
+        self.metrics = ASRMetrics()
+        # 最近一个有声块的采集时间与本轮的中间结果数，用于统计断句延迟
+        self.last_voiced_at = None
+        self.turn_partials = 0
+        self.last_capture_at = None
+
+        # 插话打断：检测到语音起点且有声时长达到确认窗口后立即回调，不等识别结果
+        self.barge_in_callback = None
+        self.barge_in_confirm_seconds = barge_in_confirm_seconds
+        self.speech_run_seconds = 0.0
+        self.barge_in_fired = False
+        # 用户说完但没有识别出文本时的回调，例如插话后只是噪声或咳嗽
+        self.empty_turn_callback = None
+
+        # VAD门控上行：静音期间不发送音频，只定期发送短静音帧保持连接
+        self.gated_uplink = gated_uplink
+        self.keepalive_seconds = keepalive_seconds
+        self.keepalive_frame = bytes(int(SAMPLE_RATE * 0.1) * SAMPLE_WIDTH)
+        self.last_uplink_time = 0.0
+        # 最近一次发送的音频在环形缓冲区中的结束偏移，避免preroll重复发送
+        self.uplink_pos = 0
+        self.uplink_stats = {"sent_bytes": 0, "preroll_bytes": 0, "suppressed_bytes": 0, "keepalive_bytes": 0}
 
         self.init_asr()
-        self.audio_buffer = queue.Queue()
+        # 采集线程写入，发送线程、VAD线程和录音器各自通过独立游标读取
+        self.audio_buffer = AudioRingBuffer(capacity_seconds=buffer_seconds, preroll_seconds=preroll_seconds)
 
         # 控制线程
         self.running = True
-        self.asr_thread = threading.Thread(target=self.asr_process_loop)
-        self.detection_thread = threading.Thread(target=self.detect_user_speech)
 
     # def init_audio(self):
     #     # 初始化音频设备
@@ -67,45 +148,30 @@ class ASRmanager:
 
                 def on_open(self):
                     print("语音识别已启动")
-                    self.manager.mic = pyaudio.PyAudio()
-                    self.manager.stream = self.manager.mic.open(
-                        format=pyaudio.paInt16, channels=1, rate=16000, input=True, frames_per_buffer=3200
-                    )
+                    self.manager.connected = True
+                    try:
+                        self.manager._open_source()
+                    except Exception as e:
+                        print(f"打开音频输入源失败: {e}")
+
+                def on_error(self, message):
+                    print(f"语音识别出错: {message}")
+                    self.manager.connected = False
+                    self.manager.last_error = str(message)
 
                 def on_close(self):
+                    # 输入源由stop_asr/pause在采集线程之外安全关闭，断线期间音频继续写入缓冲区
                     print("语音识别已关闭")
-                    self.manager.stream.stop_stream()
-                    self.manager.stream.close()
-                    self.manager.mic.terminate()
-                    self.manager.stream = None
-                    self.manager.mic = None
+                    self.manager.connected = False
 
                 def on_event(self, request_id, transcription_result, translation_result, usage):
                     if transcription_result is not None:
-                        self.manager.recognized_text = transcription_result.text
-                        print(f"识别到: {self.manager.recognized_text}")
-                        
-                        # 实时识别结果也可以触发回调，但不设置has_new_result标志
-                        # 因为这时还在持续识别中，句子可能未完成
-                        if self.manager.external_callback and len(self.manager.recognized_text.strip()) > 0:
-                            try:
-                                self.manager.external_callback(self.manager.recognized_text)
-                            except Exception as e:
-                                print(f"实时识别回调错误: {e}")
-
-                        # 如果AI正在说话，打断它
-                        # if hasattr(self.manager, 'interrupt_ai') and self.manager.state == "ai_speaking":
-                        #     self.manager.interrupt_ai()
+                        event = event_from_transcription(transcription_result)
+                        self.manager.handle_transcription_event(event)
+                        print(f"识别到({event.type}): {event.text}")
 
             self.asr_callback = ASRCallback(self)
-            self.translator = dashscope.audio.asr.TranslationRecognizerRealtime(
-                model="gummy-realtime-v1",
-                format="pcm",
-                sample_rate=16000,
-                transcription_enabled=True,
-                translation_enabled=False,
-                callback=self.asr_callback,
-            )
+            self.translator = self._create_translator()
 
             # 初始化运行标志和线程
             self.running = True
@@ -114,23 +180,65 @@ class ASRmanager:
             print(f"初始化语音识别失败: {e}")
             return False
 
+    def _create_translator(self):
+        if self.recognizer_factory is not None:
+            return self.recognizer_factory(self.asr_callback)
+        return get_recognizer_class()(
+            model="gummy-realtime-v1",
+            format="pcm",
+            sample_rate=16000,
+            transcription_enabled=True,
+            translation_enabled=False,
+            callback=self.asr_callback,
+        )
+
+    def threads_alive(self):
+        return any(thread is not None and thread.is_alive()
+                   for thread in (self.asr_thread, self.detection_thread, self.sender_thread))
+
     def start_asr(self):
         """启动语音识别服务"""
         try:
             if not hasattr(self, 'translator'):
                 if not self.init_asr():
                     return False
-
+            # 线程仍在运行时不重复启动，避免同一个输入源被多个线程读取
+            if self.running and self.threads_alive():
+                return True
+
+            self.paused = False
+            self.resume_event.set()
+            # 支持回调采集的输入源直接写入环形缓冲区，不需要采集线程
+            self.last_capture_at = None
+            direct_capture = self.source.bind(self._on_captured)
+            # 停止后再次启动时识别器已被释放，需要新建
+            if self.translator is None:
+                self.translator = self._create_translator()
             self.translator.start()
+            self.running = True
+            self.audio_buffer.reopen()
 
-            # 启动处理线程
-            self.asr_thread = threading.Thread(target=self.asr_process_loop)
-            self.detection_thread = threading.Thread(target=self.detect_user_speech)
+            self.last_uplink_time = time.monotonic()
+            self.uplink_pos = self.audio_buffer.write_pos
 
-            self.asr_thread.daemon = True
+            # 读游标在线程启动前注册，保证不会漏掉第一帧
+            vad_reader = self.audio_buffer.attach("vad")
+
+            # 启动处理线程
+            self.asr_thread = None if direct_capture else threading.Thread(target=self.asr_process_loop)
+            self.detection_thread = threading.Thread(target=self.detect_user_speech, args=(vad_reader,))
             self.detection_thread.daemon = True
 
-            self.asr_thread.start()
+            # 门控模式下由检测线程根据VAD结果决定发送，不需要独立的发送线程
+            if not self.gated_uplink:
+                sender_reader = self.audio_buffer.attach("sender")
+                self.sender_thread = threading.Thread(target=self.send_audio_loop, args=(sender_reader,))
+                self.sender_thread.daemon = True
+                self.sender_thread.start()
+
+            if self.asr_thread is not None:
+                self.asr_thread.daemon = True
+                self.asr_thread.start()
             self.detection_thread.start()
 
             print("语音识别服务已启动")
@@ -139,101 +247,359 @@ class ASRmanager:
             print(f"启动语音识别服务失败: {e}")
             return False
 
-    def stop_asr(self):
-        """停止语音识别服务"""
+    def stop_asr(self, join_timeout=2.0):
+        """停止语音识别服务，等待线程退出并释放输入设备"""
         try:
             self.running = False
+            self.resume_event.set()
+            self.audio_buffer.close()
+            self.stop_recording()
             if hasattr(self, 'translator'):
-                self.translator.stop()
+                self.disconnect()
+            current = threading.current_thread()
+            for thread in (self.asr_thread, self.detection_thread, self.sender_thread):
+                if thread is not None and thread is not current:
+                    thread.join(timeout=join_timeout)
+            with self.source_lock:
+                self._release_source()
             print("语音识别服务已停止")
             return True
         except Exception as e:
             print(f"停止语音识别服务失败: {e}")
             return False
 
+    def disconnect(self):
+        """断开识别器连接，采集与检测线程保持运行"""
+        translator, self.translator = self.translator, None
+        try:
+            if translator is not None:
+                translator.stop()
+        except Exception as e:
+            print(f"断开识别器连接失败: {e}")
+        finally:
+            self.connected = False
+
+    def reconnect(self):
+        """丢弃当前识别器并建立新连接
+
+        Returns:
+            bool: 新连接是否已建立
+        """
+        self.disconnect()
+        translator = self._create_translator()
+        translator.start()
+        self.translator = translator
+        self.last_uplink_time = time.monotonic()
+        self.last_error = None
+        return self.connected
+
+    def pause(self):
+        """暂停收音：释放输入设备，线程、缓冲区和识别器连接保持不变
+
+        有采集线程时由采集线程在两次读取之间关闭设备，回调采集则直接关闭。
+        """
+        with self.source_lock:
+            if self.paused:
+                return
+            self.paused = True
+            self.resume_event.clear()
+            if self.asr_thread is None or not self.asr_thread.is_alive():
+                self._release_source()
+        self.state = "silent"
+
+    def resume(self):
+        """恢复收音：重新打开输入设备"""
+        with self.source_lock:
+            if not self.paused:
+                return
+            if self.source_released:
+                self.source.open()
+                self.source_released = False
+            self.vad.reset()
+            self.uplink_pos = self.audio_buffer.write_pos
+            self.last_capture_at = None
+            self.paused = False
+            self.resume_event.set()
+
+    def _open_source(self):
+        """识别器连接建立时打开输入源，暂停状态下保持关闭"""
+        with self.source_lock:
+            if self.paused:
+                return
+            self.source.open()
+            self.source_released = False
+
+    def _release_source(self):
+        """关闭输入源（调用方需持有source_lock）"""
+        if not self.source_released:
+            self.source.close()
+            self.source_released = True
+
+    def send_keepalive(self):
+        """向识别器发送一帧静音，保持空闲连接不被服务端关闭"""
+        self._send_to_recognizer(self.keepalive_frame)
+        self.uplink_stats["keepalive_bytes"] += len(self.keepalive_frame)
+
     def asr_process_loop(self):
         """持续处理音频数据"""
         print("音频处理线程已启动")
+        chunk_seconds = self.chunk_frames / SAMPLE_RATE
         while self.running:
+            if self.paused:
+                # 在两次读取之间释放设备，然后等待恢复
+                with self.source_lock:
+                    if self.paused:
+                        self._release_source()
+                self.resume_event.wait(0.5)
+                continue
             try:
-                # if self.stream is None or self.mic is None:
-                #     self.init_asr()
-                #
-                # if self.audio_buffer.empty():
-                #     time.sleep(0.5)
-                #     continue
-
-                data = self.stream.read(3200, exception_on_overflow=False)
-                self.audio_buffer.put(data)
-                self.translator.send_audio_frame(data)
+                read_start = time.monotonic()
+                data = self.source.read(self.chunk_frames)
+                if not data:
+                    if data is None:
+                        # 文件或网络输入结束后不再读取
+                        if self.source.finished:
+                            print("音频输入源已结束")
+                            break
+                        time.sleep(0.05)
+                    self.last_capture_at = None
+                    continue
+                # 两次读取之间采集线程没有在读设备的时间过长，设备缓冲区可能溢出
+                if self.last_capture_at is not None and read_start - self.last_capture_at > chunk_seconds:
+                    self.metrics.inc("late_reads")
+                self._on_captured(data, time.monotonic())
 
             except Exception as e:
                 print(f"处理音频数据错误: {e}")
                 time.sleep(0.1)
 
-    def detect_user_speech(self):
+    def _on_captured(self, data, captured_at):
+        """写入一段采集到的音频并更新采集指标，captured_at供检测线程计算判决延迟"""
+        self.audio_buffer.write(data, captured_at)
+        self.metrics.inc("frames_captured", len(data) // SAMPLE_WIDTH)
+        self.metrics.inc("chunks_captured")
+        if self.last_capture_at is not None:
+            self.metrics.observe("capture_interval_ms", (captured_at - self.last_capture_at) * 1000)
+        self.last_capture_at = captured_at
+
+    def send_audio_loop(self, reader):
+        """从环形缓冲区读取音频并发送给识别器"""
+        print("音频发送线程已启动")
+        chunk_bytes = self.chunk_frames * SAMPLE_WIDTH
+        try:
+            while self.running:
+                try:
+                    data = reader.read(chunk_bytes, timeout=0.5)
+                    if data is None:
+                        continue
+                    self._observe_queue_depth(reader)
+                    self._send_to_recognizer(data)
+                    self.uplink_stats["sent_bytes"] += len(data)
+                except Exception as e:
+                    print(f"发送音频数据错误: {e}")
+                    time.sleep(0.1)
+        finally:
+            reader.detach()
+
+    def detect_user_speech(self, reader=None):
         """检测用户是否开始说话"""
         print("检测用户语音线程已启动")
-        silence_threshold = 500  # 静音阈值，需根据实际环境调整
-        silence_frames = 0
-        talking_frames = 0
-        silence_duration = 2.0  # 多少秒的沉默后处理识别文本
-        silence_frames_limit = int(silence_duration / 0.05)  # 以50ms为单位的帧数
+        silence_seconds = 0.0
+        if reader is None:
+            reader = self.audio_buffer.attach("vad")
+        # 预分配读缓冲区，VAD直接在其上做零拷贝分析
+        chunk_buffer = bytearray(self.chunk_frames * SAMPLE_WIDTH)
+        chunk_view = memoryview(chunk_buffer)
 
         while self.running:
             try:
-                if self.audio_buffer.empty():
-                    time.sleep(0.1)
+                # 阻塞等待下一帧到达，超时只用于检查running标志
+                count = reader.read_into(chunk_buffer, timeout=0.5)
+                if count == 0:
                     continue
-
-                audio_data = self.audio_buffer.get()
-                volume = sum(abs(int.from_bytes(audio_data[i:i + 2], 'little', signed=True))
-                             for i in range(0, len(audio_data), 2)) / (len(audio_data) / 2)
-                print(f"volume: {volume:.4f}      ")
-                # 根据音量判断用户是否在说话
-                if volume > silence_threshold:
-                    talking_frames += 1
-                    silence_frames = 0
-                    if talking_frames > 3:  # 连续3帧以上有声音才认为是说话开始
-                        print(f"检测到用户说话，音量: {volume}")
-
-                        # if self.state == "ai_speaking":
-                        #     print("检测到用户说话，打断AI...")
-                        #     self.interrupt_ai()
-                        self.state = "user_speaking"
+                audio_data = chunk_view[:count]
+                captured_at = reader.last_timestamp
+                self._observe_queue_depth(reader)
+
+                # 向量化计算整段音量，平均绝对幅度与原阈值保持同一量纲
+                level = analyze_chunk(audio_data)
+                chunk_seconds = level.samples / SAMPLE_RATE
+                result = self.vad.process(audio_data)
+                if self.gated_uplink:
+                    self._gate_uplink(result, audio_data, reader.pos)
+                # 根据VAD结果判断用户是否在说话
+                if result.is_speech:
+                    silence_seconds = 0.0
+                    self.last_voiced_at = captured_at
+                    # 按VAD子帧累计本段语音的有声时长
+                    voiced_seconds = chunk_seconds * result.voiced_frames / result.frames if result.frames else 0.0
+                    if result.onset:
+                        print(f"检测到用户说话，音量: {level.dbfs:.1f} dBFS")
+                        # 起点判决前VAD已经累计了一段有声音频，确认窗口从真正开口时算起
+                        self.speech_run_seconds = max(voiced_seconds, self.vad.onset_seconds)
+                        self.barge_in_fired = False
+                    else:
+                        self.speech_run_seconds += voiced_seconds
+                    self._check_barge_in(captured_at)
+                    self.state = "user_speaking"
                 else:
-                    silence_frames += 1
-                    talking_frames = 0
+                    silence_seconds += chunk_seconds
 
                     # 如果用户停止讲话超过设定的时间，并且之前状态是用户讲话
-                    if silence_frames > silence_frames_limit and self.state == "user_speaking":
-                        print(f"检测到用户停止说话，沉默帧数: {silence_frames}")
+                    if silence_seconds > self.silence_duration and self.state == "user_speaking":
+                        print(f"检测到用户停止说话，沉默时长: {silence_seconds:.2f}s")
                         print(f"当前识别文本: '{self.recognized_text}'")                        # 如果有识别到的文本，则处理
                         if self.recognized_text and len(self.recognized_text.strip()) > 0:
-                            self.recognized_content = self.recognized_text.strip()
-                            print("处理识别到的文本: ", self.recognized_content)
-                            # 设置新结果标志
-                            self.has_new_result = True
-                            # 如果设置了外部回调，则调用
-                            if self.external_callback:
-                                try:
-                                    self.external_callback(self.recognized_content)
-                                except Exception as e:
-                                    print(f"调用外部回调函数时出错: {e}")
-                            # 不再返回结果，让外部调用获取方法来获取结果
+                            self.end_turn()
+                        elif self.empty_turn_callback:
+                            try:
+                                self.empty_turn_callback()
+                            except Exception as e:
+                                print(f"空轮次回调错误: {e}")
 
                         self.state = "silent"
 
-                time.sleep(0.05)
+                if captured_at is not None:
+                    self._record_decision_lag(time.monotonic() - captured_at)
             except Exception as e:
                 print(f"检测用户语音错误: {e}")
                 time.sleep(0.1)
+        reader.detach()
+
+    def _gate_uplink(self, result, audio_data, end_pos):
+        """根据VAD结果决定是否把当前音频块发送给识别器
+
+        语音起点时连同preroll窗口一起发送，避免首字被截断；语音结束的那一块也会发送，
+        保留尾音供识别器断句。静音期间按keepalive_seconds间隔发送短静音帧保持连接。
+        """
+        stats = self.uplink_stats
+        now = time.monotonic()
+        try:
+            if result.onset:
+                size = max(self.audio_buffer.preroll_bytes, len(audio_data))
+                size = min(size, end_pos - self.uplink_pos)
+                data = self.audio_buffer.get_preroll(end_pos, size)
+                self._send_to_recognizer(data)
+                stats["sent_bytes"] += len(data)
+                stats["preroll_bytes"] += len(data) - len(audio_data)
+                stats["suppressed_bytes"] -= len(data) - len(audio_data)
+                self.last_uplink_time = now
+                self.uplink_pos = end_pos
+            elif result.is_speech or result.offset:
+                self._send_to_recognizer(bytes(audio_data))
+                stats["sent_bytes"] += len(audio_data)
+                self.last_uplink_time = now
+                self.uplink_pos = end_pos
+            else:
+                stats["suppressed_bytes"] += len(audio_data)
+                if now - self.last_uplink_time >= self.keepalive_seconds:
+                    self._send_to_recognizer(self.keepalive_frame)
+                    stats["keepalive_bytes"] += len(self.keepalive_frame)
+                    self.last_uplink_time = now
+        except Exception as e:
+            print(f"门控发送音频数据错误: {e}")
+
+    def get_uplink_stats(self):
+        """获取上行发送统计，saved_bytes为门控节省的字节数"""
+        stats = dict(self.uplink_stats)
+        stats["saved_bytes"] = stats["suppressed_bytes"] - stats["keepalive_bytes"]
+        stats["gated"] = self.gated_uplink
+        return stats
+
+    def _check_barge_in(self, captured_at):
+        """有声时长达到确认窗口时触发一次插话回调，参数为估计的说话起始时间"""
+        if self.barge_in_fired or self.barge_in_callback is None:
+            return
+        if self.speech_run_seconds < self.barge_in_confirm_seconds:
+            return
+        self.barge_in_fired = True
+        speech_started_at = (captured_at or time.monotonic()) - self.speech_run_seconds
+        try:
+            self.barge_in_callback(speech_started_at)
+        except Exception as e:
+            print(f"插话回调错误: {e}")
 
-    def process_one_time_audio(self, audio_data):
+    def set_barge_in_callback(self, callback_function):
+        """设置插话回调，用户开始说话并通过确认窗口后在检测线程中调用"""
+        self.barge_in_callback = callback_function
+
+    def set_empty_turn_callback(self, callback_function):
+        """设置空轮次回调，用户停止说话但本轮没有识别文本时在检测线程中调用"""
+        self.empty_turn_callback = callback_function
+
+    def _send_to_recognizer(self, data):
+        """向识别器发送一段音频并记录发送耗时，失败时计数后继续抛出"""
+        started = time.monotonic()
+        try:
+            self.translator.send_audio_frame(data)
+        except Exception:
+            self.metrics.inc("recognizer_send_errors")
+            self.connected = False
+            raise
+        self.last_uplink_time = started
+        self.metrics.observe("send_latency_ms", (time.monotonic() - started) * 1000)
+        self.metrics.inc("recognizer_sends")
+        self.metrics.inc("recognizer_send_bytes", len(data))
+
+    def _observe_queue_depth(self, reader):
+        """记录读者读取后缓冲区中仍积压的音频时长"""
+        self.metrics.observe("queue_depth_ms", reader.available() / self.audio_buffer.bytes_per_second * 1000)
+
+    def get_metrics(self):
+        """获取采集、发送与断句的计数器和直方图"""
+        snapshot = self.metrics.snapshot()
+        snapshot["source_overflows"] = self.source.overflows
+        snapshot["buffer"] = self.get_buffer_stats()
+        snapshot["decision_lag"] = self.get_decision_lag()
+        return snapshot
+
+    def _record_decision_lag(self, lag):
+        """记录一次从采集到判决完成的延迟"""
+        stats = self.decision_lag
+        stats["last"] = lag
+        stats["max"] = max(stats["max"], lag)
+        stats["total"] += lag
+        stats["count"] += 1
+
+    def start_recording(self, file_path):
+        """把采集到的音频同时录制到WAV文件，录音从preroll窗口起点开始"""
+        self.stop_recording()
+        self.recorder = RingRecorder(self.audio_buffer, file_path, self.chunk_frames * SAMPLE_WIDTH)
+        self.recorder.start()
+
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.stop()
+            self.recorder = None
+
+    def get_buffer_stats(self):
+        """获取采集缓冲区各读者的积压与溢出统计"""
+        return self.audio_buffer.stats()
+
+    def get_decision_lag(self):
+        """获取采集到判决的延迟统计
+
+        Returns:
+            dict: 最近一次、最大和平均延迟（毫秒），以及一帧的时长（毫秒）用于对比
+        """
+        stats = self.decision_lag
+        count = stats["count"]
+        return {
+            "last_ms": stats["last"] * 1000,
+            "max_ms": stats["max"] * 1000,
+            "avg_ms": stats["total"] / count * 1000 if count else 0.0,
+            "count": count,
+            "frame_ms": self.chunk_frames / SAMPLE_RATE * 1000,
+        }
+
+    def process_one_time_audio(self, audio_data, timeout=5.0, realtime=False, on_partial=None):
         """处理一次性发送的音频数据进行识别
 
         Args:
             audio_data: Base64编码的音频数据
+            timeout: 音频发送完成后等待识别完成的最长时间（秒）
+            realtime: 为True时按实时速度分帧发送，否则尽快发送
+            on_partial: 中间结果回调，参数为(sentence_id, text, is_sentence_end)
 
         Returns:
             dict: 包含识别状态和识别文本的字典
@@ -242,77 +608,103 @@ class ASRmanager:
             print("处理一次性音频数据...:", audio_data[:50])
             # 将Base64编码的音频转换为二进制
             binary_audio = base64.b64decode(audio_data)
-
-            # 创建存储结果的容器和事件
-            result = {"text": ""}
-            recognition_done = threading.Event()
-
-            def process_audio_thread():
-                try:
-                    # 创建临时回调
-                    class TempCallback(dashscope.audio.asr.TranslationRecognizerCallback):
-                        def __init__(self):
-                            self.collected_text = ""
-
-                        def on_event(self, request_id, transcription_result, translation_result, usage):
-                            if transcription_result is not None:
-                                self.collected_text = transcription_result.text
-                                print(f"临时识别器识别到: {self.collected_text}")
-
-                        def on_error(self, err):
-                            print(f"临时识别器错误: {err}")
-                            recognition_done.set()
-
-                        def on_close(self):
-                            recognition_done.set()
-
-                    callback = TempCallback()
-
-                    # 创建临时翻译器
-                    translator = dashscope.audio.asr.TranslationRecognizerRealtime(
-                        model="gummy-realtime-v1",
-                        format="pcm",
-                        sample_rate=16000,
-                        transcription_enabled=True,
-                        translation_enabled=False,
-                        callback=callback,
-                    )
-
-                    # 开始识别
-                    translator.start()
-                    translator.send_audio_frame(binary_audio)
-
-                    # 等待一段时间以确保识别完成
-                    time.sleep(2.0)
-
-                    # 保存结果并清理
-                    result["text"] = callback.collected_text
-                    translator.stop()
-
-                except Exception as e:
-                    print(f"临时音频识别线程错误: {e}")
-                finally:
-                    # 标记识别完成
-                    recognition_done.set()
-
-            # 启动临时识别线程
-            thread = threading.Thread(target=process_audio_thread)
-            thread.daemon = True
-            thread.start()
-
-            # 等待识别完成或超时
-            if not recognition_done.wait(timeout=5.0):
-                print("一次性音频识别超时")
-
-            return {
-                "status": "success",
-                "message": "一次性音频数据已处理",
-                "recognized_text": result["text"]
-            }
+            return recognize_audio(binary_audio, timeout=timeout, realtime=realtime, on_partial=on_partial)
         except Exception as e:
             print(f"处理一次性音频数据错误: {e}")
             return {"status": "error", "message": str(e)}
 
+    def handle_transcription_event(self, event):
+        """处理识别器的中间结果/整句结果事件，只更新文本并通知UI，不触发对话轮次"""
+        stats = self.event_stats
+        with self.transcript_lock:
+            self.turn_transcript.update(event)
+            self.recognized_text = self.turn_transcript.text
+        if event.text and event.text.strip():
+            stats["legacy_dispatches"] += 1
+
+        if event.type == SENTENCE_FINAL:
+            stats["sentence_finals"] += 1
+            # 整句结果包含更新的文本，窗口内压下的中间结果不再补发
+            self._drop_pending_partial()
+            self._emit_event(event)
+            return
+
+        stats["partials"] += 1
+        self.turn_partials += 1
+        self.metrics.inc("partial_events")
+        with self.partial_lock:
+            now = time.monotonic()
+            wait = self.last_partial_emit + self.partial_debounce_seconds - now
+            if wait > 0:
+                # 窗口内只记下最新的一条，窗口结束时补发，界面不会停在过时的中间结果上
+                self.pending_partial = event
+                if self.partial_timer is None:
+                    self.partial_timer = threading.Timer(wait, self._flush_pending_partial)
+                    self.partial_timer.daemon = True
+                    self.partial_timer.start()
+                return
+            self.last_partial_emit = now
+            stats["partials_emitted"] += 1
+        self._emit_event(event)
+
+    def _flush_pending_partial(self):
+        with self.partial_lock:
+            event, self.pending_partial = self.pending_partial, None
+            self.partial_timer = None
+            if event is None:
+                return
+            self.last_partial_emit = time.monotonic()
+            self.event_stats["partials_emitted"] += 1
+        self._emit_event(event)
+
+    def _drop_pending_partial(self):
+        with self.partial_lock:
+            self.pending_partial = None
+            if self.partial_timer is not None:
+                self.partial_timer.cancel()
+                self.partial_timer = None
+
+    def end_turn(self):
+        """一轮话结束：设置结果、通知外部回调并清空本轮文本"""
+        with self.transcript_lock:
+            self.recognized_content = self.recognized_text.strip()
+            self.turn_transcript.reset()
+            self.recognized_text = None
+        print("处理识别到的文本: ", self.recognized_content)
+        # 设置新结果标志
+        self.has_new_result = True
+        self.event_stats["turns"] += 1
+        self.metrics.inc("turns")
+        self.metrics.observe("partials_per_turn", self.turn_partials)
+        self.turn_partials = 0
+        self._drop_pending_partial()
+        self._emit_event(make_event(END_OF_TURN, self.recognized_content))
+        if self.last_voiced_at is not None:
+            self.metrics.observe("endpoint_latency_ms", (time.monotonic() - self.last_voiced_at) * 1000)
+        # 如果设置了外部回调，则调用
+        if self.external_callback:
+            try:
+                self.external_callback(self.recognized_content)
+            except Exception as e:
+                print(f"调用外部回调函数时出错: {e}")
+
+    def _emit_event(self, event):
+        if self.event_callback:
+            try:
+                self.event_callback(event)
+            except Exception as e:
+                print(f"识别事件回调错误: {e}")
+
+    def set_event_callback(self, callback_function):
+        """设置识别事件回调，回调参数为ASREvent"""
+        self.event_callback = callback_function
+
+    def get_event_stats(self):
+        """获取识别事件统计，saved_dispatches为相比每条中间结果都触发对话所节省的轮次数"""
+        stats = dict(self.event_stats)
+        stats["saved_dispatches"] = stats["legacy_dispatches"] - stats["turns"]
+        return stats
+
     def get_recognized_text(self):
         """获取当前识别的文本，如果有新的识别结果会重置标志
         
@@ -336,7 +728,7 @@ class ASRmanager:
         """设置文本识别回调函数
         
         Args:
-            callback_function: 当识别到新文本时要调用的回调函数，
+            callback_function: 当用户说完一轮话时要调用的回调函数，
                               该函数应接受一个参数（识别的文本）
         """
         self.external_callback = callback_function
@@ -346,6 +738,82 @@ class ASRmanager:
         self.recognized_text = None
         self.recognized_content = None
         self.has_new_result = False
+        self.turn_transcript.reset()
+        self._drop_pending_partial()
+        self.vad.reset()
+
+
+def recognize_audio(pcm_data, timeout=5.0, realtime=False, on_partial=None, frame_ms=100):
+    """识别一段完整的16kHz单声道PCM音频
+
+    从识别器连接池借用预先启动的连接，分帧发送后结束任务，
+    识别器返回最后一句结果（on_complete）时立即返回，不再固定等待。
+
+    Args:
+        pcm_data: 16bit小端PCM数据
+        timeout: 音频发送完成后等待识别完成的最长时间（秒）
+        realtime: 为True时按实时速度发送，模拟麦克风输入
+        on_partial: 中间结果回调，参数为(sentence_id, text, is_sentence_end)
+        frame_ms: 每帧时长（毫秒）
+
+    Returns:
+        dict: 包含识别状态和识别文本的字典
+    """
+    collector = TranscriptCollector(on_partial=on_partial)
+    chunker = FrameChunker(frame_ms=frame_ms, realtime=realtime)
+    session = get_recognizer_pool().acquire(handler=collector)
+
+    def finish_recognition():
+        try:
+            chunker.submit(session.recognizer.send_audio_frame, pcm_data, stop_event=collector.done)
+            # stop会等待服务端返回全部结果后才返回
+            session.stop()
+        except Exception as e:
+            print(f"一次性音频识别线程错误: {e}")
+        finally:
+            collector.done.set()
+
+    thread = threading.Thread(target=finish_recognition)
+    thread.daemon = True
+    thread.start()
+
+    # 实时节流时发送本身就要花费音频时长
+    wait_seconds = timeout + (chunker.duration(pcm_data) if realtime else 0)
+    if not collector.done.wait(timeout=wait_seconds):
+        print("一次性音频识别超时")
+    if collector.error:
+        return {"status": "error", "message": str(collector.error), "recognized_text": collector.text}
+
+    return {
+        "status": "success",
+        "message": "一次性音频数据已处理",
+        "recognized_text": collector.text
+    }
+
+
+def stream_recognize_audio(pcm_data, timeout=5.0, realtime=False):
+    """识别一段PCM音频，边识别边产出中间结果
+
+    Yields:
+        dict: 中间结果 {"type": "partial", ...}，最后一条为 {"type": "result", ...}
+    """
+    events = queue.Queue()
+
+    def on_partial(sentence_id, text, is_final):
+        events.put({"type": "partial", "sentence_id": sentence_id, "text": text, "is_final": is_final})
+
+    def run():
+        events.put(dict(recognize_audio(pcm_data, timeout, realtime, on_partial), type="result"))
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+
+    while True:
+        event = events.get()
+        yield event
+        if event["type"] == "result":
+            break
 
 
 if __name__ == "__main__":
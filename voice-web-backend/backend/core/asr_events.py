@@ -0,0 +1,60 @@
+import time
+from collections import namedtuple
+
+# 事件类型
+PARTIAL = "partial"                # 句子尚未结束的中间结果
+SENTENCE_FINAL = "sentence_final"  # 识别器标记is_sentence_end的整句结果
+END_OF_TURN = "end_of_turn"        # VAD检测到用户说完一轮话，text为整轮文本
+
+ASREvent = namedtuple("ASREvent", ["type", "text", "sentence_id", "stash", "timestamp"])
+
+
+def make_event(event_type, text, sentence_id=None, stash=None):
+    return ASREvent(event_type, text, sentence_id, stash, time.monotonic())
+
+
+def event_from_transcription(transcription_result):
+    """把SDK的TranscriptionResult转换为PARTIAL或SENTENCE_FINAL事件"""
+    is_final = bool(getattr(transcription_result, "is_sentence_end", False))
+    stash = getattr(transcription_result, "stash", None)
+    stash_text = getattr(stash, "text", None) if stash is not None else None
+    return make_event(
+        SENTENCE_FINAL if is_final else PARTIAL,
+        transcription_result.text,
+        getattr(transcription_result, "sentence_id", None),
+        stash_text,
+    )
+
+
+class TurnTranscript:
+    """拼接一轮对话中的多句识别结果
+
+    已结束的句子按sentence_id保存，未结束的句子只保留最新的中间结果。
+    """
+
+    def __init__(self):
+        self.final_sentences = {}
+        self.partial_id = None
+        self.partial_text = ""
+
+    def update(self, event):
+        if event.type == SENTENCE_FINAL:
+            self.final_sentences[event.sentence_id] = event.text
+            if self.partial_id == event.sentence_id:
+                self.partial_id = None
+                self.partial_text = ""
+        elif event.type == PARTIAL:
+            self.partial_id = event.sentence_id
+            self.partial_text = event.text
+
+    @property
+    def text(self):
+        parts = [self.final_sentences[key] for key in sorted(self.final_sentences, key=lambda k: (k is None, k))]
+        if self.partial_text and self.partial_id not in self.final_sentences:
+            parts.append(self.partial_text)
+        return "".join(part for part in parts if part)
+
+    def reset(self):
+        self.final_sentences = {}
+        self.partial_id = None
+        self.partial_text = ""
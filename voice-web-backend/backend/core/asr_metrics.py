@@ -0,0 +1,102 @@
+import bisect
+import threading
+
+# 毫秒级延迟直方图的默认桶上界
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+# 每轮中间结果数的桶上界
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """固定桶直方图，记录次数、总和与最值，分位数按桶上界近似"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        # 最后一个桶收集超过所有上界的值
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        labels = [f"le_{bound}" for bound in self.buckets] + ["inf"]
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 2) if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class ASRMetrics:
+    """一个识别会话的结构化计数器与直方图
+
+    计数器:
+        frames_captured / chunks_captured: 从输入源读到的采样帧数与块数
+        late_reads: 一次读取结束到下一次读取开始超过一个块时长的次数，说明采集线程被阻塞
+        recognizer_sends / recognizer_send_bytes / recognizer_send_errors: 向识别器发送音频
+        partial_events / turns: 识别中间结果事件与结束的对话轮次
+    直方图（毫秒，partials_per_turn除外）:
+        capture_interval_ms: 相邻两次读取输入源的间隔
+        queue_depth_ms: 发送/检测线程读取后缓冲区中仍积压的音频时长
+        send_latency_ms: 单次send_audio_frame调用耗时
+        endpoint_latency_ms: 最后一个有声块采集完成到调用external_callback的时间
+        partials_per_turn: 每轮收到的中间结果事件数
+    """
+
+    COUNTERS = ("frames_captured", "chunks_captured", "late_reads", "recognizer_sends",
+                "recognizer_send_bytes", "recognizer_send_errors", "partial_events", "turns")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.histograms = {
+            "capture_interval_ms": Histogram(),
+            "queue_depth_ms": Histogram(),
+            "send_latency_ms": Histogram(),
+            "endpoint_latency_ms": Histogram(),
+            "partials_per_turn": Histogram(COUNT_BUCKETS),
+        }
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, name, value):
+        with self._lock:
+            self.histograms[name].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters = dict.fromkeys(self.COUNTERS, 0)
+            for histogram in self.histograms.values():
+                histogram.__init__(histogram.buckets)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            }
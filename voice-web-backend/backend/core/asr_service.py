@@ -0,0 +1,168 @@
+import threading
+import time
+
+
+class ASRService:
+    """常驻语音识别服务
+
+    整个进程只创建一次ASRmanager，开关收音只是暂停/恢复输入设备，线程、缓冲区和识别器
+    连接都保留，切换几乎是即时的。后台监督线程负责：
+        - 收音期间连接断开时按指数退避重连
+        - 连接空闲（暂停或门控静音）时按heartbeat_seconds发送静音帧保活
+        - 暂停超过idle_timeout后主动断开连接，恢复收音时再重连
+
+    Args:
+        manager_factory: 无参函数，返回新的ASRmanager
+        heartbeat_seconds: 连接空闲多久后发送一次保活帧
+        idle_timeout: 暂停多久后断开识别器连接
+        backoff_initial / backoff_max: 重连退避的初始与最大间隔（秒）
+        check_interval: 监督线程的检查间隔（秒）
+    """
+
+    def __init__(self, manager_factory, heartbeat_seconds=5.0, idle_timeout=60.0, backoff_initial=0.5,
+                 backoff_max=30.0, check_interval=0.5):
+        self.manager_factory = manager_factory
+        self.heartbeat_seconds = heartbeat_seconds
+        self.idle_timeout = idle_timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.check_interval = check_interval
+
+        self.manager = None
+        # stopped / listening / paused / idle（暂停且已断开连接）
+        self.state = "stopped"
+        self.paused_at = None
+        self.lock = threading.RLock()
+        self.stop_event = threading.Event()
+        self.supervisor = None
+
+        self.failures = 0
+        self.next_attempt = 0.0
+        self.stats = {"starts": 0, "pauses": 0, "resumes": 0, "reconnects": 0, "reconnect_failures": 0,
+                      "heartbeats": 0, "idle_closes": 0, "last_toggle_ms": 0.0}
+
+    def start(self):
+        """开始收音，首次调用时创建并启动识别管理器，之后只是恢复
+
+        Returns:
+            ASRmanager: 常驻的识别管理器
+        """
+        started = time.monotonic()
+        with self.lock:
+            if self.manager is None:
+                self.manager = self.manager_factory()
+            if self.state == "stopped":
+                if not self.manager.start_asr():
+                    raise RuntimeError("启动语音识别服务失败")
+                self.stats["starts"] += 1
+                self._ensure_supervisor()
+            elif self.state in ("paused", "idle"):
+                if not self.manager.connected:
+                    self._reconnect()
+                self.manager.resume()
+                self.stats["resumes"] += 1
+            self.state = "listening"
+            self.paused_at = None
+        self.stats["last_toggle_ms"] = (time.monotonic() - started) * 1000
+        return self.manager
+
+    def pause(self):
+        """停止收音并释放输入设备，识别器连接保留到空闲超时"""
+        started = time.monotonic()
+        with self.lock:
+            if self.state != "listening":
+                return
+            self.manager.pause()
+            self.state = "paused"
+            self.paused_at = time.monotonic()
+            self.stats["pauses"] += 1
+        self.stats["last_toggle_ms"] = (time.monotonic() - started) * 1000
+
+    def stop(self):
+        """彻底停止：结束监督线程，等待识别线程退出并释放设备和连接"""
+        self.stop_event.set()
+        if self.supervisor is not None and self.supervisor is not threading.current_thread():
+            self.supervisor.join(timeout=self.check_interval * 4)
+        self.supervisor = None
+        with self.lock:
+            if self.manager is not None:
+                self.manager.stop_asr()
+            self.state = "stopped"
+            self.paused_at = None
+
+    def _ensure_supervisor(self):
+        if self.supervisor is None or not self.supervisor.is_alive():
+            self.stop_event.clear()
+            self.supervisor = threading.Thread(target=self._supervise)
+            self.supervisor.daemon = True
+            self.supervisor.start()
+
+    def _reconnect(self):
+        """重连识别器（调用方需持有lock），失败或连接未建立时按指数退避安排下一次尝试"""
+        try:
+            connected = self.manager.reconnect()
+            error = None if connected else self.manager.last_error or "连接未建立"
+        except Exception as e:
+            error = e
+        if error is None:
+            self.failures = 0
+            self.stats["reconnects"] += 1
+            print("语音识别已重连")
+            return True
+
+        self.failures += 1
+        self.stats["reconnect_failures"] += 1
+        delay = min(self.backoff_max, self.backoff_initial * 2 ** (self.failures - 1))
+        self.next_attempt = time.monotonic() + delay
+        print(f"语音识别重连失败（第{self.failures}次），{delay:.1f}秒后重试: {error}")
+        return False
+
+    def _supervise(self):
+        print("语音识别监督线程已启动")
+        while not self.stop_event.wait(self.check_interval):
+            try:
+                with self.lock:
+                    self._check()
+            except Exception as e:
+                print(f"语音识别监督线程错误: {e}")
+
+    def _check(self):
+        manager = self.manager
+        now = time.monotonic()
+        if self.state == "listening":
+            if not manager.connected and now >= self.next_attempt:
+                self._reconnect()
+        elif self.state == "paused" and now - self.paused_at >= self.idle_timeout:
+            print("收音暂停超时，断开识别器连接")
+            manager.disconnect()
+            self.state = "idle"
+            self.stats["idle_closes"] += 1
+            return
+
+        if manager.connected and now - manager.last_uplink_time >= self.heartbeat_seconds:
+            try:
+                manager.send_keepalive()
+                self.stats["heartbeats"] += 1
+            except Exception as e:
+                print(f"发送保活帧失败: {e}")
+
+    @property
+    def listening(self):
+        """是否正在收音；暂停后manager仍保留，不能据此判断"""
+        return self.state == "listening"
+
+    @property
+    def connected(self):
+        return bool(self.manager and self.manager.connected)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["state"] = self.state
+        stats["connected"] = self.connected
+        stats["consecutive_failures"] = self.failures
+        stats["last_error"] = self.manager.last_error if self.manager else None
+        threads = [self.supervisor]
+        if self.manager is not None:
+            threads += [self.manager.asr_thread, self.manager.detection_thread, self.manager.sender_thread]
+        stats["alive_threads"] = sum(1 for thread in threads if thread is not None and thread.is_alive())
+        return stats
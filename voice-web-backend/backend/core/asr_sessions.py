@@ -0,0 +1,176 @@
+import threading
+import time
+import uuid
+from collections import deque
+
+from core.asr import ASRmanager
+from core.asr_events import END_OF_TURN
+from core.audio_ingest import IngestStream
+from core.audio_source import StreamAudioSource
+
+
+class ASRSession:
+    """一个网络客户端的识别会话，拥有独立的识别器、VAD和音频缓冲"""
+
+    def __init__(self, session_id, manager, source):
+        self.session_id = session_id
+        self.manager = manager
+        self.source = source
+        self.created_at = time.time()
+        self.last_active = time.monotonic()
+        # 最近的识别结果
+        self.results = deque(maxlen=50)
+        # 识别事件监听器，参数为ASREvent
+        self.listeners = []
+        self.manager.set_event_callback(self._on_event)
+        # 编码音频（webm/opus、wav）的增量解码流，第一次feed时创建
+        self.ingest = None
+
+    def _on_event(self, event):
+        if event.type == END_OF_TURN:
+            self.last_active = time.monotonic()
+            self.results.append({"text": event.text, "time": time.strftime("%Y-%m-%d %H:%M:%S")})
+        for listener in list(self.listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"会话{self.session_id}结果监听器出错: {e}")
+
+    def push(self, data):
+        """推送客户端采集的16kHz单声道PCM数据"""
+        self.last_active = time.monotonic()
+        self.source.push(data)
+
+    def feed(self, data, content_type=None):
+        """推送客户端上传的任意格式音频，首个分片决定格式，之后增量解码为PCM"""
+        self.last_active = time.monotonic()
+        if self.ingest is None:
+            self.ingest = IngestStream(self.source.push, content_type)
+        self.ingest.feed(data)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def idle_seconds(self):
+        return time.monotonic() - self.last_active
+
+    def close(self):
+        self.listeners.clear()
+        if self.ingest is not None:
+            self.ingest.close()
+        self.source.close()
+        self.manager.stop_asr()
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created_at)),
+            "idle_seconds": round(self.idle_seconds(), 1),
+            "state": self.manager.state,
+            "results": list(self.results),
+            "partial_text": self.manager.recognized_text,
+            "event_stats": self.manager.get_event_stats(),
+        }
+
+    def get_metrics(self):
+        metrics = self.manager.get_metrics()
+        if self.ingest is not None:
+            metrics["ingest"] = {"format": self.ingest.format, "received_bytes": self.ingest.received_bytes,
+                                 "decoded_bytes": self.ingest.decoded_bytes}
+        return metrics
+
+
+class ASRSessionRegistry:
+    """管理多个并发识别会话，空闲超时的会话会被自动关闭"""
+
+    def __init__(self, max_sessions=32, idle_seconds=120.0, reap_interval=10.0):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.reap_interval = reap_interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def create(self, session_id=None, **manager_kwargs):
+        """创建并启动一个新的识别会话
+
+        Args:
+            session_id: 会话ID，为None时自动生成
+            manager_kwargs: 传给ASRmanager的其他参数（如vad、gated_uplink）
+
+        Returns:
+            ASRSession: 已启动的会话
+        """
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise RuntimeError(f"识别会话数已达上限: {self.max_sessions}")
+            session_id = session_id or uuid.uuid4().hex
+            if session_id in self._sessions:
+                raise ValueError(f"识别会话已存在: {session_id}")
+            source = StreamAudioSource()
+            manager = ASRmanager(source=source, **manager_kwargs)
+            session = ASRSession(session_id, manager, source)
+            self._sessions[session_id] = session
+            self._ensure_reaper()
+
+        if not manager.start_asr():
+            self.close(session_id)
+            raise RuntimeError("启动识别会话失败")
+        print(f"识别会话已创建: {session_id}")
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.close()
+        print(f"识别会话已关闭: {session_id}")
+        return True
+
+    def list_sessions(self):
+        with self._lock:
+            return [session.to_dict() for session in self._sessions.values()]
+
+    def close_all(self):
+        with self._lock:
+            session_ids = list(self._sessions)
+        for session_id in session_ids:
+            self.close(session_id)
+
+    def _ensure_reaper(self):
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(target=self._reap_loop)
+            self._reaper.daemon = True
+            self._reaper.start()
+
+    def _reap_loop(self):
+        """定期关闭空闲超时的会话"""
+        while True:
+            time.sleep(self.reap_interval)
+            with self._lock:
+                expired = [sid for sid, session in self._sessions.items()
+                           if session.idle_seconds() > self.idle_seconds]
+            for session_id in expired:
+                print(f"识别会话空闲超时: {session_id}")
+                self.close(session_id)
+
+
+# 单例模式
+asr_session_registry = None
+
+
+def get_asr_session_registry():
+    """获取识别会话注册表单例"""
+    global asr_session_registry
+    if asr_session_registry is None:
+        asr_session_registry = ASRSessionRegistry()
+    return asr_session_registry
@@ -0,0 +1,56 @@
+import time
+
+from core.audio_frames import SAMPLE_RATE, SAMPLE_WIDTH
+
+
+class FrameChunker:
+    """把整段PCM切分为识别器大小的帧并按需节流发送
+
+    realtime=True时按音频时长节流（可用speed加速），模拟麦克风实时输入；
+    realtime=False时尽快发送，每帧在send返回（被接受）后立即发送下一帧。
+    切分使用memoryview，不复制原始数据。
+    """
+
+    def __init__(self, frame_ms=100, realtime=False, speed=1.0, sample_rate=SAMPLE_RATE,
+                 sample_width=SAMPLE_WIDTH):
+        self.frame_ms = frame_ms
+        self.realtime = realtime
+        self.speed = speed
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frame_bytes = max(sample_width, int(sample_rate * frame_ms / 1000) * sample_width)
+
+    def duration(self, audio_data):
+        """音频时长（秒）"""
+        return len(audio_data) / (self.sample_rate * self.sample_width)
+
+    def frames(self, audio_data):
+        """按帧切分，最后一帧可能不足frame_bytes"""
+        view = memoryview(audio_data).cast("B")
+        for offset in range(0, len(view), self.frame_bytes):
+            yield view[offset:offset + self.frame_bytes]
+
+    def submit(self, send, audio_data, stop_event=None):
+        """逐帧调用send发送音频
+
+        Args:
+            send: 发送函数，例如识别器的send_audio_frame
+            audio_data: PCM数据
+            stop_event: 置位后停止发送（例如识别器已出错）
+
+        Returns:
+            int: 实际发送的字节数
+        """
+        sent = 0
+        frame_seconds = self.frame_ms / 1000 / self.speed
+        started = time.monotonic()
+        for index, frame in enumerate(self.frames(audio_data)):
+            if stop_event is not None and stop_event.is_set():
+                break
+            if self.realtime:
+                delay = started + index * frame_seconds - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            send(bytes(frame))
+            sent += len(frame)
+        return sent
@@ -0,0 +1,92 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+
+# 采集音频的默认格式：16kHz、单声道、16bit小端PCM
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+FULL_SCALE = 32768.0
+# dBFS下限，避免对全零帧取对数
+MIN_DBFS = -120.0
+
+# 整段音频的统计结果
+ChunkLevel = namedtuple("ChunkLevel", ["mean_abs", "rms", "peak", "dbfs", "samples"])
+# 逐子帧的统计结果，每个字段都是长度为子帧数的numpy数组
+FrameLevels = namedtuple("FrameLevels", ["mean_abs", "rms", "peak", "dbfs", "frame_len"])
+
+
+def pcm_view(audio_data):
+    """将PCM字节零拷贝地视为int16数组
+
+    Args:
+        audio_data: bytes / bytearray / memoryview 形式的16bit小端PCM数据
+
+    Returns:
+        numpy.ndarray: 只读或可写的int16视图（与原缓冲区共享内存），奇数长度时丢弃末尾半个采样
+    """
+    usable = len(audio_data) - len(audio_data) % SAMPLE_WIDTH
+    if usable <= 0:
+        return np.zeros(0, dtype="<i2")
+    return np.frombuffer(audio_data, dtype="<i2", count=usable // SAMPLE_WIDTH)
+
+
+def frame_length(frame_ms=20, sample_rate=SAMPLE_RATE):
+    """根据毫秒数计算子帧包含的采样点数"""
+    return max(1, int(sample_rate * frame_ms / 1000))
+
+
+def to_dbfs(rms):
+    """将RMS幅度（标量或数组）换算为dBFS"""
+    floor = FULL_SCALE * 10 ** (MIN_DBFS / 20)
+    return 20.0 * np.log10(np.maximum(rms, floor) / FULL_SCALE)
+
+
+def analyze_chunk(audio_data):
+    """计算一整段PCM的音量统计
+
+    Args:
+        audio_data: 16bit小端PCM数据
+
+    Returns:
+        ChunkLevel: 平均绝对幅度、RMS、峰值、dBFS以及采样点数
+    """
+    samples = pcm_view(audio_data)
+    if samples.size == 0:
+        return ChunkLevel(0.0, 0.0, 0, MIN_DBFS, 0)
+
+    values = samples.astype(np.float32)
+    mean_abs = float(np.abs(values).mean())
+    rms = math.sqrt(float(np.dot(values, values)) / values.size)
+    peak = int(np.abs(values).max())
+    return ChunkLevel(mean_abs, rms, peak, float(to_dbfs(rms)), int(samples.size))
+
+
+def analyze_frames(audio_data, frame_ms=20, sample_rate=SAMPLE_RATE):
+    """按子帧一次性向量化计算音量统计
+
+    末尾不足一个子帧的采样单独作为最后一帧计算。
+
+    Args:
+        audio_data: 16bit小端PCM数据
+        frame_ms: 子帧长度（毫秒）
+        sample_rate: 采样率
+
+    Returns:
+        FrameLevels: 每个子帧的平均绝对幅度、RMS、峰值和dBFS
+    """
+    frame_len = frame_length(frame_ms, sample_rate)
+    samples = pcm_view(audio_data)
+    if samples.size == 0:
+        empty = np.zeros(0, dtype=np.float32)
+        return FrameLevels(empty, empty, empty, empty, frame_len)
+
+    values = samples.astype(np.float32)
+    magnitude = np.abs(values)
+    starts = np.arange(0, values.size, frame_len)
+    counts = np.diff(np.append(starts, values.size)).astype(np.float32)
+
+    mean_abs = np.add.reduceat(magnitude, starts) / counts
+    rms = np.sqrt(np.add.reduceat(values * values, starts) / counts)
+    peak = np.maximum.reduceat(magnitude, starts)
+    return FrameLevels(mean_abs, rms, peak, to_dbfs(rms), frame_len)
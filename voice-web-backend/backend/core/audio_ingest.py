@@ -0,0 +1,280 @@
+import struct
+import threading
+
+import numpy as np
+
+from core.audio_frames import SAMPLE_RATE
+
+# 浏览器上传音频常见的容器魔数
+WEBM_MAGIC = b"\x1a\x45\xdf\xa3"
+OGG_MAGIC = b"OggS"
+RIFF_MAGIC = b"RIFF"
+
+
+def detect_format(data, content_type=None):
+    """根据内容类型和文件头判断音频格式
+
+    Returns:
+        str: "wav" / "webm" / "ogg" / "pcm"
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if data[:4] == RIFF_MAGIC and data[8:12] == b"WAVE":
+        return "wav"
+    if data[:4] == WEBM_MAGIC:
+        return "webm"
+    if data[:4] == OGG_MAGIC:
+        return "ogg"
+    if content_type in ("audio/wav", "audio/x-wav", "audio/wave"):
+        return "wav"
+    if content_type in ("audio/webm", "video/webm"):
+        return "webm"
+    if content_type in ("audio/ogg", "audio/opus"):
+        return "ogg"
+    return "pcm"
+
+
+def to_mono(samples, channels):
+    """把交错多声道的int16/float32采样转为int16量纲的float32单声道数组"""
+    if samples.dtype.kind == "f":
+        samples = np.clip(samples, -1.0, 1.0) * 32767.0
+    samples = samples.astype(np.float32)
+    if channels > 1:
+        samples = samples[:samples.size - samples.size % channels].reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+class LinearResampler:
+    """跨块保持相位的线性插值重采样"""
+
+    def __init__(self, src_rate, dst_rate=SAMPLE_RATE):
+        self.step = src_rate / dst_rate
+        self.passthrough = src_rate == dst_rate
+        self._pos = 0.0
+        self._prev = None
+
+    def process(self, samples):
+        """输入float32单声道采样，返回16bit小端PCM字节"""
+        if not self.passthrough and samples.size:
+            if self._prev is not None:
+                samples = np.concatenate((self._prev, samples))
+            last = samples.size - 1
+            positions = np.arange(self._pos, last + 1e-9, self.step) if last >= self._pos else np.zeros(0)
+            # 下一块的第一个输出位置相对于本块最后一个采样
+            next_pos = (positions[-1] + self.step if positions.size else self._pos) - last
+            self._pos = next_pos
+            self._prev = samples[-1:]
+            samples = np.interp(positions, np.arange(samples.size), samples)
+        return np.clip(samples, -32768, 32767).astype("<i2").tobytes()
+
+
+class PCMDecoder:
+    """原始16kHz单声道PCM直接透传，只处理奇数字节对齐"""
+
+    def __init__(self, on_pcm):
+        self.on_pcm = on_pcm
+        self._carry = b""
+
+    def feed(self, data):
+        if self._carry:
+            data = self._carry + data
+        usable = len(data) - len(data) % 2
+        self._carry = data[usable:]
+        if usable:
+            self.on_pcm(data[:usable] if usable != len(data) else data)
+
+    def close(self):
+        self._carry = b""
+
+
+class WavDecoder:
+    """增量解析WAV：先缓存到data块出现，之后每次feed都直接转换输出"""
+
+    def __init__(self, on_pcm):
+        self.on_pcm = on_pcm
+        self._header = b""
+        self._carry = b""
+        self.channels = None
+        self.sample_rate = None
+        self.dtype = None
+        self.resampler = None
+        self._frame_bytes = None
+        self._in_data = False
+
+    def _parse_header(self):
+        """尝试从已缓存的字节中解析fmt和data块，成功时返回data块起始偏移"""
+        data = self._header
+        offset = 12
+        while offset + 8 <= len(data):
+            chunk_id, size = struct.unpack("<4sI", data[offset:offset + 8])
+            body = offset + 8
+            if chunk_id == b"fmt ":
+                if body + 16 > len(data):
+                    return None
+                audio_format, channels, rate, _, _, bits = struct.unpack("<HHIIHH", data[body:body + 16])
+                if audio_format == 1 and bits == 16:
+                    self.dtype = np.dtype("<i2")
+                elif audio_format == 3 and bits == 32:
+                    self.dtype = np.dtype("<f4")
+                else:
+                    raise ValueError(f"不支持的WAV编码: format={audio_format}, bits={bits}")
+                self.channels = channels
+                self.sample_rate = rate
+                self._frame_bytes = channels * self.dtype.itemsize
+                self.resampler = LinearResampler(rate)
+            elif chunk_id == b"data":
+                if self.dtype is None:
+                    raise ValueError("WAV文件缺少fmt块")
+                return body
+            offset = body + size + (size & 1)
+        return None
+
+    def feed(self, data):
+        if not self._in_data:
+            self._header += data
+            start = self._parse_header()
+            if start is None:
+                return
+            self._in_data = True
+            data, self._header = self._header[start:], b""
+        if self._carry:
+            data = self._carry + data
+        usable = len(data) - len(data) % self._frame_bytes
+        self._carry = data[usable:]
+        if usable:
+            samples = np.frombuffer(data, dtype=self.dtype, count=usable // self.dtype.itemsize)
+            self.on_pcm(self.resampler.process(to_mono(samples, self.channels)))
+
+    def close(self):
+        self._carry = b""
+
+
+class _BlockingPipe:
+    """供PyAV读取的阻塞式文件对象，feed写入、解码线程read读取"""
+
+    def __init__(self):
+        self._chunks = bytearray()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def write(self, data):
+        with self._cond:
+            self._chunks += data
+            self._cond.notify_all()
+
+    def read(self, size=-1):
+        with self._cond:
+            self._cond.wait_for(lambda: self._chunks or self._closed)
+            if size is None or size < 0:
+                size = len(self._chunks)
+            data = bytes(self._chunks[:size])
+            del self._chunks[:size]
+            return data
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class ContainerDecoder:
+    """用PyAV（可选依赖）增量解复用并解码webm/ogg中的opus等音频
+
+    MediaRecorder分片只有第一片带容器头，所以同一个客户端的所有分片必须送入同一个解码器。
+    解码在后台线程中进行，输出统一重采样为16kHz单声道int16。
+    """
+
+    def __init__(self, on_pcm, container_format="webm"):
+        try:
+            import av
+        except ImportError:
+            raise RuntimeError("解码webm/ogg音频需要安装PyAV: pip install av")
+        self.av = av
+        self.on_pcm = on_pcm
+        self.container_format = "matroska" if container_format == "webm" else container_format
+        self.error = None
+        # close等待超时时解码线程仍在运行，已输出的PCM可能不完整
+        self.timed_out = False
+        self._pipe = _BlockingPipe()
+        self._thread = threading.Thread(target=self._decode_loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _emit(self, frames):
+        for frame in frames:
+            if frame.samples:
+                self.on_pcm(bytes(frame.planes[0])[:frame.samples * 2])
+
+    def _decode_loop(self):
+        try:
+            container = self.av.open(self._pipe, mode="r", format=self.container_format)
+            resampler = self.av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+            for frame in container.decode(audio=0):
+                self._emit(resampler.resample(frame))
+            self._emit(resampler.resample(None))
+            container.close()
+        except Exception as e:
+            self.error = e
+            print(f"音频解码失败: {e}")
+
+    def feed(self, data):
+        self._pipe.write(data)
+
+    def close(self, timeout=5.0):
+        """结束输入并等待剩余音频解码完成"""
+        self._pipe.close()
+        self._thread.join(timeout=timeout)
+        self.timed_out = self._thread.is_alive()
+
+
+class IngestStream:
+    """一个客户端的音频接入流：首次feed时识别格式，之后增量解码为16kHz单声道PCM
+
+    Args:
+        on_pcm: 每解码出一段PCM时调用
+        content_type: 请求的Content-Type，用于辅助判断格式
+    """
+
+    def __init__(self, on_pcm, content_type=None):
+        self.on_pcm = on_pcm
+        self.content_type = content_type
+        self.format = None
+        self.decoder = None
+        self.received_bytes = 0
+        self.decoded_bytes = 0
+
+    def _output(self, pcm):
+        self.decoded_bytes += len(pcm)
+        self.on_pcm(pcm)
+
+    def feed(self, data):
+        if not data:
+            return
+        self.received_bytes += len(data)
+        if self.decoder is None:
+            self.format = detect_format(data, self.content_type)
+            if self.format == "wav":
+                self.decoder = WavDecoder(self._output)
+            elif self.format in ("webm", "ogg"):
+                self.decoder = ContainerDecoder(self._output, self.format)
+            else:
+                self.decoder = PCMDecoder(self._output)
+        self.decoder.feed(data)
+
+    def close(self):
+        if self.decoder is not None:
+            self.decoder.close()
+
+
+def decode_to_pcm(data, content_type=None):
+    """一次性把完整的音频文件解码为16kHz单声道PCM，解码超时或出错时抛出ValueError"""
+    chunks = []
+    stream = IngestStream(chunks.append, content_type)
+    stream.feed(data)
+    stream.close()
+    # 解码超时或中途出错时已输出的PCM不完整，不能当作完整结果返回
+    if getattr(stream.decoder, "timed_out", False):
+        raise ValueError("音频解码超时")
+    error = getattr(stream.decoder, "error", None)
+    if error is not None:
+        raise ValueError(f"音频解码失败: {error}")
+    return b"".join(chunks)
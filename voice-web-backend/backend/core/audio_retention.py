@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+
+
+class AudioRetentionSweeper:
+    """后台清理音频目录，按年龄和总大小两种策略限制磁盘占用
+
+    每隔interval_seconds在后台线程中扫描一次目录：先删除修改时间超过max_age_seconds的文件，
+    总大小仍超过max_bytes时再从最旧的文件开始删除。清理只在后台线程中进行，不阻塞请求处理。
+    缓存目录由缓存自身的索引管理，扫描时跳过，改为调用cache.expire按最后使用时间清理，
+    保证索引与磁盘一致。
+
+    Args:
+        directory: 音频根目录
+        max_age_seconds: 文件最长保留时间，为0时不按年龄清理
+        max_bytes: 目录（不含缓存目录）总大小上限，为0时不按大小清理
+        interval_seconds: 两次扫描的间隔
+        caches: 需要一起按年龄清理的TTSCache
+    """
+
+    def __init__(self, directory, max_age_seconds=7 * 24 * 3600, max_bytes=1024 * 1024 * 1024,
+                 interval_seconds=600.0, caches=()):
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.interval_seconds = interval_seconds
+        self.caches = tuple(caches)
+        self.skip_dirs = {os.path.abspath(cache.cache_dir) for cache in self.caches}
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.stats = {"sweeps": 0, "removed_age": 0, "removed_size": 0, "removed_cache": 0,
+                      "removed_bytes": 0, "errors": 0, "files": 0, "bytes": 0, "last_sweep_ms": 0.0,
+                      "last_sweep_at": None}
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="audio-retention")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+        self.thread = None
+
+    def _run(self):
+        # 启动后先清理一次，处理上次运行遗留的文件
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"清理音频目录出错: {e}")
+            if self.stop_event.wait(self.interval_seconds):
+                break
+
+    def _scan(self, directory, files):
+        """递归收集(修改时间, 大小, 路径)，跳过缓存目录"""
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.abspath(entry.path) not in self.skip_dirs:
+                        self._scan(entry.path, files)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            except OSError:
+                continue
+
+    def _remove(self, path, size, reason):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            self.stats["errors"] += 1
+            print(f"删除音频文件失败: {path}, {e}")
+            return False
+        self.stats[reason] += 1
+        self.stats["removed_bytes"] += size
+        return True
+
+    def sweep(self):
+        """执行一次清理，返回本次删除的文件数"""
+        started = time.monotonic()
+        now = time.time()
+        files = []
+        self._scan(self.directory, files)
+        files.sort()
+
+        removed = 0
+        kept = []
+        for mtime, size, path in files:
+            if self.max_age_seconds and now - mtime > self.max_age_seconds:
+                removed += self._remove(path, size, "removed_age")
+            else:
+                kept.append((mtime, size, path))
+
+        total = sum(size for _, size, _ in kept)
+        if self.max_bytes:
+            while kept and total > self.max_bytes:
+                _, size, path = kept.pop(0)
+                removed += self._remove(path, size, "removed_size")
+                total -= size
+
+        if self.max_age_seconds:
+            for cache in self.caches:
+                count = cache.expire(self.max_age_seconds)
+                self.stats["removed_cache"] += count
+                removed += count
+
+        self.stats["sweeps"] += 1
+        self.stats["files"] = len(kept)
+        self.stats["bytes"] = total
+        self.stats["last_sweep_ms"] = (time.monotonic() - started) * 1000
+        self.stats["last_sweep_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        if removed:
+            print(f"音频目录清理完成，删除{removed}个文件")
+        return removed
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats.update({
+            "running": self.thread is not None and self.thread.is_alive(),
+            "max_age_seconds": self.max_age_seconds,
+            "max_bytes": self.max_bytes,
+            "interval_seconds": self.interval_seconds,
+        })
+        return stats
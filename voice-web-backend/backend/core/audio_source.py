@@ -0,0 +1,278 @@
+import time
+import wave
+
+from core.audio_frames import SAMPLE_RATE, SAMPLE_WIDTH
+from core.ring_buffer import AudioRingBuffer
+
+
+class AudioSource:
+    """ASR音频输入源接口
+
+    所有输入源都提供16kHz单声道16bit PCM。read按帧数读取，
+    暂时没有数据时返回空字节串，输入结束后返回None。
+    """
+
+    sample_rate = SAMPLE_RATE
+    sample_width = SAMPLE_WIDTH
+
+    def open(self):
+        """打开输入源"""
+
+    def read(self, frames):
+        """读取最多frames帧音频
+
+        Returns:
+            bytes: PCM数据；暂无数据时为b""，输入结束时为None
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """关闭输入源，释放设备或唤醒阻塞的读取"""
+
+    def bind(self, sink):
+        """让输入源直接把采集到的音频交给sink(data, captured_at)，不再需要采集线程轮询read
+
+        Returns:
+            bool: 输入源支持直接推送时返回True，否则调用方应继续使用read
+        """
+        return False
+
+    @property
+    def finished(self):
+        return False
+
+    @property
+    def overflows(self):
+        """输入源因消费不及时而丢弃音频的次数，无法检测的输入源返回0"""
+        return 0
+
+
+class MicrophoneSource(AudioSource):
+    """本地PyAudio麦克风输入
+
+    设备缓冲区溢出时PyAudio丢弃这次读取的数据并抛出paInputOverflowed，
+    这里记录溢出次数后重新读取，不让丢帧悄悄消失。
+    """
+
+    def __init__(self, frames_per_buffer=3200, device_index=None):
+        self.frames_per_buffer = frames_per_buffer
+        self.device_index = device_index
+        self.mic = None
+        self.stream = None
+        self._overflows = 0
+        self._overflow_errno = None
+
+    def open(self):
+        import pyaudio
+
+        if self.stream is not None:
+            return
+        self._overflow_errno = pyaudio.paInputOverflowed
+        self.mic = pyaudio.PyAudio()
+        self.stream = self.mic.open(
+            format=pyaudio.paInt16, channels=1, rate=self.sample_rate, input=True,
+            frames_per_buffer=self.frames_per_buffer, input_device_index=self.device_index
+        )
+
+    def read(self, frames):
+        if self.stream is None:
+            time.sleep(0.05)
+            return b""
+        while True:
+            try:
+                return self.stream.read(frames, exception_on_overflow=True)
+            except IOError as e:
+                if e.errno != self._overflow_errno:
+                    raise
+                self._overflows += 1
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        if self.mic is not None:
+            self.mic.terminate()
+            self.mic = None
+
+    @property
+    def overflows(self):
+        return self._overflows
+
+
+class WavFileSource(AudioSource):
+    """从16kHz单声道WAV文件读取，可按实时速度节流"""
+
+    def __init__(self, file_path, realtime=True, speed=1.0, loop=False):
+        self.file_path = file_path
+        self.realtime = realtime
+        self.speed = speed
+        self.loop = loop
+        self.wav = None
+        self._started = None
+        self._frames_read = 0
+        self._finished = False
+
+    def open(self):
+        if self.wav is not None:
+            return
+        self.wav = wave.open(self.file_path, "rb")
+        if (self.wav.getframerate() != self.sample_rate or self.wav.getnchannels() != 1
+                or self.wav.getsampwidth() != self.sample_width):
+            self.wav.close()
+            self.wav = None
+            raise ValueError("仅支持16kHz单声道16bit WAV文件")
+        self._started = time.monotonic()
+        self._frames_read = 0
+        self._finished = False
+
+    def read(self, frames):
+        if self.wav is None:
+            return None
+        if self.realtime:
+            # 按已读取音频的时长节流
+            due = self._started + self._frames_read / self.sample_rate / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        data = self.wav.readframes(frames)
+        if not data and self.loop:
+            self.wav.rewind()
+            data = self.wav.readframes(frames)
+        if not data:
+            self._finished = True
+            return None
+        self._frames_read += len(data) // self.sample_width
+        return data
+
+    def close(self):
+        if self.wav is not None:
+            self.wav.close()
+            self.wav = None
+
+    @property
+    def finished(self):
+        return self._finished
+
+
+class StreamAudioSource(AudioSource):
+    """内存/网络输入源：由网络处理代码push音频，ASR采集线程read
+
+    内部复用AudioRingBuffer，客户端推送过快时旧数据会被覆盖并计入溢出统计。
+    """
+
+    def __init__(self, buffer_seconds=5.0, read_timeout=0.5):
+        self.read_timeout = read_timeout
+        self.ring = AudioRingBuffer(capacity_seconds=buffer_seconds, preroll_seconds=0)
+        self.reader = self.ring.attach("source")
+        self.last_push = time.monotonic()
+
+    def push(self, data):
+        """写入客户端发来的PCM数据"""
+        self.last_push = time.monotonic()
+        self.ring.write(data, self.last_push)
+
+    def read(self, frames):
+        data = self.reader.read(frames * self.sample_width, timeout=self.read_timeout)
+        if data is None:
+            return None if self.ring.closed else b""
+        return data
+
+    def close(self):
+        self.ring.close()
+
+    @property
+    def finished(self):
+        return self.ring.closed and self.reader.available() <= 0
+
+    @property
+    def overflows(self):
+        return self.reader.overruns
+
+
+class CallbackMicrophoneSource(AudioSource):
+    """PortAudio回调模式麦克风输入
+
+    设备每采集frame_ms毫秒音频就在PortAudio线程中回调一次，回调只做一次复制：
+    绑定了sink时直接写入ASR的预分配环形缓冲区，否则写入自身的环形缓冲区供read读取。
+    每帧在回调中打上monotonic时间戳，输入溢出由PortAudio的状态标志计数，
+    Python线程被GIL阻塞时数据仍留在设备侧缓冲区，不会像阻塞read那样直接丢帧。
+
+    Args:
+        frame_ms: 每次回调的音频时长（毫秒），最小支持20ms
+        device_index: 输入设备编号，为None时使用默认设备
+        buffer_seconds: 未绑定sink时内部环形缓冲区的时长
+    """
+
+    MIN_FRAME_MS = 20
+
+    def __init__(self, frame_ms=20, device_index=None, buffer_seconds=2.0):
+        if frame_ms < self.MIN_FRAME_MS:
+            raise ValueError(f"帧长不能小于{self.MIN_FRAME_MS}ms")
+        self.frame_ms = frame_ms
+        self.frames_per_buffer = int(self.sample_rate * frame_ms / 1000)
+        self.device_index = device_index
+        self.mic = None
+        self.stream = None
+        self.sink = None
+        self.ring = AudioRingBuffer(capacity_seconds=buffer_seconds, preroll_seconds=0)
+        self.reader = self.ring.attach("source")
+        self.callbacks = 0
+        self._overflows = 0
+        self._overflow_flag = 0
+        self._continue = 0
+
+    def bind(self, sink):
+        self.sink = sink
+        return True
+
+    def open(self):
+        import pyaudio
+
+        if self.stream is not None:
+            return
+        self._overflow_flag = pyaudio.paInputOverflow
+        self._continue = pyaudio.paContinue
+        self.ring.reopen()
+        self.mic = pyaudio.PyAudio()
+        self.stream = self.mic.open(
+            format=pyaudio.paInt16, channels=1, rate=self.sample_rate, input=True,
+            frames_per_buffer=self.frames_per_buffer, input_device_index=self.device_index,
+            stream_callback=self._callback,
+        )
+        self.stream.start_stream()
+
+    def _callback(self, in_data, frame_count, time_info, status_flags):
+        captured_at = time.monotonic()
+        self.callbacks += 1
+        if status_flags & self._overflow_flag:
+            self._overflows += 1
+        if self.sink is not None:
+            self.sink(in_data, captured_at)
+        else:
+            self.ring.write(in_data, captured_at)
+        return None, self._continue
+
+    def read(self, frames):
+        data = self.reader.read(frames * self.sample_width, timeout=0.5)
+        if data is None:
+            return None if self.ring.closed else b""
+        return data
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        if self.mic is not None:
+            self.mic.terminate()
+            self.mic = None
+        self.ring.close()
+
+    @property
+    def finished(self):
+        return self.ring.closed and self.reader.available() <= 0
+
+    @property
+    def overflows(self):
+        return self._overflows + self.reader.overruns
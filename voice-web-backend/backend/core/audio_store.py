@@ -0,0 +1,113 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# 内存中的一段合成音频，key为合成缓存键，persist时用于确定落盘位置
+AudioObject = namedtuple("AudioObject", ["audio", "key", "media_type", "expires_at"])
+
+
+class AudioStore:
+    """进程内的短期音频对象存储
+
+    合成结果以随机ID存放在内存中，同进程的播放端直接取走字节数据，其他客户端通过
+    短期URL获取；只有调用方明确要求持久化时才写入磁盘。过期对象在存取时惰性清理，
+    总字节数超过上限时淘汰最早放入的对象。
+
+    Args:
+        ttl_seconds: 对象默认存活时间（秒）
+        max_bytes: 内存中音频总字节数上限
+    """
+
+    def __init__(self, ttl_seconds=60.0, max_bytes=64 * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # audio_id -> AudioObject，按放入顺序排列
+        self.objects = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {"puts": 0, "hits": 0, "misses": 0, "taken": 0, "expired": 0, "evictions": 0,
+                      "persisted": 0}
+
+    def put(self, audio, key=None, media_type="audio/mpeg", ttl=None):
+        """存入音频，返回对象ID"""
+        audio_id = secrets.token_urlsafe(16)
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl is None else ttl)
+        with self.lock:
+            self._sweep()
+            self.objects[audio_id] = AudioObject(audio, key, media_type, expires_at)
+            self.total_bytes += len(audio)
+            self.stats["puts"] += 1
+            while self.total_bytes > self.max_bytes and len(self.objects) > 1:
+                self._drop(next(iter(self.objects)))
+                self.stats["evictions"] += 1
+        return audio_id
+
+    def get(self, audio_id):
+        """读取未过期的对象，不存在时返回None"""
+        with self.lock:
+            self._sweep()
+            obj = self.objects.get(audio_id)
+            self.stats["hits" if obj is not None else "misses"] += 1
+            return obj
+
+    def take(self, audio_id):
+        """取出对象并从存储中移除，播放端消费后即可释放内存"""
+        with self.lock:
+            self._sweep()
+            if audio_id not in self.objects:
+                self.stats["misses"] += 1
+                return None
+            self.stats["taken"] += 1
+            return self._drop(audio_id)
+
+    def persist(self, audio_id, writer):
+        """把对象交给writer(key, audio)写入磁盘，返回writer的结果；对象不存在时返回None"""
+        obj = self.get(audio_id)
+        if obj is None:
+            return None
+        result = writer(obj.key, obj.audio)
+        with self.lock:
+            self.stats["persisted"] += 1
+        return result
+
+    def _drop(self, audio_id):
+        """移除对象（调用方需持有lock）"""
+        obj = self.objects.pop(audio_id)
+        self.total_bytes -= len(obj.audio)
+        return obj
+
+    def _sweep(self):
+        """清理过期对象（调用方需持有lock）"""
+        now = time.monotonic()
+        expired = [audio_id for audio_id, obj in self.objects.items() if obj.expires_at <= now]
+        for audio_id in expired:
+            self._drop(audio_id)
+        self.stats["expired"] += len(expired)
+
+    def get_stats(self):
+        with self.lock:
+            self._sweep()
+            stats = dict(self.stats)
+            stats.update({
+                "objects": len(self.objects),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            })
+        return stats
+
+
+audio_store = None
+
+
+def get_audio_store():
+    """获取音频对象存储单例"""
+    global audio_store
+    if audio_store is None:
+        audio_store = AudioStore(
+            ttl_seconds=float(os.getenv('tts_audio_ttl', '60')),
+            max_bytes=int(os.getenv('tts_audio_store_mb', '64')) * 1024 * 1024,
+        )
+    return audio_store
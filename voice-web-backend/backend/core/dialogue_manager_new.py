@@ -10,14 +10,20 @@ import queue
 import re
 import json
 import sys
+from concurrent.futures import Future
 from pathlib import Path
 
 from core.agentChat import AgentChat
 # from core.playMp3 import MP3Player
 
 from core.asr import ASRmanager
+from core.asr_service import ASRService
+from core.asr_events import END_OF_TURN, PARTIAL, SENTENCE_FINAL
+from core.audio_source import CallbackMicrophoneSource
 
-from core.voiceSpeak import VoiceSpeak
+from core import tts_formats
+from core.tts_pool import get_synthesizer_pool
+from core.voiceSpeak import PLAYBACK_FORMAT, PLAYBACK_SAMPLE_RATE, VoiceSpeak
 
 # 添加上级目录到系统路径，以便导入agentChat和playMp3模块
 # parent_dir = str(Path(__file__).parent.parent.parent.parent)
@@ -35,6 +41,21 @@ from dotenv import load_dotenv
 # 加载环境变量
 load_dotenv('voice-web-backend/backend/.env.local')
 apiKey = os.getenv('dashscope_api_key')
+# 是否只在检测到语音时向识别器发送音频
+asr_gated_uplink = os.getenv('asr_gated_uplink', 'false').lower() == 'true'
+# 是否在识别文本稳定后提前发起大模型请求。开启后所有对话请求（包括文字聊天）都改为
+# 不带session_id、由本地历史重放的无状态请求，推测命中的回复才能与后续对话衔接
+speculative_dispatch = os.getenv('speculative_dispatch', 'false').lower() == 'true'
+# 麦克风采集方式：blocking为阻塞读取，callback为PortAudio回调写入预分配缓冲区
+asr_capture_mode = os.getenv('asr_capture_mode', 'blocking').lower()
+# 回调采集的帧长与VAD判决块长（毫秒）
+asr_frame_ms = int(os.getenv('asr_frame_ms', '200'))
+# 是否在检测到用户开始说话时立即打断AI播放，以及确认窗口（毫秒）
+barge_in_enabled = os.getenv('barge_in', 'false').lower() == 'true'
+barge_in_confirm_ms = int(os.getenv('barge_in_confirm_ms', '150'))
+# 识别连接空闲保活间隔，以及暂停收音多久后断开连接（秒）
+asr_heartbeat_seconds = float(os.getenv('asr_heartbeat_seconds', '5'))
+asr_idle_timeout = float(os.getenv('asr_idle_timeout', '60'))
 
 # 语音文件存储路径
 VOICE_DATA_DIR = Path("voice-web-backend/backend/static/audio")
@@ -80,24 +101,44 @@ class DialogueManager:
 
 
 
-        # asr代理
+        # asr代理，由常驻的识别服务创建一次，开关收音只是暂停/恢复
         self.asr_manager = None
+        self.asr_service = ASRService(self._create_asr_manager,
+                                      heartbeat_seconds=asr_heartbeat_seconds, idle_timeout=asr_idle_timeout)
+        # 最近一次识别中间结果，仅用于界面展示，不触发对话
+        self.asr_partial_text = ""
+
+        # 推测执行：中间结果稳定一段时间或整句结束时提前请求大模型，
+        # 一轮话结束时文本一致则直接使用结果，否则丢弃
+        self.speculative_enabled = speculative_dispatch
+        self.speculative_stable_seconds = 0.6
+        self.speculation = None
+        self.speculation_timer = None
+        self.speculation_lock = threading.Lock()
+        # misses为所有被丢弃的推测，discarded_running为其中请求已经发出、无法取消的部分
+        self.speculation_stats = {"started": 0, "hits": 0, "misses": 0, "discarded_running": 0,
+                                  "saved_seconds": 0.0}
+        # 推测请求不带session_id，丢弃时不会在智能体会话里留下多余的轮次；
+        # 为了让命中的结果与后续对话衔接，开启推测执行时所有请求都改为带上本地历史
+        self.agent_chat.replay_history = self.speculative_enabled
         # self.asr_manager.start_asr()
         # self.asr_manager.set_text_callback(self.process_asr_callback)
 
+        # 插话打断：AI说话时用户一开口就停止播放并取消剩余片段
+        self.barge_in_enabled = barge_in_enabled
+        # stop_ms为估计的用户开口时间到播放停止的耗时
+        self.barge_in_stats = {"onsets": 0, "interrupts": 0, "last_stop_ms": 0.0, "max_stop_ms": 0.0}
+
         # 语音合成服务
         self.voice_speak = None
         # self.voice_speak.set_callback(self.process_speak_callback)
 
     def charge(self ,model=None, choice=None):
         if model == "asr" and choice == "open":
-            self.asr_manager = ASRmanager()
-            self.asr_manager.start_asr()
-            self.asr_manager.set_text_callback(self.process_asr_callback)
+            self.asr_manager = self.asr_service.start()
             return "ASR服务已启动"
         elif model == "asr" and choice == "close":
-            self.asr_manager.stop_asr()
-            self.asr_manager = None
+            self.asr_service.pause()
         if model == "tts" and choice == "open":
             self.voice_speak = VoiceSpeak()
             self.voice_speak.set_callback(self.process_speak_callback)
@@ -105,12 +146,24 @@ class DialogueManager:
         elif model == "tts" and choice == "close":
             self.voice_speak = None
 
+    def _create_asr_manager(self):
+        """创建常驻识别服务使用的ASRmanager，只在第一次开启收音时调用"""
+        source = CallbackMicrophoneSource(frame_ms=asr_frame_ms) if asr_capture_mode == "callback" else None
+        manager = ASRmanager(gated_uplink=asr_gated_uplink, source=source, chunk_ms=asr_frame_ms,
+                             barge_in_confirm_seconds=barge_in_confirm_ms / 1000)
+        manager.set_text_callback(self.process_asr_callback)
+        manager.set_event_callback(self.process_asr_event)
+        if self.barge_in_enabled:
+            manager.set_barge_in_callback(self.process_barge_in)
+            manager.set_empty_turn_callback(self.process_empty_turn)
+        return manager
+
     # Callback处理函数设置
     # ---------------------------------------------------------------
     def process_asr_callback(self, text):
         if self.state == "idle":
             self.state = "user_speaking"
-            response=self.process_user_input(text)
+            response=self.process_turn(text)
 
             self.state = "ai_speaking"
             self.speak(response)
@@ -121,7 +174,7 @@ class DialogueManager:
             except Exception as e:
                 print(f"中断AI语音失败: {e}")
             self.state="user_speaking"
-            response=self.process_user_input(text)
+            response=self.process_turn(text)
 
             self.state = "ai_speaking"
             self.speak(response)
@@ -131,12 +184,159 @@ class DialogueManager:
                 self.voice_speak.interrupt_ai()
             except Exception as e:
                 print(f"中断AI语音失败: {e}")
-            response=self.process_user_input(text)
+            response=self.process_turn(text)
 
-            self.state = "user_speaking"
+            self.state = "ai_speaking"
             self.speak(response)
 
 
+    def process_barge_in(self, speech_started_at):
+        """VAD确认用户开始说话：AI正在说话时立即停止播放，不等这轮话识别完成"""
+        stats = self.barge_in_stats
+        stats["onsets"] += 1
+        if self.state != "ai_speaking" or not self.voice_speak:
+            return
+        print("检测到用户插话，打断AI...")
+        self.voice_speak.interrupt_ai()
+        self.state = "user_speaking"
+        stop_ms = (time.monotonic() - speech_started_at) * 1000
+        stats["interrupts"] += 1
+        stats["last_stop_ms"] = stop_ms
+        stats["max_stop_ms"] = max(stats["max_stop_ms"], stop_ms)
+
+    def process_empty_turn(self):
+        """插话后用户说完却没有识别文本：被打断的回复不会再回调播放结束，直接回到空闲状态"""
+        if self.state == "user_speaking":
+            self.state = "idle"
+
+    def get_barge_in_stats(self):
+        stats = dict(self.barge_in_stats)
+        stats["enabled"] = self.barge_in_enabled
+        stats["confirm_ms"] = barge_in_confirm_ms
+        stats["cancelled_segments"] = self.voice_speak.cancelled_segments if self.voice_speak else 0
+        return stats
+
+    def process_asr_event(self, event):
+        """接收识别事件，中间结果和整句结果用于界面更新和推测执行"""
+        if event.type == END_OF_TURN:
+            self.asr_partial_text = ""
+            self._cancel_speculation_timer()
+            return
+
+        self.asr_partial_text = self.asr_manager.recognized_text or event.text
+        if not self.speculative_enabled:
+            return
+        if event.type == SENTENCE_FINAL:
+            self._cancel_speculation_timer()
+            self.speculate(self.asr_partial_text)
+        elif event.type == PARTIAL:
+            # 中间结果在稳定窗口内没有变化才发起推测请求
+            self._cancel_speculation_timer()
+            self.speculation_timer = threading.Timer(self.speculative_stable_seconds, self.speculate,
+                                                     args=(self.asr_partial_text,))
+            self.speculation_timer.daemon = True
+            self.speculation_timer.start()
+
+    # 推测执行
+    # ---------------------------------------------------------------
+    @staticmethod
+    def _normalize_text(text):
+        return re.sub(r'[\s。！？，、,.!?]', '', text or '')
+
+    def _cancel_speculation_timer(self):
+        if self.speculation_timer:
+            self.speculation_timer.cancel()
+            self.speculation_timer = None
+
+    def speculate(self, text):
+        """用当前识别文本提前发起大模型请求
+
+        推测请求是不带session_id的无状态请求，丢弃时不会进入智能体的会话历史；
+        命中时才由process_turn计入本地历史。同步SDK无法中途取消已发出的请求，
+        因此只在文本稳定或整句结束时才发起，减少浪费的请求。
+        """
+        key = self._normalize_text(text)
+        if not key:
+            return
+        with self.speculation_lock:
+            if self.speculation and self.speculation["key"] == key:
+                return
+            self._discard_speculation()
+            print(f"推测执行大模型请求: {text}")
+            self.speculation = {
+                "key": key,
+                "text": text,
+                "started_at": time.monotonic(),
+                "future": self._start_speculation(text),
+            }
+            self.speculation_stats["started"] += 1
+
+    def _start_speculation(self, text):
+        """每个推测请求使用独立线程：已发出的旧请求无法取消，不能让新的推测排在它后面"""
+        future = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self._timed_send(text))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+    def _discard(self, future):
+        """丢弃一个推测请求，已经发出的计入discarded_running"""
+        self.speculation_stats["misses"] += 1
+        if not future.cancel():
+            self.speculation_stats["discarded_running"] += 1
+
+    def _timed_send(self, text):
+        response = self.agent_chat.complete(text)
+        return response, time.monotonic()
+
+    def _discard_speculation(self):
+        """丢弃当前推测请求（调用方需持有speculation_lock）"""
+        if self.speculation:
+            self._discard(self.speculation["future"])
+            self.speculation = None
+
+    def _take_speculation(self, text):
+        """一轮话结束时取出推测结果，文本不一致时丢弃并返回None"""
+        taken_at = time.monotonic()
+        with self.speculation_lock:
+            speculation, self.speculation = self.speculation, None
+        if speculation is None:
+            return None
+
+        future = speculation["future"]
+        if speculation["key"] != self._normalize_text(text):
+            # 推测请求是无状态的，未完成的直接丢弃，不用等它结束
+            self._discard(future)
+            return None
+
+        try:
+            response, finished_at = future.result()
+        except Exception as e:
+            print(f"推测请求失败: {e}")
+            self.speculation_stats["misses"] += 1
+            return None
+        self.speculation_stats["hits"] += 1
+        # 节省的时间：推测请求在一轮话结束前已经花费的时间，最多为整个请求耗时
+        duration = finished_at - speculation["started_at"]
+        self.speculation_stats["saved_seconds"] += max(0.0, min(duration, taken_at - speculation["started_at"]))
+        return response
+
+    def get_speculation_stats(self):
+        """推测执行命中率与节省的总延迟"""
+        stats = dict(self.speculation_stats)
+        decided = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / decided if decided else 0.0
+        stats["saved_ms"] = stats.pop("saved_seconds") * 1000
+        stats["enabled"] = self.speculative_enabled
+        return stats
+
     def process_speak_callback(self):
         self.state = "idle"
 
@@ -146,11 +346,22 @@ class DialogueManager:
 
     # ----------------------------------------------------------------------------
 
+    def process_turn(self, text):
+        """处理一轮语音输入：优先使用推测执行的结果，文本不一致时再走process_user_input"""
+        ai_response = self._take_speculation(text)
+        if ai_response is None:
+            return self.process_user_input(text)
+
+        print(f'用户问题: {text}, 时间: {time.strftime("%Y%m%d_%H%M%S")}')
+        self.agent_chat.record_turn(text, ai_response)
+        print(f'AI回答(推测命中): {ai_response}, 时间: {time.strftime("%Y%m%d_%H%M%S")}')
+        self._log_conversation(text, ai_response)
+        return ai_response
+
     def process_user_input(self, text, speak=True):
         """处理用户输入并获取AI响应"""
         print(f'用户问题: {text}, 时间: {time.strftime("%Y%m%d_%H%M%S")}')
 
-        # 调用聊天代理获取回复
         ai_response = self.agent_chat.send_message(text=text)
         print(f'AI回答: {ai_response}, 时间: {time.strftime("%Y%m%d_%H%M%S")}')
 
@@ -212,6 +423,9 @@ class DialogueManager:
                  self.voice_speak.set_current_role(role)
                 except Exception as e:
                     print(f"设置角色语音失败: {e}")
+                # 提前为新角色的音色建好合成器连接，本轮第一句不用等待建连
+                playback = tts_formats.resolve(PLAYBACK_FORMAT, PLAYBACK_SAMPLE_RATE)
+                get_synthesizer_pool().prewarm("cosyvoice-v2", role["voice"], audio_format=playback.sdk_format)
                 return True
         return False
     
@@ -226,7 +440,7 @@ class DialogueManager:
         """停止对话管理器"""
         self.state = "idle"
         # self.player.stop()
-        self.asr_manager.stop_asr()  # 停止ASR服务
+        self.asr_service.stop()  # 停止ASR服务
         self.asr_manager = None
         self.voice_speak = None
 
@@ -1,12 +1,16 @@
+import io
 import sys
 import os
+import tempfile
 import subprocess
 import time
 import threading
 from playsound import playsound
 import argparse
 
-from arcade import load_sound, play_sound, stop_sound
+import pyglet
+from pyglet.media.codecs.base import AudioFormat, StaticMemorySource
+from arcade import Sound, load_sound, play_sound, stop_sound
 
 
 # sound = load_sound("1.mp3")
@@ -16,6 +20,20 @@ from arcade import load_sound, play_sound, stop_sound
 # stop_sound(player)
 
 
+class MemorySound(Sound):
+    """由内存中的音频数据创建的arcade声音，解码不经过文件系统"""
+
+    def __init__(self, audio, suffix=".mp3", sample_rate=22050):
+        # Sound.__init__只接受文件路径，这里直接用pyglet从内存加载
+        self.file_name = f"memory{suffix}"
+        if suffix == ".pcm":
+            # 16bit单声道裸PCM无需解码，直接交给播放器
+            self.source = StaticMemorySource(audio, AudioFormat(channels=1, sample_size=16, sample_rate=sample_rate))
+        else:
+            self.source = pyglet.media.load(self.file_name, file=io.BytesIO(audio), streaming=False)
+        self.min_distance = 100000000
+
+
 class MP3Player:
     """MP3播放器类，支持多种播放方式和中断功能"""
 
@@ -79,6 +97,42 @@ class MP3Player:
 
         return True
 
+    def play_bytes(self, audio, suffix=".mp3", sample_rate=22050):
+        """播放内存中的音频数据
+
+        .pcm为16bit单声道裸PCM，不经过解码直接播放。其他格式在当前平台的pyglet解码器
+        不支持从内存解码时，退回到临时文件播放；arcade非流式加载会一次解码完，
+        临时文件在加载后即可删除。
+
+        Args:
+            audio: 音频数据
+            suffix: 音频格式对应的扩展名，用于选择解码器
+            sample_rate: 裸PCM的采样率
+        """
+        if self.playing:
+            self.stop()
+
+        try:
+            self.sound = MemorySound(audio, suffix, sample_rate)
+        except Exception as e:
+            if suffix == ".pcm":
+                print(f"播放PCM音频失败: {e}")
+                return False
+            print(f"内存解码失败，改用临时文件播放: {e}")
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+                f.write(audio)
+            try:
+                return self.play(f.name)
+            finally:
+                try:
+                    os.remove(f.name)
+                except OSError:
+                    pass
+
+        self.playing = True
+        self.arcade_player = play_sound(self.sound)
+        return self.sound, self.arcade_player
+
     def stop(self):
         """停止当前播放"""
 
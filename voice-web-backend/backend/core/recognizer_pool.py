@@ -0,0 +1,238 @@
+import threading
+import time
+
+import dashscope
+
+from emulator import get_recognizer_class
+
+
+class PooledRecognizerCallback(dashscope.audio.asr.TranslationRecognizerCallback):
+    """池化识别器的回调，把事件转发给当前借用者设置的handler"""
+
+    def __init__(self):
+        self.handler = None
+        self.opened = threading.Event()
+        self.closed = threading.Event()
+
+    def _forward(self, name, *args):
+        handler = self.handler
+        method = getattr(handler, name, None) if handler is not None else None
+        if method:
+            try:
+                method(*args)
+            except Exception as e:
+                print(f"识别回调处理出错({name}): {e}")
+
+    def on_open(self):
+        self.opened.set()
+        self._forward("on_open")
+
+    def on_event(self, request_id, transcription_result, translation_result, usage):
+        self._forward("on_event", request_id, transcription_result, translation_result, usage)
+
+    def on_complete(self):
+        self._forward("on_complete")
+
+    def on_error(self, message):
+        self.closed.set()
+        self._forward("on_error", message)
+
+    def on_close(self):
+        self.closed.set()
+        self._forward("on_close")
+
+
+class TranscriptCollector:
+    """按sentence_id收集一次识别的转写结果，识别完成或出错时置位done
+
+    Args:
+        on_partial: 每收到一条转写结果时调用，参数为(sentence_id, text, is_sentence_end)
+    """
+
+    def __init__(self, on_partial=None):
+        self.on_partial = on_partial
+        self.sentences = {}
+        self.final_ids = set()
+        self.error = None
+        self.done = threading.Event()
+
+    def on_event(self, request_id, transcription_result, translation_result, usage):
+        if transcription_result is None:
+            return
+        sentence_id = getattr(transcription_result, "sentence_id", 0)
+        self.sentences[sentence_id] = transcription_result.text
+        is_final = bool(getattr(transcription_result, "is_sentence_end", False))
+        if is_final:
+            self.final_ids.add(sentence_id)
+        if self.on_partial:
+            self.on_partial(sentence_id, transcription_result.text, is_final)
+
+    def on_complete(self):
+        self.done.set()
+
+    def on_error(self, message):
+        self.error = message
+        print(f"识别器错误: {message}")
+        self.done.set()
+
+    def on_close(self):
+        self.done.set()
+
+    @property
+    def text(self):
+        return "".join(self.sentences[key] for key in sorted(self.sentences) if self.sentences[key])
+
+
+class RecognizerSession:
+    """一个已启动、等待音频的识别器连接"""
+
+    def __init__(self, recognizer, callback):
+        self.recognizer = recognizer
+        self.callback = callback
+        self.created_at = time.monotonic()
+
+    def is_healthy(self):
+        return not self.callback.closed.is_set()
+
+    def idle_seconds(self):
+        return time.monotonic() - self.created_at
+
+    def stop(self):
+        """结束识别任务，阻塞到识别器返回全部结果"""
+        try:
+            self.recognizer.stop()
+        except Exception as e:
+            print(f"停止识别器失败: {e}")
+
+
+class RecognizerPool:
+    """预先启动的识别器连接池
+
+    每个连接只服务一次识别（stop后任务结束），借出后后台线程会补充新的连接。
+    空闲超过idle_seconds的连接会被关闭；超过warm_seconds没有借用时不再补充，
+    避免长时间无人使用时持续占用连接。
+    """
+
+    def __init__(self, size=2, idle_seconds=20.0, warm_seconds=300.0, model="gummy-realtime-v1",
+                 sample_rate=16000, audio_format="pcm"):
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self.warm_seconds = warm_seconds
+        self.model = model
+        self.sample_rate = sample_rate
+        self.audio_format = audio_format
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = True
+        self.last_used = time.monotonic()
+        self.stats = {"warm_hits": 0, "cold_starts": 0, "expired": 0}
+
+        self._thread = threading.Thread(target=self._maintain)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _create(self):
+        """新建并启动一个识别器连接"""
+        callback = PooledRecognizerCallback()
+        recognizer = get_recognizer_class()(
+            model=self.model,
+            format=self.audio_format,
+            sample_rate=self.sample_rate,
+            transcription_enabled=True,
+            translation_enabled=False,
+            callback=callback,
+        )
+        recognizer.start()
+        return RecognizerSession(recognizer, callback)
+
+    def acquire(self, handler=None):
+        """借出一个识别器连接，池中没有可用连接时同步新建
+
+        Args:
+            handler: 接收on_event/on_complete/on_error/on_close回调的对象
+
+        Returns:
+            RecognizerSession: 已启动的识别器连接
+        """
+        self.last_used = time.monotonic()
+        session = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if candidate.is_healthy() and candidate.idle_seconds() < self.idle_seconds:
+                    session = candidate
+                    break
+                self._retire(candidate)
+
+        if session is not None:
+            self.stats["warm_hits"] += 1
+        else:
+            self.stats["cold_starts"] += 1
+            session = self._create()
+        session.callback.handler = handler
+        # 通知后台线程补充连接
+        self._wakeup.set()
+        return session
+
+    def _retire(self, session):
+        """关闭一个过期或失效的连接（在后台线程中执行stop）"""
+        self.stats["expired"] += 1
+        session.callback.handler = None
+        threading.Thread(target=session.stop, daemon=True).start()
+
+    def _maintain(self):
+        """后台维护：清理过期连接并补足预热连接"""
+        while self._running:
+            self._wakeup.wait(timeout=1.0)
+            self._wakeup.clear()
+            if not self._running:
+                break
+
+            with self._lock:
+                alive = []
+                for session in self._idle:
+                    if session.is_healthy() and session.idle_seconds() < self.idle_seconds:
+                        alive.append(session)
+                    else:
+                        self._retire(session)
+                self._idle = alive
+                missing = self.size - len(self._idle)
+
+            if time.monotonic() - self.last_used > self.warm_seconds:
+                continue
+            for _ in range(max(0, missing)):
+                try:
+                    session = self._create()
+                except Exception as e:
+                    print(f"预热识别器失败: {e}")
+                    break
+                with self._lock:
+                    self._idle.append(session)
+
+    def close(self):
+        """关闭连接池及所有空闲连接"""
+        self._running = False
+        self._wakeup.set()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            session.stop()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["idle"] = len(self._idle)
+        return stats
+
+
+# 单例模式
+recognizer_pool = None
+
+
+def get_recognizer_pool():
+    """获取识别器连接池单例"""
+    global recognizer_pool
+    if recognizer_pool is None:
+        recognizer_pool = RecognizerPool()
+    return recognizer_pool
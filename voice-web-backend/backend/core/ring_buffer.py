@@ -0,0 +1,243 @@
+import bisect
+import threading
+import time
+import wave
+from collections import deque
+
+from core.audio_frames import SAMPLE_RATE, SAMPLE_WIDTH
+
+
+class AudioRingBuffer:
+    """单生产者、多消费者的预分配PCM环形缓冲区
+
+    采集线程调用write写入，各消费者通过attach获得独立的读游标。
+    写入位置与读取位置都使用自开始以来的绝对字节偏移，环形下标由偏移取模得到；
+    读者落后超过容量时会被推进到最旧的可用数据处，并记录溢出次数与丢弃字节数。
+    """
+
+    def __init__(self, capacity_seconds=10.0, preroll_seconds=0.5, sample_rate=SAMPLE_RATE,
+                 sample_width=SAMPLE_WIDTH):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.bytes_per_second = sample_rate * sample_width
+        self.capacity = self._align(int(capacity_seconds * self.bytes_per_second))
+        self.preroll_bytes = min(self._align(int(preroll_seconds * self.bytes_per_second)), self.capacity)
+
+        self._buf = bytearray(self.capacity)
+        self._view = memoryview(self._buf)
+        self._write_pos = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._readers = {}
+        # (写入结束偏移, 采集时间戳)，用于给读到的数据找回采集时间
+        self._offsets = deque(maxlen=4096)
+        self._stamps = deque(maxlen=4096)
+
+    def _align(self, size):
+        return max(self.sample_width, size - size % self.sample_width)
+
+    @property
+    def write_pos(self):
+        return self._write_pos
+
+    def write(self, data, timestamp=None):
+        """写入一段PCM数据，超过容量的部分只保留最新的数据"""
+        data = memoryview(data).cast("B")
+        size = len(data)
+        if size == 0:
+            return
+        if size > self.capacity:
+            data = data[size - self.capacity:]
+        with self._cond:
+            # 截断后保留的数据对应逻辑位置[write_pos + size - len(data), write_pos + size)
+            start = (self._write_pos + size - len(data)) % self.capacity
+            first = min(len(data), self.capacity - start)
+            self._view[start:start + first] = data[:first]
+            if first < len(data):
+                self._view[:len(data) - first] = data[first:]
+            self._write_pos += size
+            self._offsets.append(self._write_pos)
+            self._stamps.append(timestamp if timestamp is not None else time.monotonic())
+            self._cond.notify_all()
+
+    def attach(self, name, preroll=False):
+        """注册一个新的读者
+
+        Args:
+            name: 读者名称，同名读者会被替换
+            preroll: 为True时读游标从preroll窗口起点开始，能读到最近一小段历史音频
+
+        Returns:
+            RingReader: 独立的读游标
+        """
+        with self._cond:
+            start = self._write_pos
+            if preroll:
+                start = max(0, self._write_pos - self.preroll_bytes)
+            reader = RingReader(self, name, start)
+            self._readers[name] = reader
+            return reader
+
+    def detach(self, name):
+        with self._cond:
+            self._readers.pop(name, None)
+            self._cond.notify_all()
+
+    def get_preroll(self, end_pos=None, size=None):
+        """复制出end_pos（默认当前写入位置）之前preroll窗口（或size字节）内的音频"""
+        size = self.preroll_bytes if size is None else size
+        with self._cond:
+            end = self._write_pos if end_pos is None else min(end_pos, self._write_pos)
+            start = max(0, end - size, self._write_pos - self.capacity)
+            out = bytearray(end - start)
+            self._copy_out(start, memoryview(out))
+            return bytes(out)
+
+    def close(self):
+        """关闭缓冲区，唤醒所有阻塞的读者"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        with self._cond:
+            self._closed = False
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _copy_out(self, pos, out):
+        """在持锁状态下把从绝对偏移pos开始的len(out)字节复制到out"""
+        size = len(out)
+        start = pos % self.capacity
+        first = min(size, self.capacity - start)
+        out[:first] = self._view[start:start + first]
+        if first < size:
+            out[first:size] = self._view[:size - first]
+
+    def _timestamp_for(self, end_pos):
+        """查找覆盖到end_pos的那次写入的采集时间"""
+        index = bisect.bisect_left(self._offsets, end_pos)
+        if index >= len(self._stamps):
+            index = len(self._stamps) - 1
+        return self._stamps[index] if index >= 0 else None
+
+    def stats(self):
+        """缓冲区与各读者的状态统计"""
+        with self._cond:
+            return {
+                "capacity_bytes": self.capacity,
+                "written_bytes": self._write_pos,
+                "readers": {
+                    name: {
+                        "pending_bytes": self._write_pos - reader.pos,
+                        "overruns": reader.overruns,
+                        "dropped_bytes": reader.dropped_bytes,
+                    }
+                    for name, reader in self._readers.items()
+                },
+            }
+
+
+class RingReader:
+    """环形缓冲区的独立读游标"""
+
+    def __init__(self, ring, name, pos):
+        self.ring = ring
+        self.name = name
+        self.pos = pos
+        self.overruns = 0
+        self.dropped_bytes = 0
+        # 最近一次读取的数据的采集时间
+        self.last_timestamp = None
+
+    def available(self):
+        return self.ring.write_pos - self.pos
+
+    def _skip_overrun(self):
+        oldest = self.ring.write_pos - self.ring.capacity
+        if self.pos < oldest:
+            self.overruns += 1
+            self.dropped_bytes += oldest - self.pos
+            self.pos = oldest
+
+    def read_into(self, out, timeout=None):
+        """阻塞直到能填满out（预分配的缓冲区），返回实际读取的字节数
+
+        超时或缓冲区关闭时返回已可用的部分（可能为0）。
+        """
+        out = memoryview(out).cast("B")
+        size = len(out)
+        ring = self.ring
+        with ring._cond:
+            ring._cond.wait_for(lambda: ring.write_pos - self.pos >= size or ring.closed, timeout)
+            self._skip_overrun()
+            count = min(size, ring.write_pos - self.pos)
+            if count <= 0:
+                return 0
+            ring._copy_out(self.pos, out[:count])
+            self.pos += count
+            self.last_timestamp = ring._timestamp_for(self.pos)
+            return count
+
+    def read(self, size, timeout=None):
+        """读取size字节，超时或关闭时返回不足size的数据，没有数据时返回None"""
+        out = bytearray(size)
+        count = self.read_into(out, timeout)
+        if count == 0:
+            return None
+        return bytes(out) if count == size else bytes(out[:count])
+
+    def seek_latest(self):
+        """跳过所有未读数据"""
+        with self.ring._cond:
+            self.pos = self.ring.write_pos
+
+    def detach(self):
+        self.ring.detach(self.name)
+
+
+class RingRecorder:
+    """作为环形缓冲区的一个读者，把采集到的音频写入WAV文件"""
+
+    def __init__(self, ring, file_path, chunk_bytes=6400, name="recorder", preroll=True):
+        self.ring = ring
+        self.file_path = file_path
+        self.chunk_bytes = chunk_bytes
+        self.name = name
+        self.preroll = preroll
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        reader = self.ring.attach(self.name, preroll=self.preroll)
+        self.thread = threading.Thread(target=self._record, args=(reader,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _record(self, reader):
+        buffer = bytearray(self.chunk_bytes)
+        view = memoryview(buffer)
+        try:
+            with wave.open(self.file_path, "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(self.ring.sample_width)
+                wav.setframerate(self.ring.sample_rate)
+                while self.running:
+                    count = reader.read_into(buffer, timeout=0.5)
+                    if count:
+                        wav.writeframes(view[:count])
+                    elif self.ring.closed:
+                        break
+        except Exception as e:
+            print(f"录音写入失败: {e}")
+        finally:
+            reader.detach()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
@@ -0,0 +1,262 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """合成缓存使用的文本规范化：全半角统一、去掉首尾空白并合并连续空白"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(text, voice, model, audio_format="mp3"):
+    """由规范化文本、音色、模型和音频格式计算内容地址"""
+    raw = "\0".join((normalize_text(text), voice or "", model or "", audio_format))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """按内容寻址的合成音频缓存
+
+    磁盘层按总字节数做LRU淘汰，文件按键的前两位分目录存放，扩展名对应音频格式（裸PCM还带采样率）；
+    内存层保存最近命中的小文件，命中时不读磁盘。启动时按文件修改时间重建磁盘层的LRU顺序。
+
+    Args:
+        cache_dir: 缓存目录
+        max_bytes: 磁盘层容量上限
+        memory_max_bytes: 内存层容量上限，为0时不使用内存层
+        memory_item_max_bytes: 超过该大小的音频不进入内存层
+        suffix: 默认扩展名
+        suffixes: 启动时识别为缓存文件的扩展名
+    """
+
+    # 启动时只删除修改时间早于该秒数的临时文件
+    TEMP_GRACE_SECONDS = 600
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024, memory_max_bytes=16 * 1024 * 1024,
+                 memory_item_max_bytes=1024 * 1024, suffix=".mp3", suffixes=(".mp3", ".wav", ".pcm", ".opus")):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self.memory_item_max_bytes = memory_item_max_bytes
+        self.suffix = suffix
+        self.suffixes = tuple(suffixes)
+        self.lock = threading.Lock()
+        # key -> 文件字节数，按最近使用排序
+        self.index = OrderedDict()
+        self.disk_bytes = 0
+        # key -> 最后使用时间（time.time()），供按年龄清理使用
+        self.last_used = {}
+        # key -> 文件扩展名，只记录与默认扩展名不同的条目
+        self.extensions = {}
+        # key -> 音频数据
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "hit_bytes": 0, "stored_bytes": 0,
+                      "evictions": 0, "memory_evictions": 0, "expired": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(".tmp"):
+                    # 上次运行中断时遗留的临时文件；较新的可能是其他进程正在写入的，保留
+                    try:
+                        if time.time() - os.stat(path).st_mtime > self.TEMP_GRACE_SECONDS:
+                            os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                # 扩展名可能包含多段（如裸PCM的.16000.pcm），键本身不含点
+                key, dot, ext = name.partition(".")
+                ext = dot + ext
+                if not ext.endswith(self.suffixes):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, key, ext, stat.st_size))
+        for mtime, key, ext, size in sorted(entries):
+            if ext != self.suffix:
+                self.extensions[key] = ext
+            self.index[key] = size
+            self.last_used[key] = mtime
+            self.disk_bytes += size
+        self._evict_disk()
+
+    def path_for(self, key, suffix=None):
+        suffix = suffix or self.extensions.get(key, self.suffix)
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def extension(self, key):
+        return self.extensions.get(key, self.suffix)
+
+    def contains(self, key):
+        with self.lock:
+            return key in self.index
+
+    def get(self, key):
+        """读取缓存的音频，未命中返回None"""
+        with self.lock:
+            audio = self.memory.get(key)
+            if audio is not None:
+                self.memory.move_to_end(key)
+                if key in self.index:
+                    self.index.move_to_end(key)
+                    self.last_used[key] = time.time()
+                self.stats["memory_hits"] += 1
+                self.stats["hit_bytes"] += len(audio)
+                return audio
+            if key not in self.index:
+                self.stats["misses"] += 1
+                return None
+            self.index.move_to_end(key)
+            self.last_used[key] = time.time()
+        try:
+            with open(self.path_for(key), "rb") as f:
+                audio = f.read()
+        except OSError:
+            with self.lock:
+                self._forget(key)
+                self.stats["misses"] += 1
+            return None
+        with self.lock:
+            self.stats["disk_hits"] += 1
+            self.stats["hit_bytes"] += len(audio)
+            self._remember(key, audio)
+        return audio
+
+    def get_path(self, key):
+        """返回缓存文件路径并刷新LRU顺序，未命中返回None"""
+        path = self.path_for(key)
+        with self.lock:
+            if key in self.index and not os.path.exists(path):
+                # 文件被外部删除时移除索引
+                self._forget(key)
+            if key not in self.index:
+                self.stats["misses"] += 1
+                return None
+            self.index.move_to_end(key)
+            self.last_used[key] = time.time()
+            self.stats["disk_hits"] += 1
+            self.stats["hit_bytes"] += self.index[key]
+        try:
+            # 刷新修改时间，重启后仍能恢复LRU顺序
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key, audio, suffix=None):
+        """写入缓存，返回缓存文件路径
+
+        Args:
+            suffix: 音频格式对应的扩展名，为None时使用默认扩展名
+        """
+        suffix = suffix or self.suffix
+        path = self.path_for(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写唯一命名的临时文件再替换，避免其他请求或进程读到不完整的音频
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(audio)
+        os.replace(temp_path, path)
+        with self.lock:
+            old = self.index.pop(key, None)
+            if old is not None:
+                self.disk_bytes -= old
+            if suffix != self.suffix:
+                self.extensions[key] = suffix
+            self.index[key] = len(audio)
+            self.last_used[key] = time.time()
+            self.disk_bytes += len(audio)
+            self.stats["stored_bytes"] += len(audio)
+            self._remember(key, audio)
+            self._evict_disk()
+        return path
+
+    def remember(self, key, audio):
+        """只放入内存层，不写磁盘；用于调用方未要求持久化的合成结果"""
+        with self.lock:
+            self._remember(key, audio)
+
+    def _remember(self, key, audio):
+        """放入内存层（调用方需持有lock）"""
+        if len(audio) > self.memory_item_max_bytes or len(audio) > self.memory_max_bytes:
+            return
+        old = self.memory.pop(key, None)
+        if old is not None:
+            self.memory_bytes -= len(old)
+        self.memory[key] = audio
+        self.memory_bytes += len(audio)
+        while self.memory_bytes > self.memory_max_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+            self.stats["memory_evictions"] += 1
+
+    def _evict_disk(self):
+        """淘汰最久未使用的磁盘条目直到不超过容量（调用方需持有lock）"""
+        while self.disk_bytes > self.max_bytes and self.index:
+            key = next(iter(self.index))
+            path = self.path_for(key)
+            self._forget(key)
+            self.stats["evictions"] += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def expire(self, max_age_seconds):
+        """删除超过max_age_seconds未被使用的磁盘条目，返回删除数"""
+        cutoff = time.time() - max_age_seconds
+        with self.lock:
+            # index按最近使用排序，从最旧的开始检查即可
+            expired = []
+            for key in self.index:
+                if self.last_used.get(key, 0) > cutoff:
+                    break
+                expired.append((key, self.path_for(key)))
+            for key, _ in expired:
+                self._forget(key)
+            self.stats["expired"] += len(expired)
+        for _, path in expired:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return len(expired)
+
+    def _forget(self, key):
+        """从索引和内存层移除条目（调用方需持有lock）"""
+        self.last_used.pop(key, None)
+        self.extensions.pop(key, None)
+        size = self.index.pop(key, None)
+        if size is not None:
+            self.disk_bytes -= size
+        audio = self.memory.pop(key, None)
+        if audio is not None:
+            self.memory_bytes -= len(audio)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats.update({
+                "entries": len(self.index),
+                "disk_bytes": self.disk_bytes,
+                "max_bytes": self.max_bytes,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory_bytes,
+            })
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
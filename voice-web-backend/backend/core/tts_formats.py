@@ -0,0 +1,99 @@
+from collections import namedtuple
+
+from dashscope.audio.tts_v2 import AudioFormat
+
+# 格式 -> (文件扩展名, Content-Type, 支持的采样率)
+FORMATS = {
+    "mp3": (".mp3", "audio/mpeg", (8000, 16000, 22050, 24000, 44100, 48000)),
+    "wav": (".wav", "audio/wav", (8000, 16000, 22050, 24000, 44100, 48000)),
+    "pcm": (".pcm", "audio/L16", (8000, 16000, 22050, 24000, 44100, 48000)),
+    "opus": (".opus", "audio/ogg", (8000, 16000, 24000, 48000)),
+}
+DEFAULT_FORMAT = "mp3"
+# SDK默认输出的采样率，未指定采样率时使用
+DEFAULT_SAMPLE_RATES = {"mp3": 22050, "wav": 22050, "pcm": 22050, "opus": 24000}
+# opus的码率，越低下载越省
+OPUS_BITRATE_KBPS = 32
+
+# 一次合成请求的输出格式：tag用于缓存键，sdk_format传给SpeechSynthesizer
+OutputFormat = namedtuple("OutputFormat", ["format", "sample_rate", "tag", "sdk_format", "suffix", "media_type"])
+
+
+def normalize_format(audio_format=None, sample_rate=None):
+    """校验格式与采样率，返回(格式, 采样率)；不支持时抛出ValueError"""
+    audio_format = (audio_format or DEFAULT_FORMAT).lower()
+    if audio_format not in FORMATS:
+        raise ValueError(f"不支持的音频格式: {audio_format}，可选 {', '.join(FORMATS)}")
+    sample_rate = sample_rate or DEFAULT_SAMPLE_RATES[audio_format]
+    if sample_rate not in FORMATS[audio_format][2]:
+        rates = ", ".join(str(rate) for rate in FORMATS[audio_format][2])
+        raise ValueError(f"{audio_format}不支持采样率{sample_rate}，可选 {rates}")
+    return audio_format, sample_rate
+
+
+def format_tag(audio_format, sample_rate):
+    """缓存键中使用的格式标识；默认的mp3保持原来的"mp3"，已有缓存仍能命中"""
+    if audio_format == DEFAULT_FORMAT and sample_rate == DEFAULT_SAMPLE_RATES[DEFAULT_FORMAT]:
+        return DEFAULT_FORMAT
+    return f"{audio_format}_{sample_rate}"
+
+
+def sdk_audio_format(audio_format, sample_rate):
+    """换算为SpeechSynthesizer的format参数，默认格式返回None以沿用SDK默认值"""
+    if format_tag(audio_format, sample_rate) == DEFAULT_FORMAT:
+        return None
+    if audio_format == "opus":
+        name = f"OGG_OPUS_{sample_rate // 1000}KHZ_MONO_{OPUS_BITRATE_KBPS}KBPS"
+    elif audio_format == "mp3":
+        name = f"MP3_{sample_rate}HZ_MONO_{128 if sample_rate <= 16000 else 256}KBPS"
+    else:
+        name = f"{audio_format.upper()}_{sample_rate}HZ_MONO_16BIT"
+    value = getattr(AudioFormat, name, None)
+    if value is None:
+        raise ValueError(f"当前SDK不支持{audio_format} {sample_rate}Hz输出")
+    return value
+
+
+def resolve(audio_format=None, sample_rate=None):
+    """解析请求的格式与采样率，不支持时抛出ValueError
+
+    Returns:
+        OutputFormat: 规范化后的输出格式
+    """
+    audio_format, sample_rate = normalize_format(audio_format, sample_rate)
+    return OutputFormat(audio_format, sample_rate, format_tag(audio_format, sample_rate),
+                        sdk_audio_format(audio_format, sample_rate), extension(audio_format, sample_rate),
+                        media_type(audio_format, sample_rate))
+
+
+def extension(audio_format, sample_rate=None):
+    """文件扩展名；裸PCM没有文件头，给定采样率时把采样率写进扩展名（如.16000.pcm）"""
+    if audio_format == "pcm" and sample_rate:
+        return f".{sample_rate}{FORMATS['pcm'][0]}"
+    return FORMATS[audio_format][0]
+
+
+def media_type(audio_format, sample_rate=None):
+    if audio_format == "pcm" and sample_rate:
+        return f"audio/L16;rate={sample_rate};channels=1"
+    return FORMATS[audio_format][1]
+
+
+def media_type_for_extension(ext):
+    """由缓存文件扩展名得到Content-Type，.16000.pcm这样的扩展名带上采样率"""
+    parts = ext.split(".")
+    for audio_format, (suffix, _, _) in FORMATS.items():
+        if suffix == "." + parts[-1]:
+            rate = parts[-2] if len(parts) > 2 else ""
+            return media_type(audio_format, int(rate) if rate.isdigit() else None)
+    return "application/octet-stream"
+
+
+def extension_for_media_type(content_type):
+    """由Content-Type得到扩展名，audio/L16带rate参数时扩展名记录采样率"""
+    base, *params = [part.strip() for part in content_type.split(";")]
+    rate = next((value for name, _, value in (param.partition("=") for param in params) if name == "rate"), "")
+    for audio_format, (suffix, media, _) in FORMATS.items():
+        if media == base:
+            return extension(audio_format, int(rate) if rate.isdigit() else None)
+    return FORMATS[DEFAULT_FORMAT][0]
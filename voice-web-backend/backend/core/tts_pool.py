@@ -0,0 +1,253 @@
+import os
+import threading
+import time
+
+from emulator import get_synthesizer_class
+
+
+def connect_synthesizer(synthesizer):
+    """提前建立合成器的WebSocket连接，返回是否已建连
+
+    SDK没有公开的连接方法，新版本在首次call时才调用私有的__connect。这不是稳定接口：
+    方法不存在或调用失败时返回False，合成器照常可用，连接在第一次合成时建立。
+    """
+    if not hasattr(synthesizer, "_SpeechSynthesizer__connect"):
+        return False
+    try:
+        synthesizer._SpeechSynthesizer__connect()
+    except Exception as e:
+        print(f"提前建连失败，改为合成时建连: {e}")
+        return False
+    return synthesizer_connected(synthesizer) is not False
+
+
+def synthesizer_connected(synthesizer):
+    """检查合成器的WebSocket是否仍然连着，无法判断时返回None"""
+    ws = getattr(synthesizer, "ws", None)
+    if ws is None:
+        return None
+    sock = getattr(ws, "sock", None)
+    return bool(sock is not None and getattr(sock, "connected", False))
+
+
+class SynthesizerSession:
+    """池中的一个合成器及其创建信息"""
+
+    def __init__(self, synthesizer, model, voice, audio_format=None, pooled=False):
+        self.synthesizer = synthesizer
+        self.model = model
+        self.voice = voice
+        self.audio_format = audio_format
+        # 是否是从池中借出的预建连合成器
+        self.pooled = pooled
+        # 预热时是否真正建好了连接；建好的要在借出前确认连接没有被服务端断开
+        self.connected = False
+        self.created_at = time.monotonic()
+
+    @property
+    def key(self):
+        return self.model, self.voice, self.audio_format
+
+    def idle_seconds(self):
+        return time.monotonic() - self.created_at
+
+    def is_healthy(self, idle_seconds):
+        if self.idle_seconds() >= idle_seconds:
+            return False
+        return not self.connected or synthesizer_connected(self.synthesizer) is not False
+
+    def close(self):
+        close = getattr(self.synthesizer, "close", None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception as e:
+            print(f"关闭合成器失败: {e}")
+
+
+class SynthesizerPool:
+    """按(model, voice, 输出格式)预建连的语音合成器池
+
+    SDK的SpeechSynthesizer只能call一次：合成结束后WebSocket已关闭但不会重连，再次call会失败。
+    因此池中的合成器都是单次使用的——借出一个已建好连接的合成器，合成后直接丢弃，
+    再在后台为该键补足max_per_key个新的预建连合成器（与SDK自带的SpeechSynthesizerObjectPool
+    做法一致），省去的是合成前建连和握手的时间。借出的预建连合成器合成失败时（如连接已被
+    服务端断开），换一个新建的合成器重试一次。空闲超过idle_seconds或连接已断开的合成器
+    借出前被丢弃，并由后台线程定期清理。
+
+    Args:
+        max_per_key: 每个键最多保留的预建连合成器数
+        idle_seconds: 预建连合成器的最长保留时间
+        check_interval: 后台清理的间隔（秒）
+    """
+
+    def __init__(self, max_per_key=2, idle_seconds=60.0, check_interval=5.0):
+        self.max_per_key = max_per_key
+        self.idle_seconds = idle_seconds
+        self.check_interval = check_interval
+
+        # (model, voice, audio_format) -> 预建连的SynthesizerSession列表，末尾是最新建好的
+        self._idle = {}
+        # 正在后台补充的键，避免同一个键同时起多个补充线程
+        self._warming = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.stats = {"warm_hits": 0, "cold_starts": 0, "prewarmed": 0, "expired": 0, "failed": 0,
+                      "retried": 0}
+
+        self._thread = threading.Thread(target=self._maintain)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _create(self, model, voice, audio_format=None):
+        kwargs = {"format": audio_format} if audio_format is not None else {}
+        synthesizer = get_synthesizer_class()(model=model, voice=voice, **kwargs)
+        return SynthesizerSession(synthesizer, model, voice, audio_format)
+
+    def acquire(self, model, voice, audio_format=None):
+        """借出一个合成器，优先取预建连的，没有时新建；借出后在后台补充该键的预建连合成器
+
+        借出的合成器只能合成一次，用完交给release丢弃，不会再回到池中。
+
+        Args:
+            audio_format: SDK的AudioFormat，为None时使用SDK默认格式
+        """
+        key = (model, voice, audio_format)
+        session = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                candidate = idle.pop()
+                if candidate.is_healthy(self.idle_seconds):
+                    session = candidate
+                    break
+                self.stats["expired"] += 1
+                threading.Thread(target=candidate.close, daemon=True).start()
+            if session is not None:
+                self.stats["warm_hits"] += 1
+            else:
+                self.stats["cold_starts"] += 1
+        if session is None:
+            session = self._create(model, voice, audio_format)
+        self.prewarm(model, voice, self.max_per_key, audio_format)
+        return session
+
+    def release(self, session, failed=False):
+        """丢弃用过的合成器"""
+        if failed:
+            with self._lock:
+                self.stats["failed"] += 1
+        session.close()
+
+    def _call_once(self, session, text):
+        try:
+            audio = session.synthesizer.call(text)
+        except Exception:
+            self.release(session, failed=True)
+            raise
+        self.release(session, failed=not audio)
+        return audio
+
+    def call(self, model, voice, text, audio_format=None):
+        """用池中的合成器合成text，返回音频数据
+
+        预建连的合成器合成失败时换新建的合成器重试一次，新建的合成器失败则直接抛出异常。
+        """
+        session = self.acquire(model, voice, audio_format)
+        try:
+            audio = self._call_once(session, text)
+        except Exception as e:
+            if not session.pooled:
+                raise
+            print(f"预建连合成器合成失败，新建合成器重试: {e}")
+            audio = None
+        if audio or not session.pooled:
+            return audio
+
+        with self._lock:
+            self.stats["retried"] += 1
+        return self._call_once(self._create(model, voice, audio_format), text)
+
+    def prewarm(self, model, voice, count=1, audio_format=None):
+        """在后台为(model, voice, audio_format)补足count个已建连的合成器，不阻塞调用方"""
+        count = min(count, self.max_per_key)
+        key = (model, voice, audio_format)
+        with self._lock:
+            if key in self._warming or len(self._idle.get(key, [])) >= count:
+                return
+            self._warming.add(key)
+
+        def warm():
+            warmed = 0
+            try:
+                while not self._stop_event.is_set():
+                    with self._lock:
+                        if len(self._idle.get(key, [])) >= count:
+                            break
+                    try:
+                        session = self._create(model, voice, audio_format)
+                    except Exception as e:
+                        print(f"预热合成器失败: {e}")
+                        break
+                    session.connected = connect_synthesizer(session.synthesizer)
+                    session.pooled = True
+                    with self._lock:
+                        self._idle.setdefault(key, []).insert(0, session)
+                        self.stats["prewarmed"] += 1
+                    warmed += 1
+            finally:
+                with self._lock:
+                    self._warming.discard(key)
+            if warmed:
+                print(f"合成器预热完成: {model}/{voice} +{warmed}")
+
+        threading.Thread(target=warm, daemon=True).start()
+
+    def _maintain(self):
+        """后台清理过期的预建连合成器"""
+        while not self._stop_event.wait(self.check_interval):
+            expired = []
+            with self._lock:
+                for key, idle in self._idle.items():
+                    alive = [s for s in idle if s.is_healthy(self.idle_seconds)]
+                    expired.extend(s for s in idle if s not in alive)
+                    self._idle[key] = alive
+                self.stats["expired"] += len(expired)
+            for session in expired:
+                session.close()
+
+    def close(self):
+        """关闭合成器池及所有预建连的合成器"""
+        self._stop_event.set()
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for sessions in idle.values():
+            for session in sessions:
+                session.close()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["idle"] = {
+                "/".join(str(getattr(part, "name", part)) for part in key if part is not None): len(idle)
+                for key, idle in self._idle.items() if idle
+            }
+        lookups = stats["warm_hits"] + stats["cold_starts"]
+        stats["warm_rate"] = stats["warm_hits"] / lookups if lookups else 0.0
+        return stats
+
+
+# 单例模式
+synthesizer_pool = None
+
+
+def get_synthesizer_pool():
+    """获取合成器池单例"""
+    global synthesizer_pool
+    if synthesizer_pool is None:
+        synthesizer_pool = SynthesizerPool(
+            max_per_key=int(os.getenv('tts_pool_per_key', '2')),
+            idle_seconds=float(os.getenv('tts_pool_idle_seconds', '60')),
+        )
+    return synthesizer_pool
@@ -0,0 +1,180 @@
+import asyncio
+import threading
+import time
+
+from dashscope.audio.tts_v2 import ResultCallback
+
+from core.asr_metrics import Histogram
+from emulator import get_synthesizer_class
+
+# 缓存命中时按该大小分块返回
+CACHED_CHUNK_BYTES = 16 * 1024
+# 工作池线程等待一次流式合成结束的最长时间（秒）
+SYNTHESIS_TIMEOUT_SECONDS = 60.0
+
+
+class ChunkStream(ResultCallback):
+    """把合成器在SDK线程中回调的音频块转交给事件循环
+
+    on_data收到的每个块立即放入asyncio队列，合成结束或出错时放入None作为结束标记，
+    并设置finished事件供工作池线程等待。完整合成成功后调用on_finished(audio)，用于写入缓存。
+    客户端提前断开时调用cancel取消合成。
+    """
+
+    def __init__(self, loop, on_finished=None):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.on_finished = on_finished
+        self.chunks = []
+        self.error = None
+        self.started = time.monotonic()
+        self.first_chunk_at = None
+        self.done = False
+        self.finished = threading.Event()
+        self.synthesizer = None
+        self.cancelled = False
+
+    def _put(self, item):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    def _finish(self, error=None):
+        if self.done:
+            return
+        self.done = True
+        self.error = error
+        self._put(None)
+        self.finished.set()
+
+    def on_open(self):
+        pass
+
+    def on_event(self, message):
+        pass
+
+    def on_data(self, data: bytes) -> None:
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.monotonic()
+        self.chunks.append(data)
+        self._put(data)
+
+    def on_complete(self):
+        # 已取消或出错的流只收到部分音频，不能写入缓存
+        if self.done:
+            return
+        if self.on_finished is not None and self.chunks:
+            try:
+                self.on_finished(b"".join(self.chunks))
+            except Exception as e:
+                print(f"保存流式合成结果失败: {e}")
+        self._finish()
+
+    def on_error(self, message):
+        self._finish(str(message))
+
+    def on_close(self):
+        self._finish()
+
+    def fail(self, error):
+        """合成没有开始（例如排队超时）时结束流"""
+        self._finish(str(error))
+
+    def cancel(self, reason="合成已取消"):
+        """客户端提前断开时取消合成：还在排队的不再开始，已开始的通知服务端停止"""
+        if self.done or self.cancelled:
+            return
+        self.cancelled = True
+        synthesizer = self.synthesizer
+        if synthesizer is not None:
+            # streaming_cancel会经WebSocket发送请求，不在事件循环线程里等待
+            threading.Thread(target=cancel_synthesizer, args=(synthesizer,), daemon=True).start()
+        self._finish(reason)
+
+    @property
+    def first_chunk_ms(self):
+        if self.first_chunk_at is None:
+            return None
+        return (self.first_chunk_at - self.started) * 1000
+
+    async def iter_chunks(self, timeout=30.0):
+        """逐块产出音频，两块之间超过timeout秒或合成出错时抛出RuntimeError"""
+        while True:
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                raise RuntimeError("等待合成音频超时")
+            if item is None:
+                break
+            yield item
+        if self.error:
+            raise RuntimeError(self.error)
+
+
+def cancel_synthesizer(synthesizer):
+    try:
+        synthesizer.streaming_cancel()
+    except Exception as e:
+        print(f"取消流式合成失败: {e}")
+
+
+def run_streaming_synthesis(model, voice, text, stream, audio_format=None):
+    """在工作池线程中执行流式合成，音频通过stream的回调送出
+
+    有回调时SDK的call发出请求后立即返回，这里等到stream结束才返回，使工作池的并发上限
+    对流式合成同样生效，并在首包到达后才读取首包延迟。
+
+    Args:
+        audio_format: SDK的AudioFormat，为None时使用SDK默认格式
+    """
+    if stream.cancelled:
+        return
+    kwargs = {"format": audio_format} if audio_format is not None else {}
+    synthesizer = get_synthesizer_class()(model=model, voice=voice, callback=stream, **kwargs)
+    synthesizer.call(text)
+    stream.synthesizer = synthesizer
+    if stream.cancelled:
+        # call返回前流已被取消，cancel时还拿不到合成器
+        cancel_synthesizer(synthesizer)
+        return
+    if not stream.finished.wait(SYNTHESIS_TIMEOUT_SECONDS):
+        stream.cancel("等待合成结束超时")
+        return
+    if stream.error:
+        return
+    try:
+        stream_stats.observe_first_package(synthesizer.get_first_package_delay())
+    except Exception:
+        pass
+
+
+async def iter_cached(audio, chunk_bytes=CACHED_CHUNK_BYTES):
+    for offset in range(0, len(audio), chunk_bytes):
+        yield audio[offset:offset + chunk_bytes]
+
+
+class StreamStats:
+    """流式合成统计：首块到达耗时（服务端观察）和SDK报告的首包延迟"""
+
+    def __init__(self):
+        self.counters = {"requests": 0, "cache_hits": 0, "completed": 0, "failed": 0, "bytes": 0}
+        self.first_chunk_ms = Histogram()
+        self.first_package_ms = Histogram()
+
+    def observe_first_package(self, delay_ms):
+        if delay_ms is not None and delay_ms >= 0:
+            self.first_package_ms.observe(delay_ms)
+
+    def record(self, stream, sent_bytes, error=None):
+        self.counters["failed" if error else "completed"] += 1
+        self.counters["bytes"] += sent_bytes
+        if stream is not None and stream.first_chunk_ms is not None:
+            self.first_chunk_ms.observe(stream.first_chunk_ms)
+
+    def snapshot(self):
+        return {
+            **self.counters,
+            "first_chunk_ms": self.first_chunk_ms.snapshot(),
+            "first_package_ms": self.first_package_ms.snapshot(),
+        }
+
+
+stream_stats = StreamStats()
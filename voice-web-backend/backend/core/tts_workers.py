@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.asr_metrics import Histogram
+
+
+class PoolSaturatedError(RuntimeError):
+    """工作线程和等待队列都已满，请求被立即拒绝"""
+
+
+class QueueTimeoutError(RuntimeError):
+    """请求在队列中等待超过上限，没有开始合成就被放弃"""
+
+
+class SynthesisPool:
+    """有界的语音合成工作池
+
+    阻塞的合成调用在独立线程池中执行，不占用事件循环。并发数由max_workers限制，
+    超出部分最多排队max_queue个，队列满时立即拒绝；排队超过queue_timeout秒的请求
+    在开始前被放弃，避免客户端早已超时的请求继续消耗上游配额。
+
+    Args:
+        max_workers: 同时进行的合成数
+        max_queue: 最多排队等待的请求数
+        queue_timeout: 最长排队时间（秒）
+    """
+
+    def __init__(self, max_workers=4, max_queue=16, queue_timeout=10.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.active = 0
+        self.counters = {"accepted": 0, "rejected_full": 0, "rejected_timeout": 0, "completed": 0, "failed": 0,
+                         "cancelled": 0}
+        self.queue_wait_ms = Histogram()
+        self.service_ms = Histogram()
+
+    def _admit(self):
+        with self.lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                self.counters["rejected_full"] += 1
+                raise PoolSaturatedError("语音合成繁忙，请稍后重试")
+            self.pending += 1
+            self.counters["accepted"] += 1
+
+    def _run(self, queued_at, fn, args):
+        started = time.monotonic()
+        waited = started - queued_at
+        with self.lock:
+            self.queue_wait_ms.observe(waited * 1000)
+            if waited > self.queue_timeout:
+                self.counters["rejected_timeout"] += 1
+                raise QueueTimeoutError(f"语音合成排队超时: {waited:.1f}s")
+            self.active += 1
+        try:
+            result = fn(*args)
+        except Exception:
+            with self.lock:
+                self.counters["failed"] += 1
+            raise
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.service_ms.observe((time.monotonic() - started) * 1000)
+        with self.lock:
+            self.counters["completed"] += 1
+        return result
+
+    def submit(self, fn, *args):
+        """在工作池中执行fn，返回concurrent.futures.Future；池满时抛出PoolSaturatedError"""
+        self._admit()
+        try:
+            future = self.executor.submit(self._run, time.monotonic(), fn, args)
+        except Exception:
+            with self.lock:
+                self.pending -= 1
+            raise
+        # 无论完成、出错、排队超时还是排队时被取消，每个被接纳的请求都在这里归还一个名额
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self.lock:
+            self.pending -= 1
+            if future.cancelled():
+                self.counters["cancelled"] += 1
+
+    async def run(self, fn, *args):
+        """在事件循环中等待工作池执行fn的结果"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queued": self.pending - self.active,
+                **self.counters,
+                "queue_wait_ms": self.queue_wait_ms.snapshot(),
+                "service_ms": self.service_ms.snapshot(),
+            }
@@ -0,0 +1,253 @@
+import sys
+import wave
+from collections import deque, namedtuple
+
+import numpy as np
+
+from core.audio_frames import SAMPLE_RATE, frame_length, pcm_view, to_dbfs
+
+# 单个子帧的判决记录，用于离线调参
+FrameDecision = namedtuple(
+    "FrameDecision",
+    ["index", "energy_db", "zcr", "flatness", "noise_floor_db", "voiced", "speaking"],
+)
+# 一次process调用的汇总结果
+VADResult = namedtuple("VADResult", ["is_speech", "onset", "offset", "voiced_frames", "frames"])
+
+
+class VoiceActivityDetector:
+    """语音活动检测器接口
+
+    实现类需要按顺序接收16bit PCM数据块，并维护"是否正在说话"的状态。
+    """
+
+    def process(self, audio_data):
+        """处理一段PCM数据
+
+        Args:
+            audio_data: 16bit小端PCM数据
+
+        Returns:
+            VADResult: 本段结束时是否处于说话状态，以及是否发生了起始/结束跳变
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """清空内部状态"""
+        raise NotImplementedError
+
+    @property
+    def is_speaking(self):
+        raise NotImplementedError
+
+    @property
+    def onset_seconds(self):
+        """进入说话状态前需要的连续有声时长，起点判决时这段语音已经过去"""
+        return 0.0
+
+    def get_trace(self):
+        """获取逐帧判决记录，未开启记录时返回空列表"""
+        return []
+
+
+class NoiseFloorTracker:
+    """自适应噪声底估计
+
+    噪声底下降时快速跟随，上升时缓慢跟随；被判为语音的帧以更慢的速度上调，
+    这样持续的环境噪声变大后噪声底最终也能追上来。
+    """
+
+    def __init__(self, initial_db=-60.0, attack=0.1, release=0.02, speech_release=0.002,
+                 min_db=-90.0, max_db=-20.0):
+        self.initial_db = initial_db
+        self.attack = attack
+        self.release = release
+        self.speech_release = speech_release
+        self.min_db = min_db
+        self.max_db = max_db
+        self.floor_db = initial_db
+
+    def update(self, energy_db, voiced=False):
+        """用一帧的能量更新噪声底，返回更新后的值"""
+        if energy_db < self.floor_db:
+            rate = self.attack
+        elif voiced:
+            rate = self.speech_release
+        else:
+            rate = self.release
+        self.floor_db += rate * (energy_db - self.floor_db)
+        self.floor_db = min(max(self.floor_db, self.min_db), self.max_db)
+        return self.floor_db
+
+    def reset(self):
+        self.floor_db = self.initial_db
+
+
+class ThresholdVAD(VoiceActivityDetector):
+    """与旧版逻辑一致的平均幅度阈值检测"""
+
+    def __init__(self, threshold=500, onset_chunks=4):
+        self.threshold = threshold
+        self.onset_chunks = onset_chunks
+        self._talking = 0
+        self._speaking = False
+
+    def process(self, audio_data):
+        samples = pcm_view(audio_data)
+        volume = float(np.abs(samples.astype(np.float32)).mean()) if samples.size else 0.0
+        voiced = volume > self.threshold
+        was_speaking = self._speaking
+        if voiced:
+            self._talking += 1
+            if self._talking >= self.onset_chunks:
+                self._speaking = True
+        else:
+            self._talking = 0
+            self._speaking = False
+        return VADResult(self._speaking, self._speaking and not was_speaking,
+                         was_speaking and not self._speaking, int(voiced), 1)
+
+    def reset(self):
+        self._talking = 0
+        self._speaking = False
+
+    @property
+    def is_speaking(self):
+        return self._speaking
+
+
+class EnergyZcrFlatnessVAD(VoiceActivityDetector):
+    """基于能量、过零率和谱平坦度的多特征语音检测
+
+    每个子帧先判断能量是否高于噪声底一定余量，再要求过零率落在语音范围内
+    或频谱不平坦（噪声的谱平坦度接近1）。连续onset_ms的有声帧才进入说话状态，
+    说话状态在最后一个有声帧之后保持hangover_ms。
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=20, energy_margin_db=10.0,
+                 min_speech_db=-55.0, zcr_range=(0.02, 0.35), max_flatness=0.45,
+                 onset_ms=100, hangover_ms=300, noise_tracker=None, trace=False, trace_size=5000):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_len = frame_length(frame_ms, sample_rate)
+        self.energy_margin_db = energy_margin_db
+        self.min_speech_db = min_speech_db
+        self.zcr_range = zcr_range
+        self.max_flatness = max_flatness
+        self.onset_frames = max(1, int(round(onset_ms / frame_ms)))
+        self.hangover_frames = max(0, int(round(hangover_ms / frame_ms)))
+        self.noise_tracker = noise_tracker or NoiseFloorTracker()
+        self.trace_enabled = trace
+        self.trace = deque(maxlen=trace_size)
+
+        self._window = np.hanning(self.frame_len).astype(np.float32)
+        self._remainder = b""
+        self._frame_index = 0
+        self._voiced_run = 0
+        self._hangover_left = 0
+        self._speaking = False
+
+    def _features(self, frames):
+        """对形如(帧数, 帧长)的float32数组计算能量、过零率和谱平坦度"""
+        energy_db = to_dbfs(np.sqrt(np.mean(frames * frames, axis=1)))
+
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(self.frame_len - 1 or 1)
+
+        power = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2 + 1e-10
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        return energy_db, zcr, flatness
+
+    def process(self, audio_data):
+        if self._remainder:
+            audio_data = self._remainder + bytes(audio_data)
+        samples = pcm_view(audio_data)
+        usable = samples.size - samples.size % self.frame_len
+        self._remainder = bytes(audio_data[usable * 2:])
+
+        was_speaking = self._speaking
+        if usable == 0:
+            return VADResult(self._speaking, False, False, 0, 0)
+
+        frames = samples[:usable].astype(np.float32).reshape(-1, self.frame_len)
+        energy_db, zcr, flatness = self._features(frames)
+
+        voiced_count = 0
+        for i in range(frames.shape[0]):
+            floor_db = self.noise_tracker.floor_db
+            e = float(energy_db[i])
+            voiced = (e > floor_db + self.energy_margin_db and e > self.min_speech_db
+                      and (self.zcr_range[0] <= zcr[i] <= self.zcr_range[1]
+                           or flatness[i] < self.max_flatness))
+            self.noise_tracker.update(e, voiced)
+
+            if voiced:
+                voiced_count += 1
+                self._voiced_run += 1
+                if self._voiced_run >= self.onset_frames:
+                    self._speaking = True
+                    self._hangover_left = self.hangover_frames
+            else:
+                self._voiced_run = 0
+                if self._speaking:
+                    if self._hangover_left > 0:
+                        self._hangover_left -= 1
+                    else:
+                        self._speaking = False
+
+            if self.trace_enabled:
+                self.trace.append(FrameDecision(self._frame_index, e, float(zcr[i]), float(flatness[i]),
+                                                floor_db, voiced, self._speaking))
+            self._frame_index += 1
+
+        return VADResult(self._speaking, self._speaking and not was_speaking,
+                         was_speaking and not self._speaking, voiced_count, frames.shape[0])
+
+    def reset(self):
+        self._remainder = b""
+        self._frame_index = 0
+        self._voiced_run = 0
+        self._hangover_left = 0
+        self._speaking = False
+        self.noise_tracker.reset()
+        self.trace.clear()
+
+    @property
+    def is_speaking(self):
+        return self._speaking
+
+    @property
+    def onset_seconds(self):
+        return self.onset_frames * self.frame_ms / 1000
+
+    @property
+    def noise_floor_db(self):
+        return self.noise_tracker.floor_db
+
+    def get_trace(self):
+        return [decision._asdict() for decision in self.trace]
+
+
+def trace_wav(file_path, vad=None, chunk_frames=3200):
+    """用VAD逐块处理一个16kHz单声道WAV文件，返回逐帧判决记录"""
+    vad = vad or EnergyZcrFlatnessVAD(trace=True, trace_size=None)
+    vad.trace_enabled = True
+    with wave.open(file_path, "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError("仅支持16bit单声道WAV文件")
+        while True:
+            data = wav.readframes(chunk_frames)
+            if not data:
+                break
+            vad.process(data)
+    return vad.get_trace()
+
+
+if __name__ == "__main__":
+    # 用法: python -m core.vad recording.wav > trace.csv
+    if len(sys.argv) < 2:
+        print("用法: python -m core.vad <16kHz单声道wav文件>")
+        sys.exit(1)
+    print(",".join(FrameDecision._fields))
+    for row in trace_wav(sys.argv[1]):
+        print(",".join(f"{v:.4f}" if isinstance(v, float) else str(v) for v in row.values()))
@@ -1,16 +1,25 @@
+import asyncio
+import json
 import os
-import uuid
-from fastapi import FastAPI, HTTPException, APIRouter
-from fastapi.responses import FileResponse
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import dashscope
-from dashscope.audio.tts_v2 import SpeechSynthesizer
 import uvicorn
 
 from playsound import playsound
 import threading
 import time
 from dotenv import load_dotenv
+
+from core.audio_retention import AudioRetentionSweeper
+from core.audio_store import get_audio_store
+from core import tts_formats
+from core.tts_cache import TTSCache, cache_key
+from core.tts_pool import get_synthesizer_pool
+from core.tts_stream import ChunkStream, iter_cached, run_streaming_synthesis, stream_stats
+from core.tts_workers import PoolSaturatedError, QueueTimeoutError, SynthesisPool
 # 加载环境变量
 load_dotenv('../.env')
 apiKey = os.getenv('dashscope_api_key')
@@ -23,6 +32,39 @@ dashscope.api_key = apiKey
 OUTPUT_DIR = "voice-web-backend/backend/static/audio"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# 合成音频缓存：相同文本、音色和模型的请求直接返回已合成的音频
+tts_cache = TTSCache(
+    os.getenv('tts_cache_dir', f"{OUTPUT_DIR}/cache"),
+    max_bytes=int(os.getenv('tts_cache_max_mb', '256')) * 1024 * 1024,
+    memory_max_bytes=int(os.getenv('tts_cache_memory_mb', '16')) * 1024 * 1024,
+)
+
+# 合成工作池：阻塞的合成调用不在事件循环中执行，繁忙时快速拒绝
+synthesis_pool = SynthesisPool(
+    max_workers=int(os.getenv('tts_workers', '4')),
+    max_queue=int(os.getenv('tts_queue_size', '16')),
+    queue_timeout=float(os.getenv('tts_queue_timeout', '10')),
+)
+
+# 按(model, voice)复用的合成器，省去每段合成的建连开销
+synthesizer_pool = get_synthesizer_pool()
+
+# 后台按年龄和总大小清理音频目录，缓存目录由缓存按最后使用时间清理；由应用启动时start
+retention_sweeper = AudioRetentionSweeper(
+    OUTPUT_DIR,
+    max_age_seconds=float(os.getenv('tts_audio_max_age_hours', '168')) * 3600,
+    max_bytes=int(os.getenv('tts_audio_dir_max_mb', '1024')) * 1024 * 1024,
+    interval_seconds=float(os.getenv('tts_retention_interval', '600')),
+    caches=(tts_cache,),
+)
+
+# 进程内音频对象存储：不要求持久化的合成结果只保存在内存中，通过ID或短期URL获取
+audio_store = get_audio_store()
+AUDIO_OBJECT_URL = "/api/api/tts/object/{}"
+
+# 批量合成时单个请求最多同时合成的片段数
+BATCH_MAX_CONCURRENCY = int(os.getenv('tts_batch_concurrency', '4'))
+
 # 创建FastAPI应用
 app = FastAPI(title="文本转语音服务")
 router = APIRouter()
@@ -33,27 +75,116 @@ class TTSRequest(BaseModel):
     text: str
     model: str = "cosyvoice-v2"
     voice: str = "longshu_v2"
+    # 为False时不写磁盘，音频放入内存对象存储并返回audio_id和短期URL
+    persist: bool = True
+    # 输出格式：mp3 / wav / pcm / opus；采样率为空时使用该格式的默认值
+    format: str = tts_formats.DEFAULT_FORMAT
+    sample_rate: Optional[int] = None
 
 
-@router.post("/api/tts")
-async def text_to_speech(request: TTSRequest):
+class TTSBatchRequest(BaseModel):
+    segments: List[str]
+    model: str = "cosyvoice-v2"
+    voice: str = "longshu_v2"
+    persist: bool = False
+    format: str = tts_formats.DEFAULT_FORMAT
+    sample_rate: Optional[int] = None
+    # 同时合成的片段数，不超过BATCH_MAX_CONCURRENCY
+    concurrency: int = BATCH_MAX_CONCURRENCY
+
+
+def output_format(request):
+    """解析请求的输出格式，不支持时返回400"""
+    try:
+        return tts_formats.resolve(request.format, request.sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def request_cache_key(request, output):
+    return cache_key(request.text, request.voice, request.model, output.tag)
+
+
+def synthesize_audio(request, output):
+    """调用合成服务，在工作池线程中执行，返回音频数据"""
+    # 从合成器池借用同音色同格式的合成器生成语音
+    audio = synthesizer_pool.call(request.model, request.voice, request.text, output.sdk_format)
+    if not audio:
+        raise RuntimeError("语音合成服务没有返回音频")
+    return audio
+
+
+def synthesize_to_cache(request, output, key):
+    """合成并写入缓存，返回音频文件路径"""
+    return tts_cache.put(key, synthesize_audio(request, output), output.suffix)
+
+
+async def run_synthesis(fn, *args):
+    """在合成工作池中执行fn，池满返回429，排队超时返回503"""
+    try:
+        return await synthesis_pool.run(fn, *args)
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except QueueTimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+async def synthesize_cached(request, output):
+    """优先从缓存取音频，未命中时交给合成工作池
+
+    Returns:
+        tuple: (缓存键, 音频文件路径, 是否命中缓存)
     """
-    将文本转换为语音并返回MP3文件
+    key = request_cache_key(request, output)
+    path = tts_cache.get_path(key)
+    if path is not None:
+        return key, path, True
+    path = await run_synthesis(synthesize_to_cache, request, output, key)
+    return key, path, False
+
+
+async def synthesize_in_memory(request, output):
+    """不落盘的合成：缓存命中时直接取音频，未命中时合成结果只进入缓存的内存层
+
+    Returns:
+        tuple: (缓存键, 音频数据, 是否命中缓存)
     """
-    try:
-        # 初始化语音合成器
-        synthesizer = SpeechSynthesizer(model=request.model, voice=request.voice)
-        # 生成语音
-        audio = synthesizer.call(request.text)
-        # 生成唯一文件名
-        output_file = f'voice-web-backend/backend/static/audio/temp_{time.strftime("%Y%m%d_%H%M%S")}.mp3'
+    key = request_cache_key(request, output)
+    audio = tts_cache.get(key)
+    if audio is not None:
+        return key, audio, True
+    audio = await run_synthesis(synthesize_audio, request, output)
+    tts_cache.remember(key, audio)
+    return key, audio, False
+
 
-        # 保存音频文件
-        with open(output_file, 'wb') as f:
+async def synthesize_response(request):
+    """合成一段语音并生成响应内容，persist为False时音频放入内存对象存储"""
+    output = output_format(request)
+    result = {"status": "success", "message": "语音生成成功", "format": output.format,
+              "sample_rate": output.sample_rate, "media_type": output.media_type}
+    if not request.persist:
+        key, audio, cached = await synthesize_in_memory(request, output)
+        audio_id = audio_store.put(audio, key=key, media_type=output.media_type)
+        result.update({"audio_id": audio_id, "audio_url": AUDIO_OBJECT_URL.format(audio_id),
+                       "expires_in": audio_store.ttl_seconds, "cache_key": key, "cached": cached})
+        return result
+    key, output_file, cached = await synthesize_cached(request, output)
+    result.update({"file_path": output_file, "cache_key": key, "cached": cached})
+    return result
 
-            f.write(audio)
 
-        return {"status": "success", "message": "语音生成成功", "file_path": output_file}
+@router.post("/api/tts")
+async def text_to_speech(request: TTSRequest):
+    """
+    将文本转换为语音并返回音频文件，默认MP3，可通过format和sample_rate选择输出格式
+
+    persist为False时音频只保存在内存中，返回audio_id和短期有效的audio_url
+    """
+    try:
+        return await synthesize_response(request)
+    except HTTPException:
+        raise
         # 返回文件
         # return FileResponse(
         #     path=output_file,
@@ -70,18 +201,7 @@ async def text_to_speech_play(request: TTSRequest):
     将文本转换为语音并通过系统扬声器播放
     """
     try:
-        # 初始化语音合成器
-        synthesizer = SpeechSynthesizer(model=request.model, voice=request.voice)
-
-        # 生成语音
-        audio = synthesizer.call(request.text)
-
-        # 生成唯一文件名
-        output_file = f"{OUTPUT_DIR}/{uuid.uuid4()}.mp3"
-
-        # 保存音频文件
-        with open(output_file, 'wb') as f:
-            f.write(audio)
+        _, output_file, _ = await synthesize_cached(request, output_format(request))
 
         # 在后台线程中播放音频，避免阻塞API响应
         def play_audio():
@@ -91,9 +211,238 @@ async def text_to_speech_play(request: TTSRequest):
 
         # 返回成功信息
         return {"status": "success", "message": "正在播放音频", "file_path": output_file}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"语音生成或播放失败: {str(e)}")
 
 
+async def synthesize_batch_item(index, request, semaphore):
+    """合成批量请求中的一个片段，出错时返回错误结果而不是抛出异常"""
+    started = time.monotonic()
+    async with semaphore:
+        try:
+            result = await synthesize_response(request)
+        except HTTPException as e:
+            result = {"status": "error", "code": e.status_code, "message": e.detail}
+        except Exception as e:
+            result = {"status": "error", "code": 500, "message": f"语音生成失败: {str(e)}"}
+    result["index"] = index
+    result["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return result
+
+
+async def stream_batch_body(batch):
+    """按完成顺序逐行输出各片段的结果（NDJSON），最后一行为汇总"""
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(max(1, min(batch.concurrency, BATCH_MAX_CONCURRENCY)))
+    tasks = [
+        asyncio.ensure_future(synthesize_batch_item(
+            index, TTSRequest(text=text, model=batch.model, voice=batch.voice, persist=batch.persist,
+                              format=batch.format, sample_rate=batch.sample_rate), semaphore))
+        for index, text in enumerate(batch.segments)
+    ]
+    failed = 0
+    try:
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            if result["status"] != "success":
+                failed += 1
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True, "count": len(tasks), "failed": failed,
+                          "elapsed_ms": round((time.monotonic() - started) * 1000, 1)}) + "\n"
+    finally:
+        # 客户端提前断开（如播放端被打断）时取消剩余片段：还在等信号量的直接结束，
+        # 已提交到工作池但仍在排队的随之取消，名额由工作池的完成回调归还；
+        # 已经开始合成的无法中止，完成后照常归还名额
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/api/tts/batch")
+async def text_to_speech_batch(batch: TTSBatchRequest):
+    """
+    批量合成：各片段在并发上限内同时合成，每完成一段就返回一行带index的结果，
+    总耗时取决于最慢的片段而不是所有片段之和
+    """
+    if not batch.segments:
+        raise HTTPException(status_code=400, detail="segments不能为空")
+    output_format(batch)
+    return StreamingResponse(stream_batch_body(batch), media_type="application/x-ndjson")
+
+
+def end_stream_on_error(stream, future):
+    if future.cancelled():
+        stream.fail("合成请求已取消")
+    elif future.exception() is not None:
+        stream.fail(future.exception())
+
+
+def open_tts_stream(request, output):
+    """开始一次流式合成
+
+    缓存命中时直接分块返回缓存音频；否则把合成提交到工作池，音频块在到达时立即产出，
+    完整合成后写入缓存。
+
+    Returns:
+        tuple: (ChunkStream或None, 音频块异步迭代器, 是否命中缓存)
+    """
+    stream_stats.counters["requests"] += 1
+    key = request_cache_key(request, output)
+    audio = tts_cache.get(key)
+    if audio is not None:
+        stream_stats.counters["cache_hits"] += 1
+        return None, iter_cached(audio), True
+
+    stream = ChunkStream(asyncio.get_running_loop(),
+                         on_finished=lambda data: tts_cache.put(key, data, output.suffix))
+    try:
+        future = synthesis_pool.submit(run_streaming_synthesis, request.model, request.voice, request.text, stream,
+                                       output.sdk_format)
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    # 排队超时或合成调用抛出异常时结束流，避免客户端一直等待
+    future.add_done_callback(lambda f: end_stream_on_error(stream, f))
+    return stream, stream.iter_chunks(), False
+
+
+async def stream_tts_body(stream, chunks):
+    """StreamingResponse的响应体，响应头已发送后出错只能提前结束"""
+    sent = 0
+    error = None
+    try:
+        async for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    except Exception as e:
+        error = e
+        print(f"流式语音合成失败: {e}")
+    finally:
+        # 客户端提前断开时响应体被关闭，取消还在进行的合成
+        if stream is not None:
+            stream.cancel()
+        stream_stats.record(stream, sent, error)
+
+
+@router.post("/api/tts/stream")
+async def text_to_speech_stream(request: TTSRequest):
+    """
+    流式合成：合成器每产出一块音频就通过分块传输返回，客户端可在首包到达后开始播放
+    """
+    output = output_format(request)
+    stream, chunks, cached = open_tts_stream(request, output)
+    return StreamingResponse(stream_tts_body(stream, chunks), media_type=output.media_type,
+                             headers={"X-TTS-Cached": "1" if cached else "0"})
+
+
+@router.websocket("/api/tts/ws")
+async def text_to_speech_ws(websocket: WebSocket):
+    """WebSocket流式合成：客户端发送JSON请求，服务端逐块发送二进制音频，结束后发送end消息"""
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive_json()
+            sent = 0
+            stream = None
+            try:
+                request = TTSRequest(**message)
+                output = output_format(request)
+                stream, chunks, cached = open_tts_stream(request, output)
+                async for chunk in chunks:
+                    await websocket.send_bytes(chunk)
+                    sent += len(chunk)
+                stream_stats.record(stream, sent)
+                await websocket.send_json({
+                    "type": "end",
+                    "bytes": sent,
+                    "cached": cached,
+                    "format": output.format,
+                    "sample_rate": output.sample_rate,
+                    "first_chunk_ms": stream.first_chunk_ms if stream else 0.0,
+                })
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "status": e.status_code, "message": e.detail})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                stream_stats.record(stream, sent, e)
+                await websocket.send_json({"type": "error", "message": str(e)})
+            finally:
+                if stream is not None:
+                    stream.cancel()
+    except WebSocketDisconnect:
+        pass
+
+
+@router.get("/api/tts/stream/stats")
+async def get_tts_stream_stats():
+    """获取流式合成的首块耗时与SDK首包延迟分布"""
+    return {"status": "success", "stats": stream_stats.snapshot()}
+
+
+@router.get("/api/tts/audio/{key}")
+async def get_cached_audio(key: str):
+    """按缓存键返回已合成的音频，热数据直接从内存返回"""
+    if len(key) != 64 or any(c not in "0123456789abcdef" for c in key):
+        raise HTTPException(status_code=400, detail="无效的缓存键")
+    audio = tts_cache.get(key)
+    if audio is None:
+        raise HTTPException(status_code=404, detail="音频不存在或已被淘汰")
+    return Response(content=audio, media_type=tts_formats.media_type_for_extension(tts_cache.extension(key)))
+
+
+@router.get("/api/tts/object/{audio_id}")
+async def get_audio_object(audio_id: str):
+    """按ID返回内存中的合成音频，过期后返回404"""
+    obj = audio_store.get(audio_id)
+    if obj is None:
+        raise HTTPException(status_code=404, detail="音频不存在或已过期")
+    return Response(content=obj.audio, media_type=obj.media_type)
+
+
+@router.post("/api/tts/object/{audio_id}/persist")
+async def persist_audio_object(audio_id: str):
+    """把内存中的音频写入磁盘缓存，返回文件路径"""
+    obj = audio_store.get(audio_id)
+    if obj is None:
+        raise HTTPException(status_code=404, detail="音频不存在或已过期")
+    suffix = tts_formats.extension_for_media_type(obj.media_type)
+    output_file = audio_store.persist(audio_id, lambda key, audio: tts_cache.put(key, audio, suffix))
+    if output_file is None:
+        raise HTTPException(status_code=404, detail="音频不存在或已过期")
+    return {"status": "success", "file_path": output_file}
+
+
+@router.get("/api/tts/objects")
+async def get_audio_store_stats():
+    """获取内存音频对象存储的对象数、字节数与过期淘汰统计"""
+    return {"status": "success", "stats": audio_store.get_stats()}
+
+
+@router.get("/api/tts/retention")
+async def get_audio_retention_stats():
+    """获取音频目录清理的删除数、目录大小与上次清理耗时"""
+    return {"status": "success", "stats": retention_sweeper.get_stats()}
+
+
+@router.get("/api/tts/pool")
+async def get_synthesizer_pool_stats():
+    """获取合成器池的预建连命中率、各音色预建连数与失败重试统计"""
+    return {"status": "success", "stats": synthesizer_pool.get_stats()}
+
+
+@router.get("/api/tts/workers")
+async def get_tts_worker_stats():
+    """获取合成工作池的并发、排队、拒绝次数以及排队/合成耗时分布"""
+    return {"status": "success", "stats": synthesis_pool.get_stats()}
+
+
+@router.get("/api/tts/cache")
+async def get_tts_cache_stats():
+    """获取合成缓存的命中率、字节数与淘汰统计"""
+    return {"status": "success", "stats": tts_cache.get_stats()}
+
+
 if __name__ == "__main__":
+    retention_sweeper.start()
     uvicorn.run(app, host="0.0.0.0", port=tts_port)
\ No newline at end of file
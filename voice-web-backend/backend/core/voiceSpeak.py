@@ -1,3 +1,4 @@
+import json
 import requests
 import time
 import threading
@@ -6,13 +7,24 @@ import os
 import queue
 import re
 
+from core.audio_store import get_audio_store
 from core.playMp3 import MP3Player
+from core.tts_formats import extension
 from dotenv import load_dotenv
 # 加载环境变量
 load_dotenv('voice-web-backend/backend/.env.local')
 apiKey = os.getenv('dashscope_api_key')
 tts_port = os.getenv('tts_port', '51000')
-TTS_API_URL = f"http://localhost:{tts_port}/api/api/tts"
+TTS_BASE_URL = f"http://localhost:{tts_port}"
+TTS_API_URL = f"{TTS_BASE_URL}/api/api/tts"
+TTS_BATCH_URL = f"{TTS_BASE_URL}/api/api/tts/batch"
+# 本地播放请求的音频格式，默认裸PCM，播放时无需解码
+PLAYBACK_FORMAT = os.getenv('tts_playback_format', 'pcm')
+PLAYBACK_SAMPLE_RATE = int(os.getenv('tts_playback_sample_rate', '22050'))
+# 批量合成中被工作池拒绝（繁忙/排队超时）的片段改用单段接口重试
+RETRYABLE_STATUS = (429, 503)
+SEGMENT_RETRY_ATTEMPTS = 2
+SEGMENT_RETRY_DELAY = 1.0
 
 # 语音文件存储路径
 VOICE_DATA_DIR = Path("backend/static/audio")
@@ -30,6 +42,17 @@ class VoiceSpeak:
 
         self.tts_request_count=0
 
+        # 每次speak递增的轮次号，被打断后旧轮次的合成与播放线程据此退出，
+        # 不会因为新一轮把buffer_thread_running重新置为True而继续合成
+        self.speak_generation = 0
+        self.cancelled_segments = 0
+        # 直接从内存对象存储取走音频的次数 / 通过短期URL下载的次数
+        self.memory_handoffs = 0
+        self.url_fetches = 0
+        self.retried_segments = 0
+        # 当前轮次的批量合成响应，打断时关闭连接让服务端停止合成
+        self.batch_response = None
+
         # 当前选择的角色
         self.current_role = {
             "id": "assistant",
@@ -51,10 +74,23 @@ class VoiceSpeak:
         segments = re.split(r'(?<=[。！？.!?])', text)
         print("分割文本片段：", [str(i) for i in segments if i != ''])
         return [segment.strip() for segment in segments if segment != '']
+
+    def is_current(self, generation):
+        return self.buffer_thread_running and generation == self.speak_generation
+
     def interrupt_ai(self):
-        """中断AI语音输出"""
+        """中断AI语音输出，并取消本轮尚未合成的片段"""
         try:
             print("处理中断AI请求")
+            with self.buffer_thread_lock:
+                self.speak_generation += 1
+                self.buffer_thread_running = False
+                response, self.batch_response = self.batch_response, None
+            if response is not None:
+                try:
+                    response.close()
+                except Exception as e:
+                    print(f"关闭批量合成连接失败: {e}")
             
             # 确保播放器正确初始化
             if not self.ensure_player_initialized():
@@ -84,44 +120,69 @@ class VoiceSpeak:
             return {"status": "error", "message": str(e)}
 
 
+    def request_audio(self, text):
+        """请求合成一段语音，返回音频数据，失败时返回None
+
+        请求不落盘的合成结果：与合成服务在同一进程时直接从内存对象存储取走音频，
+        否则通过返回的短期URL下载，全程不读写音频文件。
+        """
+        response = requests.post(TTS_API_URL, json={
+            "text": text,
+            "voice": self.current_role["voice"],
+            "model": "cosyvoice-v2",
+            "persist": False,
+            "format": PLAYBACK_FORMAT,
+            "sample_rate": PLAYBACK_SAMPLE_RATE
+        })
+        if response.status_code != 200:
+            print(f"TTS API请求失败: {response.status_code}, {response.text}")
+            return None
+
+        return self.fetch_audio(response.json())
+
+    def fetch_audio(self, response_data):
+        """根据合成结果中的audio_id取音频：同进程时直接从内存对象存储取走，否则下载audio_url"""
+        obj = get_audio_store().take(response_data["audio_id"])
+        if obj is not None:
+            self.memory_handoffs += 1
+            return obj.audio
+
+        response = requests.get(TTS_BASE_URL + response_data["audio_url"])
+        if response.status_code != 200:
+            print(f"获取合成音频失败: {response.status_code}")
+            return None
+        self.url_fetches += 1
+        return response.content
+
+    def retry_segment(self, text, generation):
+        """批量合成中被拒绝的片段等待片刻后通过单段接口重试，返回音频数据或None"""
+        for _ in range(SEGMENT_RETRY_ATTEMPTS):
+            time.sleep(SEGMENT_RETRY_DELAY)
+            if not self.is_current(generation):
+                return None
+            audio = self.request_audio(text)
+            if audio is not None:
+                self.retried_segments += 1
+                return audio
+        return None
+
+    def play_audio(self, audio):
+        """按请求的格式播放合成音频"""
+        self.player.play_bytes(audio, suffix=extension(PLAYBACK_FORMAT), sample_rate=PLAYBACK_SAMPLE_RATE)
+
     def stream_speak(self, text):
         print("on test")
 
     def whole_speak(self, text ,file_url=None):
-        audio_queue = queue.Queue()
         try:
             # 请求TTS API生成语音
-            response = requests.post(TTS_API_URL, json={
-                "text": text,
-                "voice": self.current_role["voice"],
-                "model": "cosyvoice-v2"
-            })
-
-            if response.status_code == 200:
-                try:
-                    # 解析API响应获取文件路径
-                    response_data = response.json()
-                    if "file_path" in response_data:
-                        output_file = response_data["file_path"]
-                    else:
-                        # 如果响应不包含路径，保存为临时文件
-                        output_file = f"voice-web-backend/backend/static/audio/temp_{int(time.time())}.mp3"
-                        with open(output_file, 'wb') as f:
-                            f.write(response.content)
-
-                    audio_queue.put(output_file)
-                except Exception as e:
-                    print(f"解析音频时发生错误: {e}")
+            audio = self.request_audio(text)
         except Exception as e:
             print(f"获取音频时发生错误: {e}")
+            return
 
-        if not audio_queue.empty():
-            output_file = audio_queue.get()
-
-            if os.path.exists(output_file):
-                self.player.play(output_file)
-            else:
-                print(f"文件不存在: {output_file}")
+        if audio:
+            self.play_audio(audio)
 
     def speak(self, text):
         """
@@ -134,52 +195,82 @@ class VoiceSpeak:
 
         # 使用锁确保线程安全
         with self.buffer_thread_lock:
+            self.speak_generation += 1
+            generation = self.speak_generation
             self.buffer_thread_running = True
 
         def audio_queue_add(segments, audio_queue, audio_urls):
-            for segment in segments:
-                if not self.buffer_thread_running:
-                    print("音频播放被中断")
-                    break
+            """一次批量请求并发合成所有片段，按完成顺序收到结果后再按片段顺序入队"""
+            # index -> 音频数据，合成失败的片段为None
+            ready = {}
+            next_index = 0
+            response = None
+            try:
+                response = requests.post(TTS_BATCH_URL, json={
+                    "segments": segments,
+                    "voice": self.current_role["voice"],
+                    "model": "cosyvoice-v2",
+                    "persist": False,
+                    "format": PLAYBACK_FORMAT,
+                    "sample_rate": PLAYBACK_SAMPLE_RATE
+                }, stream=True)
+                if response.status_code != 200:
+                    print(f"TTS批量请求失败: {response.status_code}, {response.text}")
+                    return
+
+                with self.buffer_thread_lock:
+                    if not self.is_current(generation):
+                        response.close()
+                        return
+                    self.batch_response = response
+
+                with response:
+                    for line in response.iter_lines():
+                        if not self.is_current(generation):
+                            break
+                        if not line:
+                            continue
+                        result = json.loads(line)
+                        if "index" not in result:
+                            continue
+                        if result["status"] == "success":
+                            ready[result["index"]] = self.fetch_audio(result)
+                        elif result.get("code") in RETRYABLE_STATUS:
+                            print(f"片段{result['index']}合成被拒绝({result['code']})，改用单段接口重试")
+                            ready[result["index"]] = self.retry_segment(segments[result["index"]], generation)
+                        else:
+                            print(f"片段{result['index']}合成失败: {result.get('message')}")
+                            ready[result["index"]] = None
+
+                        # 前面的片段都到齐后才入队，保证播放顺序
+                        while next_index in ready:
+                            audio = ready.pop(next_index)
+                            next_index += 1
+                            if audio is None:
+                                continue
+                            audio_queue.put(audio)
+                            audio_urls.append(segments[next_index - 1])
+                            print(f"已添加音频片段: {len(audio)}字节,时间: {time.strftime('%Y%m%d_%H%M%S')}")
+            except Exception as e:
+                # 打断时主动关闭了连接，读取出错是预期的
+                if self.is_current(generation):
+                    print(f"处理音频段落时出错: {str(e)}")
+            finally:
+                with self.buffer_thread_lock:
+                    if self.batch_response is response:
+                        self.batch_response = None
+                if next_index < len(segments) and not self.is_current(generation):
+                    self.cancelled_segments += len(segments) - next_index
+                    print(f"音频播放被中断，取消剩余{len(segments) - next_index}个片段")
 
-                try:
-                    # 请求TTS API生成语音
-                    response = requests.post(TTS_API_URL, json={
-                        "text": segment,
-                        "voice": self.current_role["voice"],
-                        "model": "cosyvoice-v2"
-                    })
-
-                    if response.status_code == 200:
-                        try:
-                            # 解析API响应获取文件路径
-                            response_data = response.json()
-                            if "file_path" in response_data:
-                                output_file = response_data["file_path"]
-                            else:
-                                # 如果响应不包含路径，保存为临时文件
-                                output_file = f"voice-web-backend/backend/static/audio/temp_{int(time.time())}.mp3"
-                                with open(output_file, 'wb') as f:
-                                    f.write(response.content)
-
-                            # 将音频文件加入队列
-                            audio_queue.put(output_file)
-                            audio_urls.append(output_file)
-                            print(f"已添加音频片段: {output_file},时间: {time.strftime('%Y%m%d_%H%M%S')}")
-                        except ValueError as e:
-                            print("处理TTS响应时出错:", str(e))
-                    else:
-                        print(f"TTS API请求失败: {response.status_code}, {response.text}")
-                except Exception as e:
-                    print(f"处理音频段落时出错: {str(e)}")        
         def audio_queue_play(audio_queue):
-            while self.buffer_thread_running:
+            while self.is_current(generation):
                 if audio_queue.empty():
                     time.sleep(0.2)
                 else:
                     try:
                         # 等待播放完成 - 安全检查
-                        while self.buffer_thread_running:
+                        while self.is_current(generation):
                             try:
                                 if hasattr(self.player, 'is_complete') and not self.player.is_complete():
                                     time.sleep(0.4)
@@ -190,14 +281,12 @@ class VoiceSpeak:
                                 break
                             time.sleep(0.4)
 
-                        file_path = audio_queue.get()
+                        audio = audio_queue.get()
+                        if not self.is_current(generation):
+                            break
 
-                        print(f"正在播放片段: {file_path}")
-
-                        if os.path.exists(file_path):
-                            self.player.play(file_path)
-                        else:
-                            print(f"文件不存在: {file_path}")
+                        print(f"正在播放片段: {len(audio)}字节")
+                        self.play_audio(audio)
                     except Exception as e:
                         print(f"播放音频片段时出错: {str(e)}")
                         time.sleep(0.5)
@@ -229,16 +318,19 @@ class VoiceSpeak:
                 play_thread.join()
 
                 # 等待队列中的所有音频播放完毕
-                while not audio_queue.empty() and self.buffer_thread_running:
+                while not audio_queue.empty() and self.is_current(generation):
                     time.sleep(0.2)                # 结束播放线程
-                self.buffer_thread_running = False
             finally:
                 with self.buffer_thread_lock:
-                    if self.buffer_thread_running:  # 只有在没被中断的情况下才重置状态
+                    # 已被新一轮取代时不能重置新一轮的状态，也不再通知播放完成
+                    superseded = generation != self.speak_generation
+                    if self.buffer_thread_running and not superseded:  # 只有在没被中断的情况下才重置状态
                         # self.state = "idle"
                         self.buffer_thread_running = False
                 # 安全调用回调函数
-                if self.playing_complete_callback and callable(self.playing_complete_callback):
+                if superseded:
+                    print("本轮播放已被打断，不再通知播放完成")
+                elif self.playing_complete_callback and callable(self.playing_complete_callback):
                     try:
                         self.playing_complete_callback()
                     except Exception as e:
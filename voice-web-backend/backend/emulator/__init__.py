@@ -0,0 +1,40 @@
+"""离线DashScope模拟器
+
+设置环境变量dashscope_emulator=true后，语音识别、语音合成和智能体应用都改用本地模拟实现，
+不访问网络也不需要API Key，可以在隔离环境中对整个后端做联调和压测。延迟与错误注入
+通过emulator_*环境变量配置，见emulator/config.py。
+
+核心模块通过这里的get_*函数取得要使用的类，每次调用时读取配置，未启用时返回DashScope SDK的实现。
+"""
+import os
+
+
+def emulator_enabled():
+    return os.getenv('dashscope_emulator', 'false').lower() == 'true'
+
+
+def get_recognizer_class():
+    """返回TranslationRecognizerRealtime或其模拟实现"""
+    if emulator_enabled():
+        from emulator.recognizer import EmulatedRecognizer
+        return EmulatedRecognizer
+    import dashscope
+    return dashscope.audio.asr.TranslationRecognizerRealtime
+
+
+def get_synthesizer_class():
+    """返回tts_v2.SpeechSynthesizer或其模拟实现"""
+    if emulator_enabled():
+        from emulator.synthesizer import EmulatedSpeechSynthesizer
+        return EmulatedSpeechSynthesizer
+    from dashscope.audio.tts_v2 import SpeechSynthesizer
+    return SpeechSynthesizer
+
+
+def get_application():
+    """返回dashscope.Application或其模拟实现"""
+    if emulator_enabled():
+        from emulator.application import EmulatedApplication
+        return EmulatedApplication
+    from dashscope import Application
+    return Application
@@ -0,0 +1,52 @@
+import itertools
+import random
+import threading
+import time
+import uuid
+from http import HTTPStatus
+from types import SimpleNamespace
+
+from emulator.config import get_config
+
+
+class EmulatedApplication:
+    """本地模拟的dashscope.Application
+
+    call按脚本返回回复，延迟为emulator_app_latency_ms加上随机抖动；按emulator_app_error_rate
+    返回与SDK相同结构的错误响应（status_code非200，带code和message），不会抛出异常。
+    首次调用（未带session_id）时生成新的会话ID，同一会话内记录轮次。
+    """
+
+    _reply_counter = itertools.count()
+    _lock = threading.Lock()
+    # session_id -> 已进行的轮次
+    sessions = {}
+    stats = {"calls": 0, "errors": 0}
+
+    @classmethod
+    def call(cls, app_id=None, prompt=None, session_id=None, api_key=None, **kwargs):
+        config = get_config()
+        request_id = uuid.uuid4().hex
+        latency = config.app_latency_ms + random.uniform(-config.app_jitter_ms, config.app_jitter_ms)
+        time.sleep(max(0.0, latency) / 1000)
+
+        with cls._lock:
+            cls.stats["calls"] += 1
+            if config.should_fail(config.app_error_rate):
+                cls.stats["errors"] += 1
+                return SimpleNamespace(status_code=HTTPStatus.TOO_MANY_REQUESTS, request_id=request_id,
+                                       code="Throttling", message="模拟错误：请求过于频繁", output=None,
+                                       usage=None)
+            session_id = session_id or uuid.uuid4().hex
+            cls.sessions[session_id] = cls.sessions.get(session_id, 0) + 1
+            template = config.app_replies[next(cls._reply_counter) % len(config.app_replies)]
+
+        text = template.replace("{prompt}", prompt or "")
+        return SimpleNamespace(
+            status_code=HTTPStatus.OK,
+            request_id=request_id,
+            code="",
+            message="",
+            output=SimpleNamespace(text=text, session_id=session_id, finish_reason="stop"),
+            usage=SimpleNamespace(models=[]),
+        )
@@ -0,0 +1,77 @@
+import json
+import os
+import random
+
+# 未提供脚本时识别结果依次使用的文本
+DEFAULT_TRANSCRIPTS = ["你好", "今天天气怎么样", "帮我查一下明天的日程", "谢谢"]
+# 未提供脚本时智能体回复的模板，{prompt}替换为用户输入
+DEFAULT_REPLY = "（模拟回复）你刚才说的是：{prompt}。还有什么可以帮你的吗？"
+
+
+def _float(name, default):
+    return float(os.getenv(name, str(default)))
+
+
+def _load_list(path, default):
+    if not path:
+        return list(default)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else list(default)
+
+
+class EmulatorConfig:
+    """模拟器的延迟与错误注入配置，默认值接近真实服务的典型表现
+
+    识别:
+        emulator_asr_script: JSON文件，识别结果文本列表，按顺序循环使用
+        emulator_asr_partial_ms / emulator_asr_final_ms: 中间结果 / 整句结果的回调延迟
+        emulator_asr_partial_interval_ms: 说话期间产生中间结果的音频间隔
+        emulator_asr_endpoint_ms: 说话后静音多久判定句子结束
+        emulator_asr_threshold_dbfs: 判定为说话的音量阈值
+        emulator_asr_error_rate: 每次连接在前emulator_asr_error_window_s秒音频内断开的概率
+    合成:
+        emulator_tts_first_packet_ms: 首包延迟
+        emulator_tts_rtf: 每秒墙钟时间生成的音频秒数
+        emulator_tts_chunk_ms: 每个音频块的时长
+        emulator_tts_error_rate: 合成失败的概率
+    智能体应用:
+        emulator_app_replies: JSON文件，回复模板列表，按顺序循环使用，可包含{prompt}
+        emulator_app_latency_ms / emulator_app_jitter_ms: 响应延迟及随机抖动
+        emulator_app_error_rate: 返回错误响应的概率
+    """
+
+    def __init__(self):
+        self.asr_transcripts = _load_list(os.getenv('emulator_asr_script'), DEFAULT_TRANSCRIPTS)
+        self.asr_partial_ms = _float('emulator_asr_partial_ms', 150)
+        self.asr_final_ms = _float('emulator_asr_final_ms', 300)
+        self.asr_partial_interval_ms = _float('emulator_asr_partial_interval_ms', 200)
+        self.asr_endpoint_ms = _float('emulator_asr_endpoint_ms', 500)
+        self.asr_threshold_dbfs = _float('emulator_asr_threshold_dbfs', -40)
+        self.asr_error_rate = _float('emulator_asr_error_rate', 0)
+        self.asr_error_window_s = _float('emulator_asr_error_window_s', 10)
+
+        self.tts_first_packet_ms = _float('emulator_tts_first_packet_ms', 300)
+        self.tts_rtf = _float('emulator_tts_rtf', 5)
+        self.tts_chunk_ms = _float('emulator_tts_chunk_ms', 100)
+        self.tts_error_rate = _float('emulator_tts_error_rate', 0)
+
+        self.app_replies = _load_list(os.getenv('emulator_app_replies'), [DEFAULT_REPLY])
+        self.app_latency_ms = _float('emulator_app_latency_ms', 800)
+        self.app_jitter_ms = _float('emulator_app_jitter_ms', 200)
+        self.app_error_rate = _float('emulator_app_error_rate', 0)
+
+    @staticmethod
+    def should_fail(rate):
+        return rate > 0 and random.random() < rate
+
+
+config = None
+
+
+def get_config():
+    """获取模拟器配置单例，首次调用时读取环境变量"""
+    global config
+    if config is None:
+        config = EmulatorConfig()
+    return config
@@ -0,0 +1,126 @@
+import itertools
+import random
+import threading
+from types import SimpleNamespace
+
+from core.audio_frames import SAMPLE_WIDTH, analyze_chunk
+from emulator.config import get_config
+
+
+class EmulatedRecognizer:
+    """本地模拟的TranslationRecognizerRealtime
+
+    与bench.fake_recognizer按时间脚本回放不同，这里根据实际送入的音频判断说话：
+    音量超过阈值即开始一句话，说话期间按音频时间产生中间结果，静音超过endpoint后
+    产生整句结果。识别文本取自配置的脚本，跨连接依次循环。回调都在定时器线程中触发，
+    延迟按配置设置，和真实SDK一样不在send_audio_frame的调用线程里回调。
+
+    构造参数与TranslationRecognizerRealtime一致，多余参数忽略。
+    """
+
+    # 所有连接共享的脚本位置
+    _transcript_counter = itertools.count()
+
+    def __init__(self, model=None, format="pcm", sample_rate=16000, transcription_enabled=True,
+                 translation_enabled=False, callback=None, **kwargs):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.callback = callback
+        self.config = get_config()
+
+        self.lock = threading.Lock()
+        self.timers = []
+        self.running = False
+
+        self.audio_time = 0.0
+        self.in_speech = False
+        self.speech_start = 0.0
+        self.last_voice = 0.0
+        self.next_partial_at = 0.0
+        self.sentence_id = 0
+        self.text = ""
+        self.fail_at = None
+        self.stats = {"frames": 0, "bytes": 0, "partials": 0, "finals": 0}
+
+    def _schedule(self, delay_ms, fn, *args):
+        self.timers = [timer for timer in self.timers if timer.is_alive()]
+        timer = threading.Timer(delay_ms / 1000, self._fire, args=(fn,) + args)
+        timer.daemon = True
+        self.timers.append(timer)
+        timer.start()
+
+    def _fire(self, fn, *args):
+        with self.lock:
+            if not self.running:
+                return
+            fn(*args)
+
+    def _send_event(self, sentence_id, text, is_end):
+        result = SimpleNamespace(text=text, sentence_id=sentence_id, is_sentence_end=is_end, stash=None)
+        self.stats["finals" if is_end else "partials"] += 1
+        self.callback.on_event(f"emulated-{id(self)}-{sentence_id}", result, None, None)
+
+    def _fail(self):
+        self.running = False
+        self.callback.on_error("模拟连接中断")
+        self.callback.on_close()
+
+    def start(self):
+        self.running = True
+        if self.config.should_fail(self.config.asr_error_rate):
+            self.fail_at = random.uniform(0, self.config.asr_error_window_s)
+        self.callback.on_open()
+
+    def send_audio_frame(self, data):
+        if not self.running:
+            raise RuntimeError("识别器未启动或连接已断开")
+        self.stats["frames"] += 1
+        self.stats["bytes"] += len(data)
+
+        duration = len(data) / (self.sample_rate * SAMPLE_WIDTH)
+        voiced = analyze_chunk(data).dbfs >= self.config.asr_threshold_dbfs
+        interval = self.config.asr_partial_interval_ms / 1000
+        if voiced:
+            if not self.in_speech:
+                self.in_speech = True
+                self.speech_start = self.audio_time
+                self.next_partial_at = self.audio_time + interval
+                transcripts = self.config.asr_transcripts
+                self.text = transcripts[next(self._transcript_counter) % len(transcripts)]
+            self.last_voice = self.audio_time + duration
+        self.audio_time += duration
+
+        if self.in_speech:
+            while self.audio_time >= self.next_partial_at and self.next_partial_at <= self.last_voice:
+                # 文本随说话时长逐步变长，整句结果前不给出完整文本
+                chars = 1 + int((self.next_partial_at - self.speech_start) / interval)
+                partial = self.text[:max(1, min(len(self.text) - 1, chars))]
+                self._schedule(self.config.asr_partial_ms, self._send_event, self.sentence_id, partial, False)
+                self.next_partial_at += interval
+            if self.audio_time - self.last_voice >= self.config.asr_endpoint_ms / 1000:
+                self._end_sentence(self.config.asr_final_ms)
+
+        if self.fail_at is not None and self.audio_time >= self.fail_at:
+            self.fail_at = None
+            self._schedule(0, self._fail)
+
+    def _end_sentence(self, delay_ms):
+        self._schedule(delay_ms, self._send_event, self.sentence_id, self.text, True)
+        self.in_speech = False
+        self.sentence_id += 1
+
+    def stop(self):
+        """结束识别：未结束的句子立即给出整句结果，等待已排定的回调完成后回调on_complete/on_close"""
+        if not self.running:
+            return
+        if self.in_speech:
+            self._end_sentence(0)
+        for timer in list(self.timers):
+            timer.join()
+        self.timers = []
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+        self.callback.on_complete()
+        self.callback.on_close()
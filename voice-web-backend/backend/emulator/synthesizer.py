@@ -0,0 +1,141 @@
+import io
+import json
+import re
+import threading
+import time
+import uuid
+import wave
+import zlib
+
+import numpy as np
+
+from emulator.config import get_config
+
+# 模拟音频的默认格式：22.05kHz、单声道、16bit WAV
+SAMPLE_RATE = 22050
+# 每个字符对应的音频时长（秒），接近正常语速
+SECONDS_PER_CHAR = 0.22
+
+
+def parse_audio_format(audio_format):
+    """从SDK的AudioFormat名称（如PCM_16000HZ_MONO_16BIT）解析出(是否裸PCM, 采样率)"""
+    name = getattr(audio_format, "name", str(audio_format or ""))
+    match = re.search(r"_(\d+)(K?)HZ", name)
+    sample_rate = int(match.group(1)) * (1000 if match.group(2) else 1) if match else SAMPLE_RATE
+    return name.startswith("PCM"), sample_rate
+
+
+def generate_speech_like(text, voice="", sample_rate=SAMPLE_RATE, raw_pcm=False):
+    """按文本长度生成类似语音节奏的音频：每个字符一个带包络的音节，音高由音色决定
+
+    raw_pcm为True时返回16bit裸PCM，否则返回WAV。
+    """
+    chars = max(1, len(text.strip()))
+    syllable = int(SECONDS_PER_CHAR * sample_rate)
+    base = 160 + zlib.crc32(voice.encode("utf-8")) % 120
+    t = np.arange(syllable) / sample_rate
+    envelope = np.sin(np.pi * np.arange(syllable) / syllable) ** 2
+    samples = np.concatenate([
+        np.sin(2 * np.pi * (base + 15 * (i % 4)) * t) * envelope for i in range(chars)
+    ])
+    pcm = (samples * 0.3 * 32767).astype("<i2").tobytes()
+    if raw_pcm:
+        return pcm
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class EmulatedSpeechSynthesizer:
+    """本地模拟的tts_v2.SpeechSynthesizer
+
+    生成与文本长度相称的音频：format为PCM时输出裸PCM，其余格式都输出WAV（本地无法编码
+    mp3/opus），采样率取自format。首包在emulator_tts_first_packet_ms后到达，之后按
+    emulator_tts_rtf倍实时速度逐块产出；按emulator_tts_error_rate注入失败。构造参数与SDK一致，
+    多余参数忽略。
+
+    与SDK行为保持一致：没有callback时call阻塞并返回完整音频；有callback时call立即返回None，
+    音频在后台线程中通过on_data回调，可用streaming_cancel取消。每个实例只能call一次，
+    再次调用抛出异常。
+    """
+
+    def __init__(self, model=None, voice=None, format=None, callback=None, **kwargs):
+        self.model = model
+        self.voice = voice or ""
+        self.callback = callback
+        self.raw_pcm, self.sample_rate = parse_audio_format(format)
+        self.config = get_config()
+        self.first_package_delay = None
+        self.request_id = None
+        self.closed = False
+        self.called = False
+        self.cancelled = False
+
+    def _chunks(self, audio):
+        """按配置的节奏切块产出音频，sleep模拟首包与合成耗时"""
+        chunk_bytes = max(1, int(self.sample_rate * 2 * self.config.tts_chunk_ms / 1000))
+        chunk_wall = self.config.tts_chunk_ms / 1000 / max(self.config.tts_rtf, 0.01)
+        started = time.monotonic()
+        time.sleep(self.config.tts_first_packet_ms / 1000)
+        self.first_package_delay = (time.monotonic() - started) * 1000
+        for offset in range(0, len(audio), chunk_bytes):
+            if offset:
+                time.sleep(chunk_wall)
+            yield audio[offset:offset + chunk_bytes]
+
+    def call(self, text, timeout_millis=None):
+        if self.closed:
+            raise RuntimeError("合成器已关闭")
+        if self.called:
+            # 真实SDK合成结束后连接已关闭且不会重连，第二次call会失败
+            raise ConnectionError("WebSocket connection is not established or has been closed")
+        self.called = True
+        self.request_id = uuid.uuid4().hex
+        fail = self.config.should_fail(self.config.tts_error_rate)
+        audio = generate_speech_like(text, self.voice, self.sample_rate, self.raw_pcm)
+
+        if self.callback is None:
+            chunks = []
+            for chunk in self._chunks(audio):
+                if fail:
+                    raise RuntimeError("模拟合成失败")
+                chunks.append(chunk)
+            return b"".join(chunks)
+
+        self.callback.on_open()
+        thread = threading.Thread(target=self._stream, args=(audio, fail), daemon=True)
+        thread.start()
+        return None
+
+    def _stream(self, audio, fail):
+        """后台线程中逐块回调音频"""
+        callback = self.callback
+        for chunk in self._chunks(audio):
+            if self.cancelled:
+                callback.on_close()
+                return
+            if fail:
+                callback.on_error("模拟合成失败")
+                callback.on_close()
+                return
+            callback.on_data(chunk)
+        callback.on_event(json.dumps({"header": {"event": "task-finished", "task_id": self.request_id}}))
+        callback.on_complete()
+        callback.on_close()
+
+    def streaming_cancel(self):
+        self.cancelled = True
+
+    def get_first_package_delay(self):
+        return self.first_package_delay
+
+    def get_last_request_id(self):
+        return self.request_id
+
+    def close(self):
+        self.closed = True
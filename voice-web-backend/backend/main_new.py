@@ -14,11 +14,15 @@ import sys
 from api.routes_new import router
 from core.voiceOut import router as voice_router
 import dotenv
+from emulator import emulator_enabled
 
 # 加载环境变量
 dotenv.load_dotenv()
 tts_port = os.getenv('tts_port', '51000')
 
+if emulator_enabled():
+    print("已启用DashScope离线模拟器，识别、合成和智能体调用均不访问网络")
+
 # 创建FastAPI应用
 app = FastAPI(
     title="语音对话系统 API",
@@ -70,6 +74,13 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.on_event("startup")
+async def startup_event():
+    """应用启动时开启后台的音频目录清理"""
+    from core.voiceOut import retention_sweeper
+    retention_sweeper.start()
+
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时释放所有资源"""
@@ -80,9 +91,9 @@ async def shutdown_event():
         from api.routes_new import dialogue_manager
         
         # 停止ASR服务
-        if hasattr(dialogue_manager, 'asr_manager') and dialogue_manager.asr_manager:
+        if hasattr(dialogue_manager, 'asr_service'):
             print("关闭ASR服务...")
-            dialogue_manager.asr_manager.stop_asr()
+            dialogue_manager.asr_service.stop()
             dialogue_manager.asr_manager = None
             
         # 停止语音服务
@@ -97,6 +108,15 @@ async def shutdown_event():
                     dialogue_manager.voice_speak.buffer_thread_running = False
                     
             dialogue_manager.voice_speak = None
+
+        # 停止音频目录清理线程，关闭空闲的合成器
+        from core.voiceOut import retention_sweeper, synthesizer_pool
+        retention_sweeper.stop()
+        synthesizer_pool.close()
+
+        # 关闭所有网络识别会话
+        from core.asr_sessions import get_asr_session_registry
+        get_asr_session_registry().close_all()
             
         # 终止运行状态
         dialogue_manager.running = False
@@ -154,11 +174,9 @@ def cleanup_resources():
         print("正在手动清理所有资源...")
         
         # 停止ASR服务
-        if hasattr(dialogue_manager, 'asr_manager') and dialogue_manager.asr_manager:
+        if hasattr(dialogue_manager, 'asr_service'):
             print("关闭ASR服务...")
-            if hasattr(dialogue_manager.asr_manager, 'stop_asr'):
-                dialogue_manager.asr_manager.stop_asr()
-            dialogue_manager.asr_manager.running = False
+            dialogue_manager.asr_service.stop()
             dialogue_manager.asr_manager = None
             
         # 停止语音服务
@@ -192,10 +192,48 @@ export const playAudio = async (audioPaths) => {
 
 /**
  * 直接进行实时语音识别，并可能打断AI
- * @param {string} audioData Base64编码的音频数据
+ * @param {Blob} audioBlob 录音数据（webm/opus、wav或16kHz PCM），以二进制直接上传
+ */
+export const realTimeRecognizeVoice = async (audioBlob) => {
+  return apiClient.post('/direct-recognize', audioBlob, {
+    headers: { 'Content-Type': audioBlob.type || 'application/octet-stream' }
+  });
+};
+
+/**
+ * 创建流式识别会话
+ */
+export const createAsrSession = async () => {
+  return apiClient.post('/asr/sessions');
+};
+
+/**
+ * 向识别会话推送一个录音分片，同一会话的分片在后端按顺序增量解码
+ * @param {string} sessionId 会话ID
+ * @param {Blob} audioBlob MediaRecorder分片
+ */
+export const pushAsrAudio = async (sessionId, audioBlob) => {
+  return apiClient.post(`/asr/sessions/${sessionId}/audio`, audioBlob, {
+    headers: { 'Content-Type': audioBlob.type || 'application/octet-stream' },
+    // 分片重复发送会破坏解码流，不重试
+    _retryCount: MAX_RETRIES
+  });
+};
+
+/**
+ * 获取识别会话的中间结果
+ * @param {string} sessionId 会话ID
+ */
+export const getAsrSession = async (sessionId) => {
+  return apiClient.get(`/asr/sessions/${sessionId}`);
+};
+
+/**
+ * 关闭识别会话
+ * @param {string} sessionId 会话ID
  */
-export const realTimeRecognizeVoice = async (audioData) => {
-  return apiClient.post('/direct-recognize', { audio_data: audioData });
+export const closeAsrSession = async (sessionId) => {
+  return apiClient.delete(`/asr/sessions/${sessionId}`);
 };
 
 export default {
@@ -210,5 +248,9 @@ export default {
   playAudio,
   playAudioSequentially,
   // 新增实时语音识别
-  realTimeRecognizeVoice
+  realTimeRecognizeVoice,
+  createAsrSession,
+  pushAsrAudio,
+  getAsrSession,
+  closeAsrSession
 };